@@ -1,5 +1,19 @@
 from dataclasses import dataclass, field
-import cadquery as cq
+from pathlib import Path # noqa
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent.parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common.gridfinity_base import base_library
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
 
 
 class SemVer:
@@ -102,8 +116,8 @@ hole_margin_normal = 0.4
 
 
 
-import cqgridfinity as cqg  # noqa
 import math  # noqa
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -114,17 +128,11 @@ if 'show_object' not in globals():
 def make_basic_box(fill_mm, gridfin_x, gridfin_y, gridfin_height, gf_hi_size, no_lip):
 	sr = to_solid_ratio(fill_mm, gf_hi_size, gridfin_height)
 
-	bh = cqg.GridfinityBox(
+	bh = base_library.GetBase(
 		gridfin_x,
 		gridfin_y,
 		gridfin_height,
-		length_div=0,
-		width_div=0,
-		holes=False,
 		no_lip=no_lip,
-		scoops=False,
-		labels=False,
-		solid=True,
 		solid_ratio=sr
 	)
 	return bh
@@ -446,4 +454,5 @@ def main():
 	show_object(result, name=holder.name+" v"+str(holder.version))
 
 
-main()
+if __name__ == "__main__" or _in_cq_editor:
+	main()
@@ -0,0 +1,89 @@
+"""Compare the cad_common.booleans strategies on the repo's own parts.
+
+	python bench/bench_booleans.py [--repeat 3] [--fuzzy 0] [--no-obb] [--serial]
+
+Every holder in misc_multi_holder is cut from its base with all its hole
+and chamfer tools, the holders' hole tools are fused, the bosch group is
+intersected, and a spread of bend radius gauges is built end to end.
+"""
+from pathlib import Path
+import argparse
+import runpy
+import sys
+import time
+
+repo_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_dir))
+sys.path.insert(0, str(repo_dir.joinpath("misc_multi_holder")))
+
+from cad_common import booleans  # noqa: E402
+
+
+def bench_holders(repeat, option_changes):
+	import multi_holder as mh
+
+	holders, and_groups = mh.holder_catalog()
+	for holder in holders:
+		base = mh.make_holder_base(holder).cq_obj
+		plane = base.faces(">Z[-2]").workplane().plane
+		tools = mh.make_hole_tool_solids(holder, plane, chamfers=True)
+		print(booleans.format_benchmark(
+			f"{holder.name}: base - {len(tools)} tools",
+			booleans.benchmark("cut", base.val(), tools, repeat=repeat, **option_changes),
+		))
+		if len(tools) > 2:
+			print(booleans.format_benchmark(
+				f"{holder.name}: {len(tools)} tools fused",
+				booleans.benchmark("fuse", tools, repeat=repeat, **option_changes),
+			))
+
+	for group in and_groups:
+		results = [mh.make_holder(holder)[0].val() for holder in group]
+		print(booleans.format_benchmark(
+			f"{group[0].name}: common of {len(results)} holders",
+			booleans.benchmark("common", results, repeat=repeat, **option_changes),
+		))
+
+
+def bench_bend_radius(repeat, option_changes):
+	br = runpy.run_path(str(repo_dir.joinpath("bend_radius", "bend_radius.py")), run_name="bend_radius")
+
+	diameters = [20.0, 32.0, 56.0, 140.0]
+	print(f"bend radius gauges {diameters}")
+	for strategy in booleans.boolean_strategies:
+		with booleans.use_options(strategy=strategy, **option_changes):
+			best = None
+			volume = 0.0
+			for _ in range(repeat):
+				start = time.perf_counter()
+				volume = 0.0
+				for diameter in diameters:
+					result, _ = br["make_spacer"](br["Spacer"](name="bench", diameter=diameter))
+					volume += result.val().Volume()
+				seconds = time.perf_counter() - start
+				best = seconds if best is None else min(best, seconds)
+		print(f"\t{strategy:>4}: {best * 1000:9.1f} ms  volume {volume:.4f}")
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--repeat', type=int, default=3)
+	parser.add_argument('--fuzzy', type=float, default=0.0,
+					 help='fuzzy tolerance in mm')
+	parser.add_argument('--no-obb', action="store_true",
+					 help="don't use oriented bounding boxes")
+	parser.add_argument('--serial', action="store_true",
+					 help="turn off OCC's parallel mode")
+	args = parser.parse_args()
+
+	option_changes = {
+		"fuzzy": args.fuzzy,
+		"use_obb": not args.no_obb,
+		"parallel": not args.serial,
+	}
+	bench_holders(args.repeat, option_changes)
+	bench_bend_radius(args.repeat, option_changes)
+
+
+if __name__ == "__main__":
+	main()
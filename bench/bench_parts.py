@@ -0,0 +1,322 @@
+"""Build, tessellate and export time of every part generator, against a baseline.
+
+	python bench/bench_parts.py run [--repeat 3] [--only GLOB] [--save FILE] [--baseline FILE]
+	python bench/bench_parts.py compare BASELINE CURRENT [--threshold 0.15]
+
+Every holder catalog entry is timed, plus a fixed sample of each sweep
+(bend radius gauges, ltt spacers, both washers), the towel washer's ramp
+and the wolfbox holder. Each part is built, meshed with the tolerances its
+script exports STLs with, and written as STEP and STL, the best of
+--repeat runs of each step is kept. The gridfinity base cache is emptied
+in memory before every build, so bases come from the disk cache each time,
+and so are the caches a script keeps between its own builds (the holders'
+hole tools, the bend radius brace and wedge), so every repeat does the
+whole build.
+
+`run --save` writes the results as JSON, `compare` (or `run --baseline`)
+lists every step that got more than --threshold slower and exits with 1
+if any did. Nothing here needs cq-editor.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import runpy
+import sys
+import tempfile
+import time
+
+repo_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(repo_dir))
+sys.path.insert(0, str(repo_dir.joinpath("misc_multi_holder")))
+
+from cad_common import gridfinity_base, tessellation  # noqa: E402
+from cad_common.lazy import lazy_import  # noqa: E402
+from cad_common.manifest import package_version  # noqa: E402
+
+cq = lazy_import("cadquery")
+
+baseline_format = 1
+stages = ("build", "tessellate", "step", "stl")
+
+# the sweep samples, from the ends and the middle of each loop
+bend_radius_diameters = [2.0, 20.0, 70.0, 140.0]
+ltt_thicknesses = [0.5, 5.0, 10.0]
+# the washers' loops start at the script's Spacer_thickness
+washer_max_thickness = 10.0
+
+
+@dataclass
+class Case:
+	name: str
+	build: Callable[[], Any]
+	# the STL tolerances the part's script exports with
+	stl_tolerance: float = 0.0001
+	stl_angular_tolerance: float = 0.04
+	# empties the script's own caches, called before every repeat
+	reset: Optional[Callable[[], None]] = None
+
+
+def _run_script(rel_path: str) -> Dict[str, Any]:
+	path = repo_dir.joinpath(rel_path)
+	return runpy.run_path(str(path), run_name=path.stem)
+
+
+def holder_cases() -> List[Case]:
+	import multi_holder as mh
+
+	holders, and_groups = mh.holder_catalog()
+	jobs = [list(group) for group in and_groups] + [[holder] for holder in holders]
+	return [
+		Case(
+			f"multi_holder/{job[0].name}",
+			lambda job=job: mh.build_job_model(job),
+			mh.stl_tolerance,
+			mh.stl_angular_tolerance,
+			reset=mh.hole_tool_cache.Clear,
+		)
+		for job in jobs
+	]
+
+
+def bend_radius_cases() -> List[Case]:
+	br = _run_script("bend_radius/bend_radius.py")
+
+	def reset() -> None:
+		br["_brace"].cache_clear()
+		br["_wedge"].cache_clear()
+
+	return [
+		Case(
+			f"bend_radius/{diameter / 2:.3f} mm",
+			lambda diameter=diameter: br["make_spacer"](br["Spacer"](
+				name="bench", version=br["Version"], thickness=br["thickness"], diameter=diameter,
+			))[0],
+			br["stl_tolerance"],
+			br["stl_angular_tolerance"],
+			reset=reset,
+		)
+		for diameter in bend_radius_diameters
+	]
+
+
+def ltt_cases() -> List[Case]:
+	ltt = _run_script("ltt_screwdriver_bit_spacer/ltt_screwdriver_bit_spacer.py")
+	return [
+		Case(
+			f"ltt_screwdriver_bit_spacer/{bits} bits {thickness} mm",
+			lambda bits=bits, thickness=thickness: ltt["make_spacer"](
+				ltt["Spacer"](name="bench", thickness=thickness, bits=bits)
+			)[0],
+		)
+		for bits in range(1, 4)
+		for thickness in ltt_thicknesses
+	]
+
+
+def washer_cases() -> List[Case]:
+	cases = []
+	for rel_path in ("washer/washer.py", "washer_for_towel_roll_holder/washer.py"):
+		washer = _run_script(rel_path)
+		cases += [
+			Case(
+				f"{Path(rel_path).parent.name}/{thickness} mm",
+				lambda washer=washer, thickness=thickness: washer["make_spacer"](
+					washer["Spacer"](name="bench", thickness=thickness)
+				)[0],
+			)
+			for thickness in (washer["Spacer_thickness"], washer_max_thickness)
+		]
+
+	# the loop ends on washer_for_towel_roll_holder
+	towel = washer
+	cases.append(Case(
+		"washer_for_towel_roll_holder/angled ring ramp",
+		# what the script's main() shows
+		lambda: towel["angled_ring_ramp"](
+			inner_radius=2, outer_radius=3, ang=60, height=2,
+			thickness=0.5, wedge_height=0.0, start_angle=0,
+		).edges(">Z").fillet(0.1),
+	))
+	return cases
+
+
+def wolfbox_cases() -> List[Case]:
+	wolfbox = _run_script("wolfbox_mf100_holder/wolfbox_mf100_holder.py")
+	return [Case(
+		"wolfbox_mf100_holder/wolfbox mf100 holder",
+		lambda: wolfbox["make_holder"](holder=wolfbox["mf100_holder"]())[0],
+		1e-5,
+		# cadquery's default, the script only sets the linear tolerance
+		0.1,
+	)]
+
+
+case_groups = [holder_cases, bend_radius_cases, ltt_cases, washer_cases, wolfbox_cases]
+
+
+def time_case(case: Case, repeat: int, tmp_dir: Path) -> Dict[str, Any]:
+	best = {stage: None for stage in stages}
+	result = {}
+	for _ in range(repeat):
+		gridfinity_base.base_library.Clear()
+		if case.reset is not None:
+			case.reset()
+
+		seconds = {}
+		start = time.perf_counter()
+		model = case.build()
+		seconds["build"] = time.perf_counter() - start
+
+		report = tessellation.mesh_fixed(model, case.stl_tolerance, case.stl_angular_tolerance)
+		seconds["tessellate"] = report.seconds
+
+		start = time.perf_counter()
+		cq.exporters.export(model, str(tmp_dir.joinpath("part.step")))
+		seconds["step"] = time.perf_counter() - start
+
+		start = time.perf_counter()
+		tessellation.write_stl(model, tmp_dir.joinpath("part.stl"))
+		seconds["stl"] = time.perf_counter() - start
+
+		for stage, value in seconds.items():
+			best[stage] = value if best[stage] is None else min(best[stage], value)
+
+		shape = model.val() if isinstance(model, cq.Workplane) else model
+		# a different volume or mesh means the part itself changed, not just its speed
+		result["volume"] = shape.Volume()
+		result["triangles"] = report.triangles
+
+	result.update({stage: round(value, 5) for stage, value in best.items()})
+	return result
+
+
+def environment() -> Dict[str, Any]:
+	return {
+		"python": platform.python_version(),
+		"cadquery": package_version("cadquery"),
+		"cadquery-ocp": package_version("cadquery-ocp"),
+		"cqgridfinity": package_version("cqgridfinity"),
+		"machine": platform.machine(),
+		"cpus": os.cpu_count(),
+	}
+
+
+def run(repeat: int, patterns: List[str]) -> Dict[str, Any]:
+	cases = {}
+	with tempfile.TemporaryDirectory() as tmp:
+		for group in case_groups:
+			for case in group():
+				if patterns and not any(fnmatch.fnmatch(case.name, pattern) for pattern in patterns):
+					continue
+				times = time_case(case, repeat, Path(tmp))
+				cases[case.name] = times
+				print(
+					f"{case.name:<60} "
+					+ " ".join(f"{stage} {times[stage] * 1000:8.1f}ms" for stage in stages)
+				)
+	return {
+		"format": baseline_format,
+		"created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"repeat": repeat,
+		"environment": environment(),
+		"cases": cases,
+	}
+
+
+def read_results(path: Path) -> Dict[str, Any]:
+	data = json.loads(Path(path).read_text())
+	if data.get("format") != baseline_format:
+		raise SystemExit(f"\"{path}\" isn't a format {baseline_format} benchmark result")
+	return data
+
+
+def compare(
+	baseline: Dict[str, Any],
+	current: Dict[str, Any],
+	threshold: float,
+	min_seconds: float,
+) -> List[Tuple[str, str, float, float]]:
+	"""Print how current did against baseline, returns the regressions.
+
+	A step regressed when it took more than threshold (a fraction) longer
+	and at least min_seconds longer, so millisecond noise doesn't count.
+	"""
+	if baseline["environment"] != current["environment"]:
+		print(f"note: measured on a different setup, {baseline['environment']} then, {current['environment']} now")
+
+	regressions = []
+	for name, now in current["cases"].items():
+		then = baseline["cases"].get(name)
+		if then is None:
+			print(f"{name}: new, not in the baseline")
+			continue
+		changes = []
+		for stage in stages:
+			before, after = then[stage], now[stage]
+			ratio = after / before if before > 0 else 1.0
+			slower = ratio > 1 + threshold and after - before >= min_seconds
+			if slower:
+				regressions.append((name, stage, before, after))
+			changes.append(f"{stage} {ratio:5.2f}x{' SLOWER' if slower else ''}")
+		if not _isclose(then["volume"], now["volume"]) or then["triangles"] != now["triangles"]:
+			changes.append("part changed")
+		print(f"{name:<60} {', '.join(changes)}")
+
+	for name in baseline["cases"].keys() - current["cases"].keys():
+		print(f"{name}: in the baseline, not measured now")
+
+	for name, stage, before, after in regressions:
+		print(f"regression: {name} {stage} {before * 1000:.1f}ms -> {after * 1000:.1f}ms")
+	return regressions
+
+
+def _isclose(a: float, b: float) -> bool:
+	return abs(a - b) <= 1e-9 * max(abs(a), abs(b), 1.0)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark every part generator.")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	run_parser = commands.add_parser("run", help="time the parts")
+	run_parser.add_argument('--repeat', type=int, default=3)
+	run_parser.add_argument('--only', action="append", default=[], metavar='GLOB',
+						 help='only parts whose name matches, like "bend_radius/*" (repeatable)')
+	run_parser.add_argument('--save', type=Path, metavar='FILE',
+						 help='write the results to this JSON file')
+	run_parser.add_argument('--baseline', type=Path, metavar='FILE',
+						 help='compare the results with this earlier --save')
+
+	compare_parser = commands.add_parser("compare", help="compare two saved results")
+	compare_parser.add_argument('baseline_file', type=Path, metavar='BASELINE')
+	compare_parser.add_argument('current_file', type=Path, metavar='CURRENT')
+
+	for sub in (run_parser, compare_parser):
+		sub.add_argument('--threshold', type=float, default=0.15,
+						 help='flag steps this fraction slower than the baseline (default %(default)s)')
+		sub.add_argument('--min-seconds', type=float, default=0.01,
+						 help="and at least this much slower, shorter changes are noise (default %(default)s)")
+	args = parser.parse_args()
+
+	if args.command == "run":
+		current = run(args.repeat, args.only)
+		if args.save is not None:
+			args.save.write_text(json.dumps(current, indent="\t", sort_keys=True) + "\n")
+		if args.baseline is None:
+			return
+		baseline = read_results(args.baseline)
+	else:
+		baseline = read_results(args.baseline_file)
+		current = read_results(args.current_file)
+
+	if compare(baseline, current, args.threshold, args.min_seconds):
+		sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,99 @@
+"""Startup time of every entry point, in fresh interpreters.
+
+	python bench/bench_startup.py [--runs 5]
+
+For each script this times a plain import under a non __main__ name (which
+must not build anything) and `--help` for the scripts that have a command
+line, and reports whether cadquery or OCP got loaded on the way.
+"""
+from pathlib import Path
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+repo_dir = Path(__file__).resolve().parent.parent
+
+# script, whether it has a command line to ask for --help
+entry_points = [
+	("misc_multi_holder/multi_holder.py", True),
+	("bend_radius/bend_radius.py", True),
+	("ltt_screwdriver_bit_spacer/ltt_screwdriver_bit_spacer.py", True),
+	("washer/washer.py", True),
+	("washer_for_towel_roll_holder/washer.py", True),
+	("wolfbox_mf100_holder/wolfbox_mf100_holder.py", False),
+	("_old/vessel_tx76u_holder/vessel_tx76u_holder.py", False),
+]
+
+import_probe = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("bench_target", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+# registered like a real import, dataclasses look their module up here
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+seconds = time.perf_counter() - start
+# the script put the repo root on sys.path
+from cad_common.lazy import is_loaded
+print(json.dumps({
+	"seconds": seconds,
+	"cadquery": is_loaded("cadquery"),
+	"OCP": "OCP" in sys.modules,
+}))
+"""
+
+
+def time_import(script: Path, runs: int):
+	times = []
+	loaded = {}
+	for _ in range(runs):
+		out = subprocess.run(
+			[sys.executable, "-c", import_probe, str(script)],
+			cwd=script.parent,
+			capture_output=True,
+			text=True,
+			check=True,
+		).stdout
+		loaded = json.loads(out.strip().splitlines()[-1])
+		times.append(loaded.pop("seconds"))
+	return times, loaded
+
+
+def time_help(script: Path, runs: int):
+	times = []
+	for _ in range(runs):
+		start = time.perf_counter()
+		subprocess.run(
+			[sys.executable, str(script), "--help"],
+			cwd=script.parent,
+			capture_output=True,
+			check=True,
+		)
+		times.append(time.perf_counter() - start)
+	return times
+
+
+def main():
+	parser = argparse.ArgumentParser()
+	parser.add_argument('--runs', type=int, default=5)
+	args = parser.parse_args()
+
+	print(f"{'entry point':<56} {'import':>9} {'--help':>9}  loaded")
+	for rel_path, has_cli in entry_points:
+		script = repo_dir.joinpath(rel_path)
+		import_times, loaded = time_import(script, args.runs)
+		help_text = "-"
+		if has_cli:
+			help_text = f"{statistics.median(time_help(script, args.runs)) * 1000:7.0f}ms"
+		heavy = [name for name, is_loaded in loaded.items() if is_loaded]
+		print(
+			f"{rel_path:<56} {statistics.median(import_times) * 1000:7.0f}ms {help_text:>9}"
+			f"  {', '.join(heavy) if heavy else 'nothing heavy'}"
+		)
+
+
+if __name__ == "__main__":
+	main()
@@ -7,14 +7,30 @@ radius = 16
 
 # === variables end ===
 from dataclasses import dataclass, field
-import cadquery as cq  # noqa
-import cqgridfinity as cqg  # noqa
 import math  # noqa
 from pathlib import Path # noqa
-from cadquery import exporters
 from decimal import Decimal
 import argparse
+import functools
+import sys
+import time
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+from cad_common import booleans
+from cad_common.manifest import BuildManifest, module_sources, part_digest, source_digest
+from cad_common import artifacts, sweep, tessellation, trace
 # pylint: skip-file
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -42,27 +58,15 @@ class Spacer:
 
 Version = SemVer(1, 2, 0)
 
-def or_models(models):
-	main_result = None
-
-	for model in models:
-		if main_result is None:
-			main_result = model
-		else:
-			main_result = main_result.union(model)
+# what the STLs are meshed with unless --stl-* picks a mesh policy
+stl_tolerance = 0.0002
+stl_angular_tolerance = 0.08
 
-	return main_result
+def or_models(models):
+	return booleans.fuse_models(models)
 
 def cut_models(models):
-	main_result = None
-
-	for model in models:
-		if main_result is None:
-			main_result = model
-		else:
-			main_result = main_result.cut(model)
-
-	return main_result
+	return booleans.cut_models(models)
 
 def filbottop(model, fillet_size, chamfer_size):
 	washer = model
@@ -82,7 +86,42 @@ def filbottop(model, fillet_size, chamfer_size):
 	return washer
 
 
-def make_spacer(spacer):
+# the braces and wedges don't depend on the radius, a sweep builds them
+# once and every gauge trims copies of them to its ring
+
+@functools.lru_cache(maxsize=None)
+def _brace(length):
+	"""One filleted brace bar along X, long enough for any gauge up to length / 2 radius."""
+	brace = cq.Workplane("XY").rect(length, 8.5).extrude(2)
+	return filbottop(brace, 0.7, 0.5)
+
+
+@functools.lru_cache(maxsize=None)
+def _wedge():
+	profile = (
+		cq.Workplane("XZ")
+		.polyline([
+			(0, 0),
+			(2 * 4, 0),
+			(2 * 4, 2 * 4),
+			(0, 0)
+		])
+		.close()
+	)
+
+	wsize = 7.1
+	wedge = profile.extrude(wsize).translate([-1, wsize / 2, 0])
+	wedge = (
+		wedge
+		.faces("<<Z[1]")
+		.edges("(>Y and >Z and <X) or (<Y and >Z and <X)")
+		.fillet(1)
+	)
+	return wedge
+
+
+def make_spacer(spacer, brace_length=0.0):
+	"""brace_length builds the braces at least that long, so a sweep shares one."""
 	do_braces = True
 
 	ring_thickness = 5
@@ -112,145 +151,157 @@ def make_spacer(spacer):
 	washer = cq.Workplane("XY").circle(outer_r).circle(inner_r).extrude(thickness)
 	washer_cut = cq.Workplane("XY").circle(outer_r_cut).circle(cur_inner_r).extrude(thickness * 10).translate((0, 0, -(thickness * 5)))
 
-	lineX = cq.Workplane("XY").rect(outer_dia * 2, 8.5).extrude(2)
-	lineY = cq.Workplane("XY").rect(8.5, outer_dia * 2).extrude(2)
-
-	lineX = filbottop(lineX, 0.7, 0.5)
-	lineY = filbottop(lineY, 0.7, 0.5)
-
-
-	single_line = False
-	if radius < 15.9999:
-		lineX = cq.Workplane("XY").rect(outer_dia * 2, outer_dia * 2).extrude(2)
-		lineY = lineX
-		single_line = True
-
-
-	lineX = lineX.cut(washer_cut)
-	lineY = lineY.cut(washer_cut)
-
-	profile = (
-		cq.Workplane("XZ")
-		.polyline([
-			(0, 0),
-			(2 * 4, 0),
-			(2 * 4, 2 * 4),
-			(0, 0)
-		])
-		.close()
-	)
-
-	wsize = 7.1
-	wedge = profile.extrude(wsize).translate([-1, wsize / 2, 0])
-	wedge = (
-		wedge
-		.faces("<<Z[1]")
-		.edges("(>Y and >Z and <X) or (<Y and >Z and <X)")
-		.fillet(1)
-	)
+	with trace.span("braces", spacer=spacer.name, diameter=spacer.diameter):
+		single_line = False
+		if radius < 15.9999:
+			lineX = cq.Workplane("XY").rect(outer_dia * 2, outer_dia * 2).extrude(2)
+			lineX = lineX.cut(washer_cut)
+			lineY = lineX
+			single_line = True
+		else:
+			# the bar's ends are past the ring and cut off, so any length does
+			lineX = _brace(max(float(brace_length), outer_dia * 2)).cut(washer_cut)
+			# washer_cut is round, the Y brace is the trimmed X one turned
+			lineY = lineX.rotate((0, 0, 0), (0, 0, 1), 90)
 
 	# return wedge, spacer
 
 
 
-	washer = filbottop(washer, 1, 1)
+	with trace.span("ring fillets", spacer=spacer.name):
+		washer = filbottop(washer, 1, 1)
 
-	out = washer
-	if do_braces:
-		out = or_models({washer, lineX, lineY})
+	with trace.span("fuse", spacer=spacer.name, single_line=single_line):
+		out = washer
+		if do_braces:
+			# a single line is one brace, lineY is the same shape
+			out = or_models([washer, lineX] if single_line else [washer, lineX, lineY])
 
-		if single_line:
-			cs = radius - 5
+			if single_line:
+				cs = radius - 5
 
-			if cs > 2:
-				cs = 2
+				if cs > 2:
+					cs = 2
 
-			if math.isclose(radius, 20, abs_tol=0.04):
-				cs = 1.90
+				if math.isclose(radius, 20, abs_tol=0.04):
+					cs = 1.90
 
-			if math.isclose(radius, 20.25, abs_tol=0.03):
-				cs = 1.5
+				if math.isclose(radius, 20.25, abs_tol=0.03):
+					cs = 1.5
 
-			if radius > 20.25:
-				cs = 1.5
+				if radius > 20.25:
+					cs = 1.5
 
-			if radius > 28:
-				cs = 1
+				if radius > 28:
+					cs = 1
 
 
-			if cs >= 0.0001:
-				out = (
-					out
-					.faces("<Z[1]")
-					.edges(">X or >Y or <X or <Y")
-					.chamfer(cs)
-				)
-		else:
-			orl = {out}
-			trn = ((inner_dia / 2) - 2, 0, 2)
-			trans = [
-				{"trn": trn, "rot": 0},
-				{"trn": trn, "rot": 90},
-				{"trn": trn, "rot": 180},
-				{"trn": trn, "rot": -90},
-			]
-			for tran in trans:
-				tw = wedge.translate(tran["trn"]).rotate(
-					(0, 0, 0),
-					(0, 0, 1),
-					tran["rot"]
-				)
-
-				tw = tw.cut(washer_cut)
-				orl.add(tw)
-			out = or_models(orl)
+				if cs >= 0.0001:
+					out = (
+						out
+						.faces("<Z[1]")
+						.edges(">X or >Y or <X or <Y")
+						.chamfer(cs)
+					)
+			else:
+				orl = [out]
+				trn = ((inner_dia / 2) - 2, 0, 2)
+				with trace.span("wedge", spacer=spacer.name):
+					# trim one wedge, the other three are it turned around the round cut
+					tw = _wedge().translate(trn).cut(washer_cut)
+				for rot in (0, 90, 180, -90):
+					orl.append(tw.rotate(
+						(0, 0, 0),
+						(0, 0, 1),
+						rot
+					))
+				out = or_models(orl)
 
 
 
 	return out, spacer
 
-def loop_output(out_dir_base):
-
-	step = Decimal("0.25") * 2
-	diameter = 4 * (Decimal("0.25") * 2)
-	while diameter <= Decimal('70.0') * 2:
-		radius = diameter / Decimal("2")
+def build_gauge(spacer, out_dir, brace_length, mesh_policy=None, store=None):
+	"""Make and export one gauge of the sweep, returns ({path: export seconds}, build seconds).
+
+	With store the files go straight into the artifact store, out_dir gets the pointers.
+	"""
+	start = time.perf_counter()
+	with trace.span("make_spacer", spacer=spacer.name, params=spacer):
+		result, spacer = make_spacer(spacer=spacer, brace_length=brace_length)
+	build_seconds = time.perf_counter() - start
+
+	name = str(out_dir.joinpath(
+			f"{spacer.name} {str(spacer.version)}"
+		))
+	name = name.replace(".", "\u2024")
+	files = {}
+
+	start = time.perf_counter()
+	with trace.span("export", cat="export", file=Path(name).name + ".step"):
+		artifacts.export(
+			result,
+			name + ".step",
+			store=store,
+		)
+	files[Path(name + ".step")] = time.perf_counter() - start
+
+	start = time.perf_counter()
+	with trace.span("export", cat="export", file=Path(name).name + ".stl", adaptive=mesh_policy is not None):
+		if mesh_policy is not None:
+			with artifacts.writing(Path(name + ".stl"), store) as stl_path:
+				report = tessellation.export_stl(result, stl_path, policy=mesh_policy)
+			print(f"meshed \"{spacer.name}\": {report.Summary()}")
+		else:
+			artifacts.export(
+				result,
+				name + ".stl",
+				store=store,
+				tolerance = stl_tolerance,
+				angularTolerance = stl_angular_tolerance,
+			)
+	files[Path(name + ".stl")] = time.perf_counter() - start
+	return files, build_seconds
+
+def loop_output(out_dir_base, radii, force=False, mesh_policy=None, store=None, jobs=1):
+	manifest = BuildManifest(out_dir_base, force=force)
+	sources = [source_digest(Path(__file__)), *module_sources(Path(__file__))]
+
+	out_dir = out_dir_base
+	out_dir.mkdir(parents=True, exist_ok=True)
 
-		out_dir = out_dir_base
-		out_dir.mkdir(parents=True, exist_ok=True)
+	# long enough for the biggest gauge, every gauge shares the one brace
+	brace_length = float(max(radii, default=0)) * 4
 
+	parts = []
+	for radius in radii:
 		spacer = Spacer(
 			name=f"bend radius gauge {radius:.3f} mm",
 			version=Version,
 			thickness=thickness,
-			diameter=float(diameter),
-		)
-		print(f"making \"{spacer.name}\"")
-
-		result, spacer = make_spacer(spacer=spacer)
-
-		name = str(out_dir.joinpath(
-				f"{spacer.name} {str(spacer.version)}"
-			))
-		name = name.replace(".", "\u2024")
-		exporters.export(
-			result,
-			name + ".step"
+			diameter=float(radius * 2),
 		)
+		stl_settings = mesh_policy if mesh_policy is not None else [stl_tolerance, stl_angular_tolerance]
+		parts.append(sweep.SweepPart(
+			part=f"{spacer.name} {str(spacer.version)}",
+			digest=part_digest(spacer, spacer.version, sources, extra={"stl": stl_settings}),
+			args=(spacer, out_dir, brace_length, mesh_policy, store),
+		))
 
-		exporters.export(
-			w=result,
-			fname = name + ".stl",
-			tolerance = 0.0002,
-			angularTolerance = 0.08,
-		)
-		diameter += step
+	return sweep.run(parts, build_gauge, manifest, jobs=jobs, store=store)
 
 def main():
 	parser = argparse.ArgumentParser()
 	parser.add_argument('-l', '--loop', action="store_true",
-					 help='loop over 0.5 to 10mm spacers')
+					 help='build every gauge from --min to --max radius')
+	parser.add_argument('-f', '--force', action="store_true",
+					 help='with --loop, rebuild spacers even if the build manifest says they are up to date')
+	sweep.add_arguments(parser, Decimal("1"), Decimal("70"), Decimal("0.25"), what="radius")
+	artifacts.add_arguments(parser)
+	tessellation.add_arguments(parser)
+	trace.add_arguments(parser)
 	args = parser.parse_args()
+	trace.enable_from_args(args)
 
 
 	try:
@@ -266,7 +317,14 @@ def main():
 	out_dir.mkdir(parents=True, exist_ok=True)
 
 	if args.loop:
-		loop_output(out_dir)
+		loop_output(
+			out_dir,
+			sweep.values_from_args(args, parser),
+			force=args.force,
+			mesh_policy=tessellation.policy_from_args(args),
+			store=artifacts.store_from_args(args),
+			jobs=args.jobs,
+		)
 		return
 
 	spacer = Spacer(
@@ -279,7 +337,7 @@ def main():
 	result, spacer = make_spacer(spacer=spacer)
 	show_object(result, name=spacer.name+" v"+str(spacer.version))
 	if __name__ == "__main__":
-		exporters.export(
+		cq.exporters.export(
 			result,
 			str(out_dir.joinpath(
 				f"{spacer.name} {str(spacer.version)}.step"
@@ -287,4 +345,5 @@ def main():
 		)
 
 
-main()
+if __name__ == "__main__" or _in_cq_editor:
+	main()
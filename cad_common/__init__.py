@@ -0,0 +1,5 @@
+"""Helpers shared by the part scripts in this repo.
+
+The scripts put the repo root on sys.path themselves, so they keep
+working when run from their own folder or from cq-editor.
+"""
@@ -0,0 +1,345 @@
+"""Content addressed store for the files the part scripts write.
+
+Sweeps write hundreds of STEP and STL files that are each written in full
+and most of which never change again. With a store, each file is
+compressed (zstd when the zstandard package is installed, gzip otherwise)
+into `<repo>/.cache/artifacts` under the sha256 of its content, and its
+name in `out/` becomes a one line pointer to it. A content that is
+already in the store isn't written again, the pointer is all that's left.
+
+The scripts export into the store directly (export() and writing()), so
+the full size file never lands in `out/`. STEP files are written to
+memory and hashed and compressed from there. STL writers only take a
+path, those write to a temporary file in the store that is hashed and
+compressed in chunks and then removed.
+
+STEP files carry the time they were written in their header, that is left
+out of the hash so the same part exported twice is stored once.
+
+Pointers are turned back into the real files (and the other way round)
+with
+
+	python -m cad_common.artifacts checkout bend_radius/out
+	python -m cad_common.artifacts store bend_radius/out
+	python -m cad_common.artifacts stats bend_radius/out
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Optional, Tuple
+import argparse
+import gzip
+import hashlib
+import io
+import os
+import re
+import shutil
+import threading
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+
+default_store_dir = Path(__file__).resolve().parent.parent.joinpath(".cache", "artifacts")
+
+pointer_prefix = b"cad artifact sha256:"
+# pointers are tiny, anything bigger isn't read to check
+pointer_max_bytes = 200
+# files are hashed and compressed this much at a time
+_chunk_size = 1 << 20
+
+_step_file_name = re.compile(rb"(FILE_NAME\s*\(\s*'(?:[^']|'')*'\s*,\s*)'[^']*'")
+
+
+def _zstandard():
+	try:
+		import zstandard
+	except ImportError:
+		return None
+	return zstandard
+
+
+def content_key(data: bytes) -> str:
+	"""sha256 of a file's content, without the time a STEP file was written."""
+	if data.startswith(b"ISO-10303-21;"):
+		end = data.find(b"ENDSEC;")
+		if end != -1:
+			header = _step_file_name.sub(rb"\1''", data[:end], count=1)
+			data = header + data[end:]
+	return hashlib.sha256(data).hexdigest()
+
+
+def read_pointer(path: Path) -> Optional[Tuple[str, int]]:
+	"""(key, size) if path is a pointer file, else None."""
+	path = Path(path)
+	try:
+		if path.stat().st_size > pointer_max_bytes:
+			return None
+		text = path.read_bytes()
+	except OSError:
+		return None
+	if not text.startswith(pointer_prefix):
+		return None
+	try:
+		key, size = text[len(pointer_prefix):].split()
+		return key.decode(), int(size)
+	except ValueError:
+		return None
+
+
+def file_key(path: Path) -> str:
+	"""The store key of path, whether it is a pointer or the real file."""
+	pointer = read_pointer(path)
+	if pointer is not None:
+		return pointer[0]
+	return content_key(Path(path).read_bytes())
+
+
+def _tmp_path(path: Path) -> Path:
+	return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+	tmp_path = _tmp_path(path)
+	tmp_path.write_bytes(data)
+	tmp_path.replace(path)
+
+
+class ArtifactStore:
+	"""Compressed files by content, blobs are `objects/<2 hex>/<rest>.zst|.gz`.
+
+	Safe to use from several threads and processes, blobs are written under
+	a temporary name and renamed into place.
+	"""
+
+	codecs = ("zst", "gz")
+
+	def __init__(self, root: Path = default_store_dir, codec: Optional[str] = None) -> None:
+		self.root = Path(root)
+		if codec is None:
+			codec = "zst" if _zstandard() is not None else "gz"
+		if codec not in self.codecs:
+			raise ValueError(f"unknown codec {codec!r}, use one of {', '.join(self.codecs)}")
+		if codec == "zst" and _zstandard() is None:
+			raise ModuleNotFoundError("zst needs the zstandard package", name="zstandard")
+		self.codec = codec
+
+	def _blob_path(self, key: str, codec: str) -> Path:
+		return self.root.joinpath("objects", key[:2], f"{key[2:]}.{codec}")
+
+	def Find(self, key: str) -> Optional[Path]:
+		"""The blob holding key in any codec, None if it isn't stored."""
+		for codec in self.codecs:
+			path = self._blob_path(key, codec)
+			if path.exists():
+				return path
+		return None
+
+	def Put(self, data: bytes) -> str:
+		"""Store data unless its content is already there, returns its key."""
+		key = content_key(data)
+		if self.Find(key) is None:
+			path = self._blob_path(key, self.codec)
+			path.parent.mkdir(parents=True, exist_ok=True)
+			if self.codec == "zst":
+				compressed = _zstandard().ZstdCompressor(level=10).compress(data)
+			else:
+				compressed = gzip.compress(data, compresslevel=6, mtime=0)
+			_write_atomic(path, compressed)
+		return key
+
+	def Get(self, key: str) -> bytes:
+		path = self.Find(key)
+		if path is None:
+			raise FileNotFoundError(f"artifact {key} isn't in the store \"{self.root}\"")
+		if path.suffix == ".zst":
+			zstandard = _zstandard()
+			if zstandard is None:
+				raise ModuleNotFoundError(f"\"{path}\" needs the zstandard package", name="zstandard")
+			return zstandard.ZstdDecompressor().decompress(path.read_bytes())
+		return gzip.decompress(path.read_bytes())
+
+	def PutFile(self, path: Path) -> Tuple[str, int]:
+		"""Store the file at path unless its content is already there, returns (key, size).
+
+		Hashed and compressed in chunks, a big STL is never in memory whole.
+		"""
+		with open(path, "rb") as f:
+			head = f.read(_chunk_size)
+			if head.startswith(b"ISO-10303-21;"):
+				# the header timestamp is cut out of the key, STEP files are read whole
+				data = head + f.read()
+				return self.Put(data), len(data)
+			digest = hashlib.sha256(head)
+			size = len(head)
+			while chunk := f.read(_chunk_size):
+				digest.update(chunk)
+				size += len(chunk)
+
+		key = digest.hexdigest()
+		if self.Find(key) is None:
+			blob_path = self._blob_path(key, self.codec)
+			blob_path.parent.mkdir(parents=True, exist_ok=True)
+			tmp_path = _tmp_path(blob_path)
+			with open(path, "rb") as src, open(tmp_path, "wb") as dst:
+				if self.codec == "zst":
+					# with the size the frame header says how big it is, decompress() needs that
+					_zstandard().ZstdCompressor(level=10).copy_stream(src, dst, size=size)
+				else:
+					with gzip.GzipFile(filename="", mode="wb", fileobj=dst, compresslevel=6, mtime=0) as gz:
+						shutil.copyfileobj(src, gz, _chunk_size)
+			tmp_path.replace(blob_path)
+		return key, size
+
+	def _point(self, path: Path, key: str, size: int) -> None:
+		_write_atomic(path, pointer_prefix + f"{key} {size}\n".encode())
+
+	def Write(self, path: Path, data: bytes) -> str:
+		"""Store data and put a pointer to it at path, data never gets written out in full."""
+		key = self.Put(data)
+		self._point(Path(path), key, len(data))
+		return key
+
+	@contextmanager
+	def Writing(self, path: Path) -> Iterator[Path]:
+		"""A temporary file in the store to write path's content to.
+
+		When the block ends the file is stored and removed, path gets the pointer.
+		"""
+		tmp_dir = self.root.joinpath("tmp")
+		tmp_dir.mkdir(parents=True, exist_ok=True)
+		# same name at the end, cadquery picks the format by the extension
+		tmp_path = tmp_dir.joinpath(f"{os.getpid()}.{threading.get_ident()}.{Path(path).name}")
+		try:
+			yield tmp_path
+			self._point(Path(path), *self.PutFile(tmp_path))
+		finally:
+			tmp_path.unlink(missing_ok=True)
+
+	def Store(self, path: Path) -> str:
+		"""Move the file at path into the store and leave a pointer in its place."""
+		path = Path(path)
+		pointer = read_pointer(path)
+		if pointer is not None:
+			return pointer[0]
+		key, size = self.PutFile(path)
+		self._point(path, key, size)
+		return key
+
+	def Checkout(self, path: Path) -> bool:
+		"""Replace the pointer at path with the file it points to, False if it isn't one."""
+		path = Path(path)
+		pointer = read_pointer(path)
+		if pointer is None:
+			return False
+		_write_atomic(path, self.Get(pointer[0]))
+		return True
+
+
+@contextmanager
+def writing(path: Path, store: Optional[ArtifactStore] = None) -> Iterator[Path]:
+	"""Where to write path, path itself or with a store a temporary file in it (see Writing)."""
+	if store is None:
+		yield Path(path)
+	else:
+		with store.Writing(path) as tmp_path:
+			yield tmp_path
+
+
+def step_bytes(shape_or_workplane: Any) -> bytes:
+	"""A STEP file of shape_or_workplane in memory, written like cadquery's exporter writes it."""
+	from cadquery.occ_impl.shapes import compound
+	from OCP.IFSelect import IFSelect_ReturnStatus
+	from OCP.Interface import Interface_Static
+	from OCP.STEPControl import STEPControl_AsIs, STEPControl_Writer
+
+	if isinstance(shape_or_workplane, cq.Shape):
+		shape = shape_or_workplane
+	else:
+		shape = compound(*shape_or_workplane)
+
+	# cadquery's Shape.exportStep settings
+	writer = STEPControl_Writer()
+	Interface_Static.SetIVal_s("write.surfacecurve.mode", 1)
+	Interface_Static.SetIVal_s("write.precision.mode", 0)
+	Interface_Static.SetCVal_s("xstep.cascade.unit", "MM")
+	Interface_Static.SetCVal_s("write.step.unit", "MM")
+	writer.Transfer(shape.wrapped, STEPControl_AsIs)
+	stream = io.BytesIO()
+	if writer.WriteStream(stream) != IFSelect_ReturnStatus.IFSelect_RetDone:
+		raise OSError("couldn't write STEP")
+	return stream.getvalue()
+
+
+def export(shape_or_workplane: Any, path: Path, store: Optional[ArtifactStore] = None, **kwargs: Any) -> None:
+	"""cadquery's exporters.export, into store when there is one.
+
+	A STEP file goes from memory into the store, other formats through a
+	temporary file in it, path only gets the pointer.
+	"""
+	path = Path(path)
+	if store is not None and path.suffix.lower() == ".step" and not kwargs:
+		store.Write(path, step_bytes(shape_or_workplane))
+		return
+	with writing(path, store) as target:
+		cq.exporters.export(shape_or_workplane, str(target), **kwargs)
+
+
+def _files(dirs: Iterable[Path]) -> Iterator[Path]:
+	from cad_common.manifest import manifest_name
+
+	for directory in dirs:
+		for path in sorted(Path(directory).rglob("*")):
+			if path.is_file() and path.name != manifest_name and not path.name.endswith(".tmp"):
+				yield path
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+	"""The --store option of the scripts with sweeps."""
+	parser.add_argument('--store', action="store_true",
+					 help=f'keep the output files compressed in {default_store_dir}, '
+					 'out/ gets pointers to them (python -m cad_common.artifacts checkout out)')
+
+
+def store_from_args(args: argparse.Namespace) -> Optional[ArtifactStore]:
+	return ArtifactStore() if args.store else None
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(
+		prog="python -m cad_common.artifacts",
+		description="Move output files into the artifact store, or back out of it.",
+	)
+	parser.add_argument('command', choices=("store", "checkout", "stats"))
+	parser.add_argument('dirs', nargs='+', type=Path, metavar='DIR')
+	parser.add_argument('--root', type=Path, default=default_store_dir,
+					 help='store directory (default %(default)s)')
+	args = parser.parse_args()
+
+	store = ArtifactStore(args.root)
+	if args.command == "store":
+		count = sum(1 for path in _files(args.dirs) if read_pointer(path) is None and store.Store(path))
+		print(f"stored {count} files")
+	elif args.command == "checkout":
+		count = sum(1 for path in _files(args.dirs) if store.Checkout(path))
+		print(f"checked out {count} files")
+	else:
+		files = 0
+		size = 0
+		keys = set()
+		for path in _files(args.dirs):
+			pointer = read_pointer(path)
+			if pointer is None:
+				continue
+			files += 1
+			size += pointer[1]
+			keys.add(pointer[0])
+		stored = sum(store.Find(key).stat().st_size for key in keys if store.Find(key) is not None)
+		print(
+			f"{files} pointers to {len(keys)} artifacts, "
+			f"{size / 1e6:.1f} MB of files in {stored / 1e6:.1f} MB"
+		)
+
+
+if __name__ == "__main__":
+	main()
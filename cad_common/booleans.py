@@ -0,0 +1,286 @@
+"""N-ary booleans shared by the part scripts.
+
+Folding a list of parts one `union`/`cut`/`intersect` at a time rebuilds the
+growing result on every step. These helpers hand OCC every argument in one
+boolean instead (strategy "nary"), or fold them as a balanced tree ("tree"),
+with "fold" kept as the old one-at-a-time behaviour to compare against.
+
+Arguments are used in the order given. Sets are refused, the order they
+iterate in changes from run to run and so would the result.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+import time
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+
+boolean_ops = ("fuse", "cut", "common")
+boolean_strategies = ("nary", "tree", "fold")
+
+
+@dataclass
+class BooleanOptions:
+	strategy: str = "nary"
+	# OCC's own multi threading inside a single boolean
+	parallel: bool = True
+	# fuzzy tolerance in mm, 0 is exact
+	fuzzy: float = 0.0
+	# oriented bounding boxes to skip pairs that can't touch
+	use_obb: bool = True
+	# unify same domain faces/edges afterwards, like Workplane.union(clean=True)
+	clean: bool = True
+
+
+default_options = BooleanOptions()
+
+
+@contextmanager
+def use_options(**changes) -> Iterator[BooleanOptions]:
+	"""Temporarily change default_options, for benchmarks and experiments."""
+	global default_options
+	old_options = default_options
+	default_options = replace(old_options, **changes)
+	try:
+		yield default_options
+	finally:
+		default_options = old_options
+
+
+def _options(options: Optional[BooleanOptions]) -> BooleanOptions:
+	options = options if options is not None else default_options
+	if options.strategy not in boolean_strategies:
+		raise ValueError(f"unknown boolean strategy {options.strategy!r}, use one of {boolean_strategies}")
+	return options
+
+
+def to_shapes(objects: Iterable[Any]) -> List[cq.Shape]:
+	"""Flatten Workplanes and Shapes into a list of Shapes, keeping their order."""
+	if isinstance(objects, (set, frozenset)):
+		raise TypeError("booleans need an ordered sequence, not a set")
+
+	shapes = []
+	for obj in objects:
+		if isinstance(obj, cq.Workplane):
+			vals = [val for val in obj.vals() if isinstance(val, cq.Shape)]
+			if len(vals) == 0:
+				raise ValueError("workplane has no shapes to use in a boolean")
+			shapes.append(vals[0] if len(vals) == 1 else cq.Compound.makeCompound(vals))
+		elif isinstance(obj, cq.Shape):
+			shapes.append(obj)
+		else:
+			raise TypeError(f"can't use {type(obj).__name__} in a boolean")
+	return shapes
+
+
+def _shape_list(shapes: Iterable[cq.Shape]) -> TopTools_ListOfShape:
+	from OCP.TopTools import TopTools_ListOfShape
+
+	shape_list = TopTools_ListOfShape()
+	for shape in shapes:
+		shape_list.Append(shape.wrapped)
+	return shape_list
+
+
+def _configure(op, options: BooleanOptions) -> None:
+	op.SetRunParallel(options.parallel)
+	op.SetUseOBB(options.use_obb)
+	if options.fuzzy > 0:
+		op.SetFuzzyValue(options.fuzzy)
+
+
+def boolean_op(
+	operation: str,
+	arguments: Sequence[cq.Shape],
+	tools: Sequence[cq.Shape],
+	options: Optional[BooleanOptions] = None,
+) -> BRepAlgoAPI_BooleanOperation:
+	"""Run one OCC boolean ("fuse", "cut" or "common") with every argument and tool at once.
+
+	Returns the built operation so callers can read its history.
+	"""
+	from OCP.BRepAlgoAPI import BRepAlgoAPI_Common, BRepAlgoAPI_Cut, BRepAlgoAPI_Fuse
+
+	if operation not in boolean_ops:
+		raise ValueError(f"unknown boolean {operation!r}, use one of {boolean_ops}")
+	op = {"fuse": BRepAlgoAPI_Fuse, "cut": BRepAlgoAPI_Cut, "common": BRepAlgoAPI_Common}[operation]()
+
+	options = _options(options)
+	op.SetArguments(_shape_list(arguments))
+	op.SetTools(_shape_list(tools))
+	_configure(op, options)
+	op.Build()
+	if not op.IsDone():
+		raise RuntimeError(
+			f"{type(op).__name__} failed for {len(arguments)} arguments and {len(tools)} tools"
+		)
+	return op
+
+
+def _finish(shape, options: BooleanOptions) -> cq.Shape:
+	shape = cq.Shape.cast(shape)
+	if options.clean:
+		shape = shape.clean()
+	return shape
+
+
+def _tree(shapes: List[cq.Shape], pair) -> cq.Shape:
+	while len(shapes) > 1:
+		shapes = [
+			pair(shapes[i], shapes[i + 1]) if i + 1 < len(shapes) else shapes[i]
+			for i in range(0, len(shapes), 2)
+		]
+	return shapes[0]
+
+
+def _fold(shapes: List[cq.Shape], pair) -> cq.Shape:
+	result = shapes[0]
+	for shape in shapes[1:]:
+		result = pair(result, shape)
+	return result
+
+
+def fuse(objects: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Shape:
+	"""Union of every object."""
+	options = _options(options)
+	shapes = to_shapes(objects)
+	if len(shapes) == 0:
+		raise ValueError("fuse needs at least one shape")
+	if len(shapes) == 1:
+		return shapes[0]
+
+	def pair(a, b):
+		return _finish(boolean_op("fuse", [a], [b], options).Shape(), options)
+
+	if options.strategy == "tree":
+		return _tree(shapes, pair)
+	if options.strategy == "fold":
+		return _fold(shapes, pair)
+	return _finish(boolean_op("fuse", shapes[:1], shapes[1:], options).Shape(), options)
+
+
+def cut(obj: Any, tools: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Shape:
+	"""obj minus every tool."""
+	options = _options(options)
+	shape = to_shapes([obj])[0]
+	tool_shapes = to_shapes(tools)
+	if len(tool_shapes) == 0:
+		return shape
+
+	def pair(a, b):
+		return _finish(boolean_op("cut", [a], [b], options).Shape(), options)
+
+	if options.strategy == "tree":
+		# fusing the tools first keeps the big shape to one boolean
+		return pair(shape, fuse(tool_shapes, options))
+	if options.strategy == "fold":
+		return _fold([shape] + tool_shapes, pair)
+	return _finish(boolean_op("cut", [shape], tool_shapes, options).Shape(), options)
+
+
+def common(objects: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Shape:
+	"""What every object has in common.
+
+	A single BRepAlgoAPI_Common with several tools would intersect the first
+	shape with the union of the rest, so the N-ary version goes through
+	BOPAlgo_CellsBuilder and keeps the cells inside every argument.
+	"""
+	options = _options(options)
+	shapes = to_shapes(objects)
+	if len(shapes) == 0:
+		raise ValueError("common needs at least one shape")
+	if len(shapes) == 1:
+		return shapes[0]
+
+	def pair(a, b):
+		return _finish(boolean_op("common", [a], [b], options).Shape(), options)
+
+	if options.strategy == "tree":
+		return _tree(shapes, pair)
+	if options.strategy == "fold" or len(shapes) == 2:
+		return _fold(shapes, pair)
+
+	from OCP.BOPAlgo import BOPAlgo_CellsBuilder
+	from OCP.TopTools import TopTools_ListOfShape
+
+	builder = BOPAlgo_CellsBuilder()
+	for shape in shapes:
+		builder.AddArgument(shape.wrapped)
+	_configure(builder, options)
+	builder.Perform()
+	if builder.HasErrors():
+		raise RuntimeError(f"common failed for {len(shapes)} shapes")
+
+	builder.AddToResult(_shape_list(shapes), TopTools_ListOfShape(), 0, False)
+	builder.RemoveInternalBoundaries()
+	return _finish(builder.Shape(), options)
+
+
+def fuse_models(models: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Workplane:
+	return cq.Workplane("XY").newObject([fuse(models, options)])
+
+
+def cut_models(models: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Workplane:
+	"""The first model minus all the others."""
+	models = list(models)
+	return cq.Workplane("XY").newObject([cut(models[0], models[1:], options)])
+
+
+def common_models(models: Iterable[Any], options: Optional[BooleanOptions] = None) -> cq.Workplane:
+	return cq.Workplane("XY").newObject([common(models, options)])
+
+
+def benchmark(
+	operation: str,
+	objects: Sequence[Any],
+	tools: Sequence[Any] = (),
+	strategies: Sequence[str] = boolean_strategies,
+	repeat: int = 3,
+	**option_changes,
+) -> List[Dict[str, Any]]:
+	"""Time operation ("fuse", "cut" or "common") with every strategy.
+
+	For "cut" objects is a single shape and tools the shapes taken away.
+	Returns one row per strategy with the best time, the volume and whether
+	the result is a valid shape, so a faster strategy that gives a different
+	part stands out.
+	"""
+	rows = []
+	for strategy in strategies:
+		options = replace(default_options, strategy=strategy, **option_changes)
+		best = None
+		for _ in range(repeat):
+			start = time.perf_counter()
+			if operation == "fuse":
+				result = fuse(objects, options)
+			elif operation == "cut":
+				result = cut(objects, tools, options)
+			elif operation == "common":
+				result = common(objects, options)
+			else:
+				raise ValueError(f"unknown boolean {operation!r}")
+			seconds = time.perf_counter() - start
+			best = seconds if best is None else min(best, seconds)
+		rows.append({
+			"operation": operation,
+			"strategy": strategy,
+			"seconds": best,
+			"volume": result.Volume(),
+			"valid": result.isValid(),
+		})
+	return rows
+
+
+def format_benchmark(name: str, rows: List[Dict[str, Any]]) -> str:
+	lines = [name]
+	slowest = max(row["seconds"] for row in rows)
+	for row in rows:
+		lines.append(
+			f"\t{row['operation']:>6} {row['strategy']:>4}: {row['seconds'] * 1000:9.1f} ms"
+			f" ({slowest / row['seconds']:.2f}x)  volume {row['volume']:.4f}"
+			f"{'' if row['valid'] else '  INVALID'}"
+		)
+	return "\n".join(lines)
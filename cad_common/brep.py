@@ -0,0 +1,24 @@
+"""Binary BREP round trips, for caches on disk and passing shapes between processes."""
+from __future__ import annotations
+import io
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+
+
+def shape_to_brep(shape: cq.Shape) -> bytes:
+	from OCP.BinTools import BinTools
+
+	stream = io.BytesIO()
+	BinTools.Write_s(shape.wrapped, stream)
+	return stream.getvalue()
+
+
+def shape_from_brep(data: bytes) -> cq.Shape:
+	from OCP.BinTools import BinTools
+	from OCP.TopoDS import TopoDS_Shape
+
+	shape = TopoDS_Shape()
+	BinTools.Read_s(shape, io.BytesIO(data))
+	return cq.Shape.cast(shape)
@@ -0,0 +1,166 @@
+"""Part catalogs kept in TOML files, and an index to query them.
+
+A catalog is read with tomllib into plain tables, so listing, searching and
+planning builds never needs cadquery. Each script turns the tables into its
+own part objects, `CatalogIndex` then looks those up by name or attribute:
+
+	index = CatalogIndex(holders)
+	index.where(gridfin_x=2, no_lip=True)
+"""
+from __future__ import annotations
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Tuple
+import tomllib
+
+
+class CatalogError(ValueError):
+	"""A catalog file that can't be turned into parts."""
+
+
+def read_catalog(path: Path) -> Dict[str, Any]:
+	path = Path(path)
+	try:
+		with path.open("rb") as f:
+			return tomllib.load(f)
+	except tomllib.TOMLDecodeError as e:
+		raise CatalogError(f"{path}: {e}") from None
+
+
+def resolve_like(tables: Iterable[Mapping[str, Any]], key: str = "name") -> List[Dict[str, Any]]:
+	"""Fill in `like = "<name>"` with the keys of the earlier table of that name."""
+	resolved: Dict[str, Dict[str, Any]] = {}
+	result = []
+	for table in tables:
+		table = dict(table)
+		like = table.pop("like", None)
+		if like is not None:
+			if like not in resolved:
+				raise CatalogError(f"{table.get(key)!r} is like {like!r}, which isn't defined before it")
+			table = {**resolved[like], **table}
+		if key not in table:
+			raise CatalogError(f"entry without a {key}: {table}")
+		if table[key] in resolved:
+			raise CatalogError(f"{table[key]!r} is defined twice")
+		resolved[table[key]] = table
+		result.append(table)
+	return result
+
+
+def expand_families(families: Iterable[Mapping[str, Any]], key: str = "name") -> List[Dict[str, Any]]:
+	"""Turn each family table into one table per variant.
+
+	key holds the list of variant names. Any other key with a list value
+	gives one value per variant, the rest are shared by all of them.
+	"""
+	tables = []
+	for family in families:
+		family = dict(family)
+		names = family.pop(key, None)
+		if not isinstance(names, list) or len(names) == 0:
+			raise CatalogError(f"family needs a list of {key}s, got {names!r}")
+		per_variant = {k: v for k, v in family.items() if isinstance(v, list)}
+		for k, values in per_variant.items():
+			if len(values) != len(names):
+				raise CatalogError(f"family {names[0]!r}: {k} has {len(values)} values for {len(names)} {key}s")
+		shared = {k: v for k, v in family.items() if k not in per_variant}
+		for i, name in enumerate(names):
+			tables.append({**shared, **{k: v[i] for k, v in per_variant.items()}, key: name})
+	return tables
+
+
+def parse_value(text: str) -> Any:
+	"""A command line value as TOML ("2", "true", "0.5"), or the plain string."""
+	try:
+		return tomllib.loads(f"value = {text}")["value"]
+	except tomllib.TOMLDecodeError:
+		return text
+
+
+def parse_condition(text: str) -> Tuple[str, Any]:
+	""""gridfin_x=2" -> ("gridfin_x", 2), for --where."""
+	attr, sep, value = text.partition("=")
+	if not sep or not attr.strip():
+		raise ValueError(f"expected attribute=value, got {text!r}")
+	return attr.strip(), parse_value(value.strip())
+
+
+def _index_key(value: Any) -> Hashable:
+	# numbers and strings match as themselves (2 == 2.0), anything else,
+	# like a version or a hole shape, by the text it prints as
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	return str(value)
+
+
+def _get_attr(part: Any, attr: str) -> Any:
+	for name in attr.split("."):
+		part = part[name] if isinstance(part, Mapping) else getattr(part, name)
+	return part
+
+
+class CatalogIndex:
+	"""Parts by name and by attribute value, without building any of them.
+
+	Attribute indexes are made the first time an attribute is queried.
+	Nested attributes are written with dots, "hole_shape.type_".
+	"""
+
+	def __init__(self, parts: Iterable[Any], key: str = "name") -> None:
+		self.parts = list(parts)
+		self.key = key
+		self._by_name = {_get_attr(part, key): part for part in self.parts}
+		self._by_attr: Dict[str, Dict[Hashable, List[int]]] = {}
+
+	def __len__(self) -> int:
+		return len(self.parts)
+
+	def __iter__(self):
+		return iter(self.parts)
+
+	def __contains__(self, name: str) -> bool:
+		return name in self._by_name
+
+	def __getitem__(self, name: str) -> Any:
+		return self._by_name[name]
+
+	def names(self) -> List[str]:
+		return list(self._by_name)
+
+	def _positions(self, attr: str) -> Dict[Hashable, List[int]]:
+		positions = self._by_attr.get(attr)
+		if positions is None:
+			positions = {}
+			for i, part in enumerate(self.parts):
+				try:
+					value = _get_attr(part, attr)
+				except (AttributeError, KeyError):
+					continue
+				positions.setdefault(_index_key(value), []).append(i)
+			self._by_attr[attr] = positions
+		return positions
+
+	def where(self, **conditions: Any) -> List[Any]:
+		"""The parts matching every condition, in catalog order.
+
+		A condition is attribute=value, or attribute=predicate for anything
+		other than equality, `where(hole_depth=lambda d: d > 20)`. Use
+		where_items() for dotted attribute names.
+		"""
+		return self.where_items(conditions.items())
+
+	def where_items(self, conditions: Iterable[Tuple[str, Any]]) -> List[Any]:
+		matches = set(range(len(self.parts)))
+		for attr, wanted in conditions:
+			if callable(wanted):
+				has_attr = {i for positions in self._positions(attr).values() for i in positions}
+				found = {
+					i for i in matches & has_attr
+					if wanted(_get_attr(self.parts[i], attr))
+				}
+			else:
+				found = set(self._positions(attr).get(_index_key(wanted), ()))
+			matches &= found
+		return [self.parts[i] for i in sorted(matches)]
+
+	def filter(self, predicate: Callable[[Any], bool]) -> List[Any]:
+		return [part for part in self.parts if predicate(part)]
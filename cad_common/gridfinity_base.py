@@ -0,0 +1,146 @@
+"""Library of solid Gridfinity bases shared by the holder scripts.
+
+Building `cqg.GridfinityBox(..., solid=True)` is the most expensive
+step every holder has in common, and a lot of holders ask for the same
+box. Bases are kept in memory and as binary BREP files on disk, keyed on
+everything that changes the box plus the cqgridfinity version.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import os
+
+from cad_common.brep import shape_from_brep, shape_to_brep
+from cad_common.lazy import lazy_import
+from cad_common import trace
+
+cq = lazy_import("cadquery")
+cqg = lazy_import("cqgridfinity")
+
+
+def default_cache_dir() -> Path:
+	env_dir = os.environ.get("CAD_CACHE_DIR")
+	if env_dir:
+		return Path(env_dir).joinpath("gridfinity_bases")
+	return Path(__file__).resolve().parent.parent.joinpath(".cache", "gridfinity_bases")
+
+
+def cqgridfinity_version() -> str:
+	try:
+		return metadata.version("cqgridfinity")
+	except metadata.PackageNotFoundError:
+		return getattr(cqg, "__version__", "unknown")
+
+
+@dataclass
+class GridfinityBase:
+	"""Stand-in for the GridfinityBox attributes the holders use."""
+	cq_obj: Any
+	height: float
+
+
+class GridfinityBaseLibrary:
+	def __init__(self, cache_dir: Optional[Path] = None, use_disk: bool = True) -> None:
+		self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+		self.use_disk = use_disk
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self._bases: Dict[Tuple, GridfinityBase] = {}
+
+	@staticmethod
+	def Key(
+		gridfin_x: int,
+		gridfin_y: int,
+		gridfin_height: float,
+		no_lip: bool,
+		solid_ratio: float,
+	) -> Tuple:
+		return (
+			"cqgridfinity",
+			cqgridfinity_version(),
+			int(gridfin_x),
+			int(gridfin_y),
+			float(gridfin_height),
+			bool(no_lip),
+			float(solid_ratio).hex(),
+		)
+
+	def _path(self, key: Tuple) -> Path:
+		digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+		return self.cache_dir.joinpath(f"{digest}.brep")
+
+	def GetBase(
+		self,
+		gridfin_x: int,
+		gridfin_y: int,
+		gridfin_height: float,
+		no_lip: bool,
+		solid_ratio: float,
+	) -> GridfinityBase:
+		key = self.Key(gridfin_x, gridfin_y, gridfin_height, no_lip, solid_ratio)
+
+		base = self._bases.get(key)
+		if base is not None:
+			self.hits += 1
+			return GridfinityBase(cq.Workplane("XY").newObject(base.cq_obj.vals()), base.height)
+
+		# the box object itself is cheap, only rendering cq_obj is slow
+		bh = cqg.GridfinityBox(
+			gridfin_x,
+			gridfin_y,
+			gridfin_height,
+			length_div=0,
+			width_div=0,
+			holes=False,
+			no_lip=no_lip,
+			scoops=False,
+			labels=False,
+			solid=True,
+			solid_ratio=solid_ratio
+		)
+
+		path = self._path(key)
+		shape = None
+		if self.use_disk and path.exists():
+			try:
+				with trace.span("gridfinity base from disk", path=path.name):
+					shape = shape_from_brep(path.read_bytes())
+				self.disk_hits += 1
+			except Exception as e:
+				print(f"ignoring unreadable gridfinity base \"{path}\": {e}")
+				shape = None
+
+		if shape is None:
+			self.misses += 1
+			with trace.span(
+				"cqg.GridfinityBox",
+				gridfin_x=gridfin_x,
+				gridfin_y=gridfin_y,
+				gridfin_height=gridfin_height,
+				no_lip=no_lip,
+				solid_ratio=solid_ratio,
+			):
+				shape = bh.cq_obj.val()
+			if self.use_disk:
+				self.cache_dir.mkdir(parents=True, exist_ok=True)
+				# write then rename so parallel builds never see half a file
+				tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+				tmp_path.write_bytes(shape_to_brep(shape))
+				tmp_path.replace(path)
+
+		base = GridfinityBase(cq.Workplane("XY").newObject([shape]), bh.height)
+		self._bases[key] = base
+		return GridfinityBase(cq.Workplane("XY").newObject([shape]), base.height)
+
+	def Clear(self, disk: bool = False) -> None:
+		self._bases.clear()
+		if disk and self.cache_dir.exists():
+			for path in self.cache_dir.glob("*.brep"):
+				path.unlink()
+
+
+base_library = GridfinityBaseLibrary()
@@ -0,0 +1,44 @@
+"""Lazy imports for the heavy CAD packages.
+
+cadquery and cqgridfinity take seconds to import because they pull in all of
+OCP. `lazy_import` hands back the module straight away and only runs it the
+first time an attribute is used, so `--help`, listing parts and dry runs
+never pay for it. OCP itself is a compiled module that can't be loaded
+lazily, code that needs it imports it inside the function that uses it.
+"""
+from __future__ import annotations
+from types import ModuleType
+import importlib.util
+import sys
+
+
+def lazy_import(name: str) -> ModuleType:
+	"""Return module name, loaded on first attribute access.
+
+	Later plain `import name` statements get the same module but load it
+	right away (the import system looks at its __spec__), so modules that
+	should stay lazy use this instead of `import`.
+	"""
+	module = sys.modules.get(name)
+	if module is not None:
+		return module
+
+	spec = importlib.util.find_spec(name)
+	if spec is None:
+		raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+	loader = importlib.util.LazyLoader(spec.loader)
+	spec.loader = loader
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	loader.exec_module(module)
+	return module
+
+
+def is_loaded(name: str) -> bool:
+	"""True once name was really imported, not just handed out lazily."""
+	module = sys.modules.get(name)
+	if module is None:
+		return False
+	# LazyLoader swaps the module's class back to ModuleType when it loads
+	return not isinstance(module, importlib.util._LazyModule)
@@ -0,0 +1,292 @@
+"""Build manifest that lets the part scripts skip parts that didn't change.
+
+Every `out/` directory gets a `.build_manifest.json` that maps each part's
+output name to a digest of its parameters, its SemVer, the source code that
+builds it (the script and the cad_common modules it imports) and the
+cadquery version, next to the files that were written for it with their
+sizes, mtimes and timings. A part is only built again when its digest
+changed or one of its files is missing or was touched since.
+
+Files kept in the artifact store (cad_common.artifacts) also have their
+store key recorded, so a pointer that was checked out into the real file,
+or stored again, still counts as the same file.
+"""
+from __future__ import annotations
+from dataclasses import fields, is_dataclass
+from decimal import Decimal
+from enum import Enum
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+import ast
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+
+from cad_common import artifacts
+
+manifest_name = ".build_manifest.json"
+manifest_format = 1
+
+
+def package_version(name: str) -> str:
+	try:
+		return metadata.version(name)
+	except metadata.PackageNotFoundError:
+		return "unknown"
+
+
+def canonical(value: Any) -> Any:
+	"""Turn part parameters into plain JSON data that hashes the same every run.
+
+	Floats are written with float.hex() so no digits are lost, objects become
+	their class name plus their attributes, and functions their qualified name
+	plus a hash of their source.
+	"""
+	if value is None or isinstance(value, (bool, int, str)):
+		return value
+	if isinstance(value, float):
+		return ["float", value.hex()]
+	if isinstance(value, Decimal):
+		return ["Decimal", str(value)]
+	if isinstance(value, Enum):
+		return [type(value).__qualname__, value.name]
+	if isinstance(value, Path):
+		return ["Path", value.as_posix()]
+	if isinstance(value, Mapping):
+		return ["dict", sorted(
+			([canonical(k), canonical(v)] for k, v in value.items()),
+			key=lambda item: json.dumps(item[0], sort_keys=True),
+		)]
+	if isinstance(value, (set, frozenset)):
+		return ["set", sorted(
+			(canonical(v) for v in value),
+			key=lambda item: json.dumps(item, sort_keys=True),
+		)]
+	if isinstance(value, (list, tuple)):
+		return [type(value).__name__, [canonical(v) for v in value]]
+	if inspect.isroutine(value) or inspect.isclass(value):
+		return ["code", value.__qualname__, _object_source_digest(value)]
+	if is_dataclass(value):
+		# compare=False fields are caches, not part of the value
+		attrs = {f.name: getattr(value, f.name) for f in fields(value) if f.compare}
+	elif hasattr(value, "__dict__"):
+		attrs = vars(value)
+	elif hasattr(value, "__slots__"):
+		attrs = {
+			name: getattr(value, name)
+			for cls in type(value).__mro__
+			for name in getattr(cls, "__slots__", ())
+			if not name.startswith("_") and hasattr(value, name)
+		}
+	else:
+		return [type(value).__qualname__, repr(value)]
+	return [type(value).__qualname__, canonical(attrs)]
+
+
+def canonical_bytes(value: Any) -> bytes:
+	"""canonical(value) as compact, key sorted JSON."""
+	return json.dumps(canonical(value), sort_keys=True, separators=(",", ":")).encode()
+
+
+def digest(value: Any) -> str:
+	"""sha256 of canonical_bytes(value)."""
+	return hashlib.sha256(canonical_bytes(value)).hexdigest()
+
+
+def _object_source_digest(obj: Any) -> str:
+	try:
+		source = inspect.getsource(obj)
+	except (OSError, TypeError):
+		return "no source"
+	return hashlib.sha256(source.encode()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(path: str, mtime_ns: int, skip: tuple) -> str:
+	tree = ast.parse(Path(path).read_text())
+	tree.body = [
+		node for node in tree.body
+		if not (isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name in skip)
+	]
+	# unparse so comments and formatting don't count as changes
+	return hashlib.sha256(ast.unparse(tree).encode()).hexdigest()
+
+
+def source_digest(path: Path, skip: Iterable[str] = ("main",)) -> str:
+	"""Hash the code of a script, leaving out the top level functions in skip.
+
+	main() is skipped by default because that is where the scripts keep their
+	part lists, adding a part shouldn't rebuild every other one.
+	"""
+	path = Path(path).resolve()
+	return _source_digest(str(path), path.stat().st_mtime_ns, tuple(sorted(skip)))
+
+
+_package_dir = Path(__file__).resolve().parent
+
+
+def _module_files(name: str) -> Iterable[Path]:
+	"""The files importing module name runs, if it is in this package."""
+	parts = name.split(".")
+	if parts[0] != _package_dir.name:
+		return
+	directory = _package_dir.parent
+	for part in parts:
+		directory = directory.joinpath(part)
+		if directory.joinpath("__init__.py").is_file():
+			yield directory.joinpath("__init__.py")
+		elif directory.with_suffix(".py").is_file():
+			yield directory.with_suffix(".py")
+			return
+		else:
+			return
+
+
+@functools.lru_cache(maxsize=None)
+def _imported_modules(path: str, mtime_ns: int) -> Tuple[Path, ...]:
+	found = set()
+	# every import, the ones inside functions too
+	for node in ast.walk(ast.parse(Path(path).read_text())):
+		if isinstance(node, ast.Import):
+			names = [alias.name for alias in node.names]
+		elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+			# from cad_common import trace imports the module trace
+			names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+		else:
+			continue
+		for name in names:
+			found.update(_module_files(name))
+	return tuple(sorted(found))
+
+
+def module_sources(path: Path) -> List[str]:
+	"""source_digest of every cad_common module the script at path imports.
+
+	Modules imported by those modules count too, so a change to a shared
+	helper rebuilds the parts of every script that uses it.
+	"""
+	todo = [Path(path).resolve()]
+	seen = set()
+	while todo:
+		current = todo.pop()
+		for module in _imported_modules(str(current), current.stat().st_mtime_ns):
+			if module not in seen:
+				seen.add(module)
+				todo.append(module)
+	return [source_digest(module) for module in sorted(seen)]
+
+
+def part_digest(params: Any, version: Any, sources: Iterable[str], extra: Any = None) -> str:
+	"""Digest of everything that decides what a part looks like."""
+	return digest({
+		"format": manifest_format,
+		"params": params,
+		"version": str(version),
+		"sources": list(sources),
+		"cadquery": package_version("cadquery"),
+		"extra": extra,
+	})
+
+
+class BuildManifest:
+	"""The `.build_manifest.json` of one output directory.
+
+	Record() and Save() are safe to call from an export thread while the main
+	thread keeps asking IsCurrent().
+	"""
+
+	def __init__(self, out_dir: Path, force: bool = False) -> None:
+		self.out_dir = Path(out_dir)
+		self.path = self.out_dir.joinpath(manifest_name)
+		self.force = force
+		self.skipped = 0
+		self._lock = threading.Lock()
+		self._parts: Dict[str, Dict[str, Any]] = {}
+
+		if self.path.exists():
+			try:
+				data = json.loads(self.path.read_text())
+				if data.get("format") == manifest_format:
+					self._parts = data.get("parts", {})
+			except (OSError, ValueError) as e:
+				print(f"ignoring unreadable build manifest \"{self.path}\": {e}")
+
+	def IsCurrent(self, part: str, digest: str) -> bool:
+		"""True if part was built with this digest and its files are untouched."""
+		if self.force:
+			return False
+
+		changed = False
+		with self._lock:
+			entry = self._parts.get(part)
+			if entry is None or entry.get("digest") != digest or not entry.get("files"):
+				return False
+
+			for name, info in entry["files"].items():
+				path = self.out_dir.joinpath(name)
+				try:
+					stat = path.stat()
+				except OSError:
+					return False
+				if stat.st_size == info["size"] and stat.st_mtime_ns == info["mtime_ns"]:
+					continue
+				if "artifact" not in info or artifacts.file_key(path) != info["artifact"]:
+					return False
+				# checked out or stored since, same content
+				info["size"] = stat.st_size
+				info["mtime_ns"] = stat.st_mtime_ns
+				changed = True
+
+		if changed:
+			self.Save()
+		self.skipped += 1
+		return True
+
+	def Record(
+		self,
+		part: str,
+		digest: str,
+		files: Mapping[Path, float],
+		build_seconds: Optional[float] = None,
+	) -> None:
+		"""Store the files written for part, files maps path to export seconds."""
+		entry_files = {}
+		for path, seconds in files.items():
+			path = Path(path)
+			stat = path.stat()
+			info = {
+				"size": stat.st_size,
+				"mtime_ns": stat.st_mtime_ns,
+				"export_seconds": round(seconds, 4),
+			}
+			pointer = artifacts.read_pointer(path)
+			if pointer is not None:
+				info["artifact"] = pointer[0]
+			entry_files[path.resolve().relative_to(self.out_dir.resolve()).as_posix()] = info
+
+		with self._lock:
+			self._parts[part] = {
+				"digest": digest,
+				"built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+				"build_seconds": None if build_seconds is None else round(build_seconds, 4),
+				"files": entry_files,
+			}
+		self.Save()
+
+	def Save(self) -> None:
+		with self._lock:
+			data = json.dumps(
+				{"format": manifest_format, "parts": self._parts},
+				indent="\t",
+				sort_keys=True,
+			)
+			self.out_dir.mkdir(parents=True, exist_ok=True)
+			# write then rename so an interrupted run never leaves half a manifest
+			tmp_path = self.path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+			tmp_path.write_text(data + "\n")
+			tmp_path.replace(self.path)
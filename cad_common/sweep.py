@@ -0,0 +1,223 @@
+"""Parallel, resumable sweeps for the scripts' --loop modes.
+
+A sweep is a Decimal range from --min to --max in --step (and whatever
+other axes a script adds, like ltt's --bits) turned into one part per
+value. Each part is built and exported by a worker process, the main
+process stores the files and records them in the build manifest as they
+come back. Parts whose manifest entry is still current are skipped, so a
+sweep that was interrupted picks up where it stopped when it is run again.
+
+	parts = [sweep.SweepPart(name, digest, (spacer, out_dir)) for ...]
+	sweep.run(parts, build_gauge, manifest, jobs=args.jobs)
+
+A script whose parts are one STEP from make_spacer(spacer=...) can use
+build_step, with (make_spacer, spacer, out_dir, store) as the args.
+
+build is called as build(*part.args) and returns ({path: export seconds},
+build seconds). It has to be a module level function and its args have to
+pickle, they are sent to the workers. A build that gets the store in its
+args can export straight into it (cad_common.artifacts.export), files it
+leaves in out/ are stored by the main process.
+"""
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import argparse
+import os
+import time
+
+from cad_common import artifacts, trace
+from cad_common.artifacts import ArtifactStore
+from cad_common.manifest import BuildManifest
+
+BuildFunc = Callable[..., Tuple[Dict[Path, float], float]]
+
+
+@dataclass
+class SweepPart:
+	# the build manifest key, also what the progress lines show
+	part: str
+	digest: str
+	args: Tuple[Any, ...]
+
+
+@dataclass
+class SweepReport:
+	built: int = 0
+	skipped: int = 0
+	failed: int = 0
+	seconds: float = 0.0
+
+	def Summary(self) -> str:
+		return (
+			f"built {self.built}, {self.skipped} up to date, "
+			f"{self.failed} failed in {_duration(self.seconds)}"
+		)
+
+
+def decimal_range(start: Decimal, stop: Decimal, step: Decimal) -> List[Decimal]:
+	"""start to stop in step, both ends included, exact like the old while loops."""
+	if step <= 0:
+		raise ValueError(f"step has to be more than 0, not {step}")
+	values = []
+	value = Decimal(start)
+	while value <= stop:
+		values.append(value)
+		value += step
+	return values
+
+
+def add_arguments(
+	parser: argparse.ArgumentParser,
+	min_value: Decimal,
+	max_value: Decimal,
+	step: Decimal,
+	what: str = "thickness",
+) -> None:
+	"""--min, --max, --step and --jobs, the defaults are the script's sweep."""
+	group = parser.add_argument_group("sweep", f"the parts --loop builds, by {what} in mm")
+	group.add_argument('--min', type=Decimal, default=Decimal(min_value),
+					 help=f'smallest {what} (default %(default)s)')
+	group.add_argument('--max', type=Decimal, default=Decimal(max_value),
+					 help=f'largest {what} (default %(default)s)')
+	group.add_argument('--step', type=Decimal, default=Decimal(step),
+					 help='step between them (default %(default)s)')
+	group.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+					 help='build in this many worker processes (default %(default)s)')
+
+
+def values_from_args(args: argparse.Namespace, parser: argparse.ArgumentParser) -> List[Decimal]:
+	"""The --min to --max values, a range with nothing in it is a parser error."""
+	if args.step <= 0:
+		parser.error(f"--step has to be more than 0, not {args.step}")
+	if args.min > args.max:
+		parser.error(f"--min {args.min} is more than --max {args.max}")
+	return decimal_range(args.min, args.max, args.step)
+
+
+def build_step(
+	make_spacer: Callable[..., Tuple[Any, Any]],
+	spacer: Any,
+	out_dir: Path,
+	store: Optional[ArtifactStore] = None,
+) -> Tuple[Dict[Path, float], float]:
+	"""Make one part with make_spacer and export it as "<name> <version>.step".
+
+	make_spacer is the script's, called as make_spacer(spacer=spacer) and
+	returning (result, spacer). With store the STEP goes straight into the
+	artifact store, out_dir gets the pointer.
+	"""
+	start = time.perf_counter()
+	with trace.span("make_spacer", spacer=spacer.name, params=spacer):
+		result, spacer = make_spacer(spacer=spacer)
+	build_seconds = time.perf_counter() - start
+
+	step_path = Path(out_dir).joinpath(f"{spacer.name} {str(spacer.version)}.step")
+	start = time.perf_counter()
+	with trace.span("export", cat="export", file=step_path.name):
+		artifacts.export(result, step_path, store=store)
+	return {step_path: time.perf_counter() - start}, build_seconds
+
+
+def _duration(seconds: float) -> str:
+	if seconds < 60:
+		return f"{seconds:.1f}s"
+	minutes, seconds = divmod(int(seconds), 60)
+	if minutes < 60:
+		return f"{minutes}m{seconds:02d}s"
+	return f"{minutes // 60}h{minutes % 60:02d}m"
+
+
+def run(
+	parts: Sequence[SweepPart],
+	build: BuildFunc,
+	manifest: BuildManifest,
+	jobs: int = 1,
+	store: Optional[ArtifactStore] = None,
+) -> SweepReport:
+	"""Build every part that isn't current, jobs > 1 in a process pool.
+
+	A part that raises is reported and left out of the manifest, the rest
+	still get built. If a worker crashes, the pool is gone and the parts
+	not done yet are counted as failed, running the sweep again retries
+	just those.
+	"""
+	report = SweepReport()
+	start = time.perf_counter()
+
+	todo = []
+	for part in parts:
+		if manifest.IsCurrent(part.part, part.digest):
+			report.skipped += 1
+		else:
+			todo.append(part)
+	if report.skipped:
+		print(f"{report.skipped} of {len(parts)} parts are up to date")
+
+	def finish(part: SweepPart, result: Tuple[Dict[Path, float], float]) -> None:
+		files, build_seconds = result
+		if store is not None:
+			for path in files:
+				store.Store(path)
+		manifest.Record(part.part, part.digest, files, build_seconds)
+		report.built += 1
+
+		done = report.built + report.failed
+		elapsed = time.perf_counter() - start
+		left = elapsed / done * (len(todo) - done)
+		print(
+			f"[{done}/{len(todo)}] made \"{part.part}\" in {build_seconds:.1f}s"
+			+ (f", about {_duration(left)} left" if done < len(todo) else "")
+		)
+
+	def fail(part: SweepPart, error: BaseException) -> None:
+		report.failed += 1
+		print(f"failed to make \"{part.part}\": {error!r}")
+
+	try:
+		if jobs <= 1 or len(todo) <= 1:
+			for part in todo:
+				try:
+					result = build(*part.args)
+				except Exception as e:
+					fail(part, e)
+					continue
+				finish(part, result)
+		else:
+			with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+				futures = {pool.submit(build, *part.args): part for part in todo}
+				try:
+					while futures:
+						done, _ = wait(futures, return_when=FIRST_COMPLETED)
+						for future in done:
+							part = futures.pop(future)
+							try:
+								result = future.result()
+							except BrokenProcessPool:
+								futures[future] = part
+								raise
+							except Exception as e:
+								fail(part, e)
+								continue
+							finish(part, result)
+				except BrokenProcessPool:
+					print("a worker crashed, run the sweep again to build the rest")
+					report.failed += len(futures)
+				except BaseException:
+					# don't wait for the queued parts, only the ones already running
+					pool.shutdown(wait=False, cancel_futures=True)
+					raise
+	except KeyboardInterrupt:
+		print(
+			f"interrupted after {report.built} of {len(todo)} parts, "
+			"run the sweep again to build the rest"
+		)
+		raise
+
+	report.seconds = time.perf_counter() - start
+	print(report.Summary())
+	return report
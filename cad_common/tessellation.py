@@ -0,0 +1,325 @@
+"""STL tessellation tolerances picked per part instead of fixed and very fine.
+
+The scripts used to mesh every part with tolerances like 0.0001 mm, far
+finer than any printer reproduces, which is most of the STL size and export
+time. A `MeshPolicy` picks the linear tolerance (the largest distance allowed
+between the mesh and the real surface, the chordal error) from the printer's
+resolution and the part's size, and can coarsen it further to fit a triangle
+or file size budget. `mesh_adaptive` meshes a shape with it and measures the
+chordal error the mesh actually has, so the report says what was achieved
+rather than what was asked for.
+
+	policy = MeshPolicy(resolution=0.05, max_triangles=200_000)
+	report = export_stl(shape, "part.stl", policy=policy)
+	print(report.Summary())
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+import argparse
+import math
+import time
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+
+# binary STL: 80 byte header, triangle count, then 50 bytes per triangle
+stl_header_bytes = 84
+stl_triangle_bytes = 50
+
+
+@dataclass(frozen=True)
+class MeshPolicy:
+	# smallest detail the printer reproduces in mm, the mesh stays within half of it
+	resolution: float = 0.05
+	# small parts get at most this fraction of their bounding box diagonal
+	relative: float = 1e-3
+	# radians between neighbouring facets on curves, the linear tolerance
+	# decides on big arcs, this keeps small holes round
+	angular_tolerance: float = 0.3
+	max_triangles: Optional[int] = None
+	max_bytes: Optional[int] = None
+	# coarsening for a budget stops at these
+	max_tolerance: float = 0.2
+	max_angular_tolerance: float = 0.8
+	# OCC doesn't always keep to the linear tolerance on B-spline faces,
+	# the angular one is lowered until it does, but not below this
+	min_angular_tolerance: float = 0.02
+	max_tries: int = 6
+
+	def Tolerance(self, shape) -> float:
+		"""Linear tolerance for shape before any budget is applied."""
+		diagonal = shape.BoundingBox().DiagonalLength
+		return min(self.resolution / 2, max(diagonal * self.relative, 1e-6))
+
+	def TriangleBudget(self) -> Optional[int]:
+		budgets = []
+		if self.max_triangles is not None:
+			budgets.append(self.max_triangles)
+		if self.max_bytes is not None:
+			budgets.append((self.max_bytes - stl_header_bytes) // stl_triangle_bytes)
+		return min(budgets) if budgets else None
+
+
+@dataclass
+class MeshReport:
+	tolerance: float
+	angular_tolerance: float
+	triangles: int
+	# largest distance measured between the mesh and the surface, in mm
+	chordal_error: Optional[float]
+	seconds: float
+	tries: int = 1
+	budget: Optional[int] = None
+
+	@property
+	def stl_bytes(self) -> int:
+		return stl_header_bytes + (stl_triangle_bytes * self.triangles)
+
+	@property
+	def within_budget(self) -> bool:
+		return self.budget is None or self.triangles <= self.budget
+
+	def Summary(self) -> str:
+		text = (
+			f"{self.triangles} triangles ({self.stl_bytes / 1e6:.2f} MB), "
+			f"tolerance {self.tolerance:.4g} mm / {self.angular_tolerance:.3g} rad"
+		)
+		if self.chordal_error is not None:
+			text += f", chordal error {self.chordal_error:.4g} mm"
+		if not self.within_budget:
+			text += f", over the {self.budget} triangle budget"
+		return text + f" in {self.seconds:.2f}s"
+
+
+def _to_shape(shape_or_workplane: Any):
+	if isinstance(shape_or_workplane, cq.Workplane):
+		shapes = [val for val in shape_or_workplane.vals() if isinstance(val, cq.Shape)]
+		return shapes[0] if len(shapes) == 1 else cq.Compound.makeCompound(shapes)
+	return shape_or_workplane
+
+
+def _triangulations(shape):
+	from OCP.BRep import BRep_Tool
+	from OCP.TopLoc import TopLoc_Location
+
+	for face in shape.Faces():
+		location = TopLoc_Location()
+		triangulation = BRep_Tool.Triangulation_s(face.wrapped, location)
+		if triangulation is not None:
+			yield face, triangulation, location
+
+
+def count_triangles(shape) -> int:
+	return sum(triangulation.NbTriangles() for _, triangulation, _ in _triangulations(shape))
+
+
+def _mesh(shape, tolerance: float, angular_tolerance: float, relative: bool = False) -> None:
+	from OCP.BRepMesh import BRepMesh_IncrementalMesh
+	from OCP.BRepTools import BRepTools
+
+	# an existing finer mesh would be kept as it is
+	BRepTools.Clean_s(shape.wrapped)
+	BRepMesh_IncrementalMesh(shape.wrapped, tolerance, relative, angular_tolerance, True)
+
+
+def measure_chordal_error(shape, max_samples: int = 10000) -> float:
+	"""Largest distance from the mesh to the surface, sampled at triangle centres.
+
+	Each sampled triangle's centre is projected onto its face, starting from
+	the centre of the triangle's UV coordinates, and the distance measured.
+	The centre is about where a facet sags furthest from a curved face.
+	Planar faces are exact and skipped. At most about max_samples triangles
+	are looked at, spread evenly over the part.
+	"""
+	from OCP.BRep import BRep_Tool
+	from OCP.GeomAbs import GeomAbs_Plane
+	from OCP.BRepAdaptor import BRepAdaptor_Surface
+	from OCP.ShapeAnalysis import ShapeAnalysis_Surface
+	from OCP.gp import gp_Pnt, gp_Pnt2d
+
+	curved = []
+	total = 0
+	for face, triangulation, location in _triangulations(shape):
+		if BRepAdaptor_Surface(face.wrapped).GetType() == GeomAbs_Plane or not triangulation.HasUVNodes():
+			continue
+		surface = ShapeAnalysis_Surface(BRep_Tool.Surface_s(face.wrapped))
+		curved.append((surface, triangulation, location.Transformation()))
+		total += triangulation.NbTriangles()
+
+	stride = max(1, math.ceil(total / max_samples))
+	worst = 0.0
+	for surface, triangulation, trsf in curved:
+		for i in range(1, triangulation.NbTriangles() + 1, stride):
+			nodes = triangulation.Triangle(i).Get()
+			uv = gp_Pnt2d(
+				sum(triangulation.UVNode(n).X() for n in nodes) / 3,
+				sum(triangulation.UVNode(n).Y() for n in nodes) / 3,
+			)
+			# nodes are in the face's own coordinates, the surface isn't
+			centre = gp_Pnt(
+				sum(triangulation.Node(n).X() for n in nodes) / 3,
+				sum(triangulation.Node(n).Y() for n in nodes) / 3,
+				sum(triangulation.Node(n).Z() for n in nodes) / 3,
+			).Transformed(trsf)
+			uv = surface.NextValueOfUV(uv, centre, 1e-7)
+			worst = max(worst, surface.Value(uv).Distance(centre))
+	return worst
+
+
+def mesh_fixed(shape_or_workplane: Any, tolerance: float, angular_tolerance: float, measure: bool = False) -> MeshReport:
+	"""Mesh with the given tolerances, like the scripts always did.
+
+	Like cadquery's STL export the tolerance is relative, a fraction of the
+	size of each edge rather than mm, which is why the fixed values look so
+	small and still leave visible facets on big arcs.
+	"""
+	shape = _to_shape(shape_or_workplane)
+	start = time.perf_counter()
+	_mesh(shape, tolerance, angular_tolerance, relative=True)
+	seconds = time.perf_counter() - start
+	return MeshReport(
+		tolerance=tolerance,
+		angular_tolerance=angular_tolerance,
+		triangles=count_triangles(shape),
+		chordal_error=measure_chordal_error(shape) if measure else None,
+		seconds=seconds,
+	)
+
+
+def mesh_adaptive(shape_or_workplane: Any, policy: MeshPolicy, measure: bool = True) -> MeshReport:
+	"""Mesh the shape in place with tolerances picked by policy.
+
+	Over a triangle budget the linear tolerance is raised in proportion to
+	how far over it is (curved faces get triangles roughly in inverse
+	proportion to it), the angular one by its square root, and the shape
+	meshed again. Flat faces don't get cheaper, so a budget can be out of
+	reach, the report says when it was missed.
+
+	With measure the chordal error is checked too, and where OCC left it
+	at more than twice the linear tolerance the angular tolerance is
+	lowered and the shape meshed again, as long as that stays within the
+	budget. Less than that is normal for long triangles along face edges
+	and not worth many more triangles, and when a finer angle doesn't help
+	much either the coarser mesh is kept. Either way it stops after
+	policy.max_tries meshes.
+	"""
+	shape = _to_shape(shape_or_workplane)
+	budget = policy.TriangleBudget()
+	tolerance = policy.Tolerance(shape)
+	angular_tolerance = policy.angular_tolerance
+
+	start = time.perf_counter()
+	tries = 0
+	chordal_error = None
+	# (angular tolerance, chordal error) of the last mesh refined from
+	coarser = None
+	while True:
+		tries += 1
+		_mesh(shape, tolerance, angular_tolerance)
+		triangles = count_triangles(shape)
+		if tries >= policy.max_tries:
+			break
+		if budget is not None and triangles > budget:
+			if tolerance >= policy.max_tolerance and angular_tolerance >= policy.max_angular_tolerance:
+				break
+			# 10% extra so the next try lands under the budget instead of on it
+			factor = (triangles / budget) * 1.1
+			tolerance = min(policy.max_tolerance, tolerance * factor)
+			angular_tolerance = min(policy.max_angular_tolerance, angular_tolerance * math.sqrt(factor))
+			continue
+		if not measure:
+			break
+		chordal_error = measure_chordal_error(shape)
+		if coarser is not None and chordal_error > 0.8 * coarser[1]:
+			angular_tolerance, chordal_error = coarser
+			tries += 1
+			_mesh(shape, tolerance, angular_tolerance)
+			triangles = count_triangles(shape)
+			break
+		error_bound = 2 * tolerance
+		if chordal_error <= error_bound or angular_tolerance <= policy.min_angular_tolerance:
+			break
+		# the sag of a facet grows with the square of its angle
+		finer = max(
+			policy.min_angular_tolerance,
+			angular_tolerance * max(0.25, 0.9 * math.sqrt(error_bound / chordal_error)),
+		)
+		if budget is not None:
+			# triangles go up about as much as the angle goes down, finer
+			# only if the mesh would still fit
+			if triangles * (angular_tolerance / finer) > budget:
+				break
+		coarser = (angular_tolerance, chordal_error)
+		angular_tolerance = finer
+		chordal_error = None
+	seconds = time.perf_counter() - start
+
+	if measure and chordal_error is None:
+		chordal_error = measure_chordal_error(shape)
+	return MeshReport(
+		tolerance=tolerance,
+		angular_tolerance=angular_tolerance,
+		triangles=triangles,
+		chordal_error=chordal_error,
+		seconds=seconds,
+		tries=tries,
+		budget=budget,
+	)
+
+
+def export_stl(
+	shape_or_workplane: Any,
+	path: Path,
+	tolerance: float = 0.0001,
+	angular_tolerance: float = 0.04,
+	policy: Optional[MeshPolicy] = None,
+) -> MeshReport:
+	"""Write a binary STL, with fixed tolerances or ones picked by policy."""
+	if policy is not None:
+		report = mesh_adaptive(shape_or_workplane, policy)
+	else:
+		report = mesh_fixed(shape_or_workplane, tolerance, angular_tolerance)
+
+	write_stl(shape_or_workplane, path)
+	return report
+
+
+def write_stl(shape_or_workplane: Any, path: Path) -> None:
+	"""Write the mesh the shape already carries as a binary STL.
+
+	cadquery's exporter would mesh again with a relative tolerance first.
+	"""
+	from OCP.StlAPI import StlAPI_Writer
+
+	writer = StlAPI_Writer()
+	writer.ASCIIMode = False
+	if not writer.Write(_to_shape(shape_or_workplane).wrapped, str(path)):
+		raise OSError(f"couldn't write STL \"{path}\"")
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+	"""The --stl-* options every script with STL export shares."""
+	group = parser.add_argument_group("STL mesh", "without these STLs use the script's fixed tolerances")
+	group.add_argument('--stl-resolution', type=float, metavar='MM',
+					help='pick the mesh tolerance per part for a printer with this resolution, like 0.05')
+	group.add_argument('--stl-max-triangles', type=int, metavar='N',
+					help='coarsen the mesh to stay under N triangles per part')
+	group.add_argument('--stl-max-mb', type=float, metavar='MB',
+					help='coarsen the mesh to keep each binary STL under this size')
+
+
+def policy_from_args(args: argparse.Namespace) -> Optional[MeshPolicy]:
+	"""The MeshPolicy the --stl-* options ask for, None for fixed tolerances."""
+	if args.stl_resolution is None and args.stl_max_triangles is None and args.stl_max_mb is None:
+		return None
+	options = {}
+	if args.stl_resolution is not None:
+		options["resolution"] = args.stl_resolution
+	if args.stl_max_triangles is not None:
+		options["max_triangles"] = args.stl_max_triangles
+	if args.stl_max_mb is not None:
+		options["max_bytes"] = int(args.stl_max_mb * 1e6)
+	return MeshPolicy(**options)
@@ -0,0 +1,243 @@
+"""Edge and face index of a shape, for running many selections on it.
+
+cadquery evaluates a selector like `<<Z[4]` by computing the center of
+mass of every candidate again, sorting them and walking the sorted list,
+and finds the edges an operation added with `edge not in before.objects`,
+which compares every edge with every old one. A TopologyIndex does that
+work once per shape:
+
+	index = topology.TopologyIndex(result)
+	new_edges = index.EdgesNotIn(before)
+	result = result.newObject(index.Select("|Z", new_edges)).fillet(1)
+
+Edges and faces are kept in hashed sets (cadquery shapes hash by TShape
+and location, the same thing `==` compares), each object's center, type
+and direction is computed the first time a selector needs it, and the
+centers are kept sorted along X, Y and Z so a `<`, `>`, `<<` or `>>`
+selection is a walk over bisected clusters. Selector strings are parsed
+by cadquery and evaluated here with its rules, including the 0.0001
+cluster tolerance, so they pick the same objects. Results are memoized
+per index, make a new one after every operation that changes the shape.
+"""
+from __future__ import annotations
+from bisect import bisect_right
+from typing import Any, Container, Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+
+_axes = {(1.0, 0.0, 0.0): 0, (0.0, 1.0, 0.0): 1, (0.0, 0.0, 1.0): 2}
+
+
+def _shapes(source: Any) -> List[Any]:
+	if isinstance(source, cq.Workplane):
+		return [val for val in source.vals() if isinstance(val, cq.Shape)]
+	if isinstance(source, cq.Shape):
+		return [source]
+	return list(source)
+
+
+def _unique(objects: Iterable[Any]) -> List[Any]:
+	return list(dict.fromkeys(objects))
+
+
+_string_selectors: Dict[str, Any] = {}
+
+
+def _string_selector(selector: str):
+	# parsing a selector string takes longer than running it on a few hundred edges
+	parsed = _string_selectors.get(selector)
+	if parsed is None:
+		parsed = cq.selectors.StringSyntaxSelector(selector)
+		_string_selectors[selector] = parsed
+	return parsed
+
+
+class TopologyIndex:
+	"""The edges and faces of a Workplane's objects, a shape or a list of shapes."""
+
+	def __init__(self, source: Union["cq.Workplane", "cq.Shape", Sequence["cq.Shape"]]) -> None:
+		shapes = _shapes(source)
+		self.faces: List[Any] = _unique(face for shape in shapes for face in shape.Faces())
+		self.edges: List[Any] = _unique(edge for shape in shapes for edge in shape.Edges())
+		self._face_set: FrozenSet[Any] = frozenset(self.faces)
+		self._edge_set: FrozenSet[Any] = frozenset(self.edges)
+		# per object, filled in as selectors ask
+		self._centers: Dict[Any, Tuple[float, float, float]] = {}
+		self._geom_types: Dict[Any, str] = {}
+		self._directions: Dict[Any, Any] = {}
+		self._face_edges: Dict[Any, List[Any]] = {}
+		# (kind, axis) -> (sorted center coordinates, objects in that order)
+		self._sorted: Dict[Tuple[str, int], Tuple[List[float], List[Any]]] = {}
+		self._selected: Dict[Tuple[str, str, Optional[FrozenSet[Any]]], List[Any]] = {}
+		self._not_in: Dict[int, Tuple[Any, List[Any]]] = {}
+
+	def __contains__(self, shape: Any) -> bool:
+		return shape in self._edge_set or shape in self._face_set
+
+	def EdgesNotIn(self, other: Container[Any]) -> List[Any]:
+		"""The edges of this index that other (an index or a set) doesn't have."""
+		cached = self._not_in.get(id(other))
+		# holding on to other keeps its id from going to a new object
+		if cached is None or cached[0] is not other:
+			cached = (other, [edge for edge in self.edges if edge not in other])
+			self._not_in[id(other)] = cached
+		return cached[1]
+
+	def FaceEdges(self, selector: Optional[str] = None, exclude: Container[Any] = ()) -> List[Any]:
+		"""Edges of the faces selector picks, like `.faces(selector).edges()`, without exclude."""
+		faces = self.faces if selector is None else self.SelectFaces(selector)
+		edges = []
+		for face in faces:
+			face_edges = self._face_edges.get(face)
+			if face_edges is None:
+				face_edges = face.Edges()
+				self._face_edges[face] = face_edges
+			edges.extend(face_edges)
+		return [edge for edge in _unique(edges) if edge not in exclude]
+
+	def Select(self, selector: Union[str, "cq.Selector"], edges: Optional[Sequence[Any]] = None) -> List[Any]:
+		"""The edges (all of them, or just edges) selector picks, like `.edges(selector)`."""
+		return self._select("edges", self.edges, selector, edges)
+
+	def SelectFaces(self, selector: Union[str, "cq.Selector"], faces: Optional[Sequence[Any]] = None) -> List[Any]:
+		"""The faces (all of them, or just faces) selector picks, like `.faces(selector)`."""
+		return self._select("faces", self.faces, selector, faces)
+
+	def _select(self, kind: str, everything: List[Any], selector: Any, objects: Optional[Sequence[Any]]) -> List[Any]:
+		if objects is None:
+			objects = everything
+		if not isinstance(selector, str):
+			return self._evaluate(selector, kind, list(objects))
+
+		key = (kind, selector, None if objects is everything else frozenset(objects))
+		selected = self._selected.get(key)
+		if selected is None:
+			selected = self._evaluate(_string_selector(selector), kind, list(objects))
+			self._selected[key] = selected
+		return list(selected)
+
+	def _center(self, obj: Any) -> Tuple[float, float, float]:
+		center = self._centers.get(obj)
+		if center is None:
+			center = obj.Center().toTuple()
+			self._centers[obj] = center
+		return center
+
+	def _geom_type(self, obj: Any) -> str:
+		geom_type = self._geom_types.get(obj)
+		if geom_type is None:
+			geom_type = obj.geomType()
+			self._geom_types[obj] = geom_type
+		return geom_type
+
+	def _direction(self, obj: Any):
+		"""What cadquery's direction selectors test: a plane's normal, a line's tangent, else None."""
+		if obj in self._directions:
+			return self._directions[obj]
+		direction = None
+		if obj.ShapeType() == "Face" and self._geom_type(obj) == "PLANE":
+			direction = obj.normalAt(None)
+		elif obj.ShapeType() == "Edge" and self._geom_type(obj) == "LINE":
+			direction = obj.tangentAt()
+		self._directions[obj] = direction
+		return direction
+
+	def _sorted_along(self, kind: str, axis: int, objects: List[Any]) -> Tuple[List[float], List[Any]]:
+		"""Center coordinates along axis in ascending order, and the objects in that order."""
+		everything = self.edges if kind == "edges" else self.faces
+		ordered = self._sorted.get((kind, axis))
+		if ordered is None:
+			# stable, ties keep their index order like cadquery's sort keeps its input order
+			pairs = sorted(((self._center(obj)[axis], obj) for obj in everything), key=lambda pair: pair[0])
+			ordered = ([key for key, _ in pairs], [obj for _, obj in pairs])
+			self._sorted[(kind, axis)] = ordered
+		if len(objects) == len(everything):
+			return ordered
+		wanted = set(objects)
+		keys = []
+		objs = []
+		for key, obj in zip(*ordered):
+			if obj in wanted:
+				keys.append(key)
+				objs.append(obj)
+		return keys, objs
+
+	def _nth(self, selector: Any, kind: str, objects: List[Any]) -> List[Any]:
+		"""cadquery's _NthSelector on centers: cluster the sorted keys, then pick the nth cluster."""
+		if not objects:
+			raise ValueError("Can not return the Nth element of an empty list")
+
+		direction = selector.direction.toTuple()
+		axis = _axes.get(direction)
+		if axis is not None:
+			keys, objs = self._sorted_along(kind, axis, objects)
+		else:
+			pairs = sorted(
+				((sum(c * d for c, d in zip(self._center(obj), direction)), obj) for obj in objects),
+				key=lambda pair: pair[0],
+			)
+			keys = [key for key, _ in pairs]
+			objs = [obj for _, obj in pairs]
+
+		# a cluster runs from its first key to every key within tolerance of it
+		tolerance = selector.tolerance
+		clusters = []
+		start = 0
+		while start < len(keys):
+			first = keys[start]
+			end = bisect_right(keys, first + tolerance, lo=start + 1)
+			# first + tolerance is rounded, cadquery compares key - first
+			while end < len(keys) and keys[end] - first <= tolerance:
+				end += 1
+			while end > start + 1 and keys[end - 1] - first > tolerance:
+				end -= 1
+			clusters.append((start, end))
+			start = end
+
+		if not selector.directionMax:
+			clusters.reverse()
+		try:
+			start, end = clusters[selector.n]
+		except IndexError:
+			raise IndexError(
+				f"Attempted to access index {selector.n} of a list with length {len(clusters)}"
+			) from None
+		return objs[start:end]
+
+	def _evaluate(self, selector: Any, kind: str, objects: List[Any]) -> List[Any]:
+		selectors = cq.selectors
+
+		if isinstance(selector, (selectors.StringSyntaxSelector, selectors._SimpleStringSyntaxSelector)):
+			return self._evaluate(selector.mySelector, kind, objects)
+		if isinstance(selector, selectors.SumSelector):
+			left = self._evaluate(selector.left, kind, objects)
+			return _unique(left + self._evaluate(selector.right, kind, objects))
+		if isinstance(selector, selectors.AndSelector):
+			right = set(self._evaluate(selector.right, kind, objects))
+			return [obj for obj in self._evaluate(selector.left, kind, objects) if obj in right]
+		if isinstance(selector, selectors.SubtractSelector):
+			right = set(self._evaluate(selector.right, kind, objects))
+			return [obj for obj in _unique(self._evaluate(selector.left, kind, objects)) if obj not in right]
+		if isinstance(selector, selectors.InverseSelector):
+			inner = set(self._evaluate(selector.selector, kind, objects))
+			return [obj for obj in _unique(objects) if obj not in inner]
+		# DirectionNthSelector is also a CenterNthSelector, so it comes first
+		if isinstance(selector, selectors.DirectionNthSelector):
+			parallel = [
+				obj for obj in objects
+				if self._direction(obj) is not None and selector.test(self._direction(obj))
+			]
+			return self._nth(selector, kind, parallel)
+		if isinstance(selector, selectors.CenterNthSelector):
+			return self._nth(selector, kind, objects)
+		if isinstance(selector, selectors.BaseDirSelector):
+			return [
+				obj for obj in objects
+				if self._direction(obj) is not None and selector.test(self._direction(obj))
+			]
+		if isinstance(selector, selectors.TypeSelector):
+			return [obj for obj in objects if self._geom_type(obj) == selector.typeString]
+		# anything else, like a box or nearest-to-point selector, cadquery does itself
+		return selector.filter(objects)
@@ -0,0 +1,172 @@
+"""Timing spans around build stages, written as a Chrome trace.
+
+Off unless the CAD_TRACE environment variable or a script's --trace option
+names a file. Then every `span` becomes a complete ("X") event in that file
+in the Trace Event Format, which chrome://tracing and ui.perfetto.dev open:
+
+	with trace.span("holes", holder=holder.name, mode=hole_cut_mode):
+		...
+
+Spans on the same thread nest by time. Worker processes started while
+tracing is on write into the same file, each under its own pid. Turned off,
+`span` hands back one shared do-nothing context manager, so the cost is a
+function call.
+"""
+from __future__ import annotations
+from contextlib import nullcontext
+from dataclasses import fields, is_dataclass
+from pathlib import Path
+from typing import Any, Dict, Mapping, Optional
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+env_var = "CAD_TRACE"
+
+_null_span = nullcontext()
+_path: Optional[Path] = None
+_fd: Optional[int] = None
+_fd_pid: Optional[int] = None
+# the process that started the trace closes it
+_owner_pid: Optional[int] = None
+_named_threads = set()
+_lock = threading.Lock()
+
+
+def _json_value(value: Any) -> Any:
+	if value is None or isinstance(value, (bool, int, float, str)):
+		return value
+	if isinstance(value, (list, tuple)):
+		return [_json_value(v) for v in value]
+	if isinstance(value, Mapping):
+		return {str(k): _json_value(v) for k, v in value.items()}
+	if callable(value) and hasattr(value, "__qualname__"):
+		return value.__qualname__
+	if is_dataclass(value) and not isinstance(value, type):
+		# every parameter, not just what the repr shows
+		return {f.name: _json_value(getattr(value, f.name)) for f in fields(value) if f.compare}
+	return str(value)
+
+
+def _write(event: Dict[str, Any]) -> None:
+	global _fd, _fd_pid
+	pid = os.getpid()
+	line = (json.dumps(event) + ",\n").encode()
+	with _lock:
+		# forked workers get the parent's descriptor, they open their own
+		if _fd is None or _fd_pid != pid:
+			_fd = os.open(_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+			_fd_pid = pid
+		# one write per event, appends from several processes don't mix
+		os.write(_fd, line)
+
+
+def _name_thread(pid: int, tid: int) -> None:
+	if (pid, tid) in _named_threads:
+		return
+	_named_threads.add((pid, tid))
+	process = multiprocessing.current_process().name
+	for name, value, event_tid in (
+		("process_name", f"{Path(sys.argv[0]).stem} {process}", 0),
+		("thread_name", threading.current_thread().name, tid),
+	):
+		_write({"name": name, "ph": "M", "pid": pid, "tid": event_tid, "args": {"name": value}})
+
+
+class _Span:
+	__slots__ = ("name", "cat", "args", "start")
+
+	def __init__(self, name: str, cat: str, args: Dict[str, Any]) -> None:
+		self.name = name
+		self.cat = cat
+		self.args = args
+
+	def __enter__(self) -> "_Span":
+		self.start = time.perf_counter_ns()
+		return self
+
+	def __exit__(self, exc_type, exc, tb) -> None:
+		end = time.perf_counter_ns()
+		pid = os.getpid()
+		tid = threading.get_native_id()
+		args = {key: _json_value(value) for key, value in self.args.items()}
+		if exc_type is not None:
+			args["error"] = exc_type.__name__
+		_name_thread(pid, tid)
+		_write({
+			"name": self.name,
+			"cat": self.cat,
+			"ph": "X",
+			"ts": self.start / 1000,
+			"dur": (end - self.start) / 1000,
+			"pid": pid,
+			"tid": tid,
+			"args": args,
+		})
+
+
+def enabled() -> bool:
+	return _path is not None
+
+
+def span(name: str, cat: str = "build", **args: Any):
+	"""Context manager timing what runs inside it, args end up in the event."""
+	if _path is None:
+		return _null_span
+	return _Span(name, cat, args)
+
+
+def _finish() -> None:
+	# close the JSON array, the format allows leaving it open but not every tool does
+	if _path is None or _owner_pid != os.getpid():
+		return
+	end = {"name": "trace end", "ph": "i", "s": "g", "pid": os.getpid(), "tid": 0, "ts": time.perf_counter_ns() / 1000}
+	with open(_path, "a") as f:
+		f.write(json.dumps(end) + "]\n")
+
+
+def enable(path: Path) -> None:
+	"""Start a new trace in path, worker processes started later join it."""
+	global _path, _fd, _fd_pid, _owner_pid
+	if _path is None:
+		atexit.register(_finish)
+	else:
+		_finish()
+		if _fd is not None and _fd_pid == os.getpid():
+			os.close(_fd)
+	_path = Path(path).resolve()
+	_path.parent.mkdir(parents=True, exist_ok=True)
+	_path.write_text("[\n")
+	_fd = None
+	_fd_pid = None
+	_owner_pid = os.getpid()
+	_named_threads.clear()
+	os.environ[env_var] = str(_path)
+	print(f"tracing to \"{_path}\"")
+
+
+def _join() -> None:
+	global _path
+	_path = Path(os.environ[env_var])
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+	parser.add_argument('--trace', type=Path, metavar='FILE',
+					 help=f'write a Chrome trace of the build stages to FILE (or set {env_var})')
+
+
+def enable_from_args(args: argparse.Namespace) -> None:
+	if args.trace is not None:
+		enable(args.trace)
+
+
+if os.environ.get(env_var):
+	if multiprocessing.parent_process() is None:
+		enable(Path(os.environ[env_var]))
+	else:
+		_join()
@@ -5,14 +5,27 @@ Bits = 3 # number of bits you want to the spacer to cover (experimental, tested
 
 # === variables end ===
 from dataclasses import dataclass, field
-import cadquery as cq  # noqa
-import cqgridfinity as cqg  # noqa
 import math  # noqa
 from pathlib import Path # noqa
-from cadquery import exporters
 from decimal import Decimal
 import argparse
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+from cad_common.manifest import BuildManifest, module_sources, part_digest, source_digest
+from cad_common import artifacts, sweep, trace
 # pylint: skip-file
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -104,51 +117,59 @@ def make_spacer(spacer):
 	outer_r = outer_dia / 2.0
 	inner_r = inner_dia / 2.0
 
-	washer = cq.Workplane("XY").circle(outer_r).circle(inner_r).extrude(thickness)
+	with trace.span("washer", spacer=spacer.name):
+		washer = cq.Workplane("XY").circle(outer_r).circle(inner_r).extrude(thickness)
 
 	half_box = (
 		cq.Workplane("XY")
 		  .box(outer_dia, outer_dia * 2.0, thickness * 2.0, centered=(True, True, True))
 		  .translate((outer_r, 0, 0))
 	)
-	wedge_int = wedge(outer_dia * 10, wedge_tr, thickness * 10, 100, True)
+	with trace.span("wedge", spacer=spacer.name, bits=spacer.bits):
+		wedge_int = wedge(outer_dia * 10, wedge_tr, thickness * 10, 100, True)
 
-	half_washer = washer.intersect(wedge_int)
+		half_washer = washer.intersect(wedge_int)
 
 	return half_washer, spacer
 
-def loop_output(out_dir_base):
+def loop_output(out_dir_base, thicknesses, bits_list=(1, 2, 3), force=False, store=None, jobs=1):
+	manifest = BuildManifest(out_dir_base, force=force)
+	sources = [source_digest(Path(__file__)), *module_sources(Path(__file__))]
 
-	for bits in range(1, 4):
+	parts = []
+	for bits in bits_list:
 		out_dir = out_dir_base.joinpath(f"{bits} bit{'s' if bits > 1 else ''}")
 		out_dir.mkdir(parents=True, exist_ok=True)
 
-		step = Decimal('0.5')
-		bit_size = step
-		while bit_size <= Decimal('10.0'):
-
+		for bit_size in thicknesses:
 			spacer = Spacer(
 				name=f"ltt screwdriver bit spacer for {bits} {Decimal('20.0') - bit_size}mm bit{'s' if bits > 1 else ''}",
 				version=SemVer(1, 0, 0),
 				thickness=float(bit_size),
 				bits=bits
 			)
-			print(f"making \"{spacer.name}\" for {bits} bits")
-
-			result, spacer = make_spacer(spacer=spacer)
-			exporters.export(
-				result,
-				str(out_dir.joinpath(
-					f"{spacer.name} {str(spacer.version)}.step"
-				))
-			)
-			bit_size += step
+			parts.append(sweep.SweepPart(
+				# the same spacer name shows up in every bits folder
+				part=f"{out_dir.name}/{spacer.name} {str(spacer.version)}",
+				digest=part_digest(spacer, spacer.version, sources),
+				args=(make_spacer, spacer, out_dir, store),
+			))
+
+	return sweep.run(parts, sweep.build_step, manifest, jobs=jobs, store=store)
 
 def main():
 	parser = argparse.ArgumentParser()
 	parser.add_argument('-l', '--loop', action="store_true",
-					 help='loop over 0.5 to 10mm spacers')
+					 help='build every spacer from --min to --max thick for each of --bits')
+	parser.add_argument('-f', '--force', action="store_true",
+					 help='with --loop, rebuild spacers even if the build manifest says they are up to date')
+	sweep.add_arguments(parser, Decimal("0.5"), Decimal("10.0"), Decimal("0.5"))
+	parser.add_argument('--bits', type=int, nargs='+', default=[1, 2, 3],
+					 help='with --loop, the bit counts to build spacers for (default %(default)s)')
+	artifacts.add_arguments(parser)
+	trace.add_arguments(parser)
 	args = parser.parse_args()
+	trace.enable_from_args(args)
 
 
 	try:
@@ -164,7 +185,14 @@ def main():
 	out_dir.mkdir(parents=True, exist_ok=True)
 
 	if args.loop:
-		loop_output(out_dir)
+		loop_output(
+			out_dir,
+			sweep.values_from_args(args, parser),
+			bits_list=args.bits,
+			force=args.force,
+			store=artifacts.store_from_args(args),
+			jobs=args.jobs,
+		)
 		return
 
 	spacer = Spacer(
@@ -181,7 +209,7 @@ def main():
 	result, spacer = make_spacer(spacer=spacer)
 	show_object(result, name=spacer.name+" v"+str(spacer.version))
 	if __name__ == "__main__":
-		exporters.export(
+		cq.exporters.export(
 			result,
 			str(out_dir.joinpath(
 				f"{spacer.name} {str(spacer.version)}.step"
@@ -189,4 +217,5 @@ def main():
 		)
 
 
-main()
+if __name__ == "__main__" or _in_cq_editor:
+	main()
@@ -1,23 +1,87 @@
-from __future__ import annotations
-from dataclasses import dataclass, field
-from cadquery import exporters
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
 from pathlib import Path # noqa
-from typing import Dict, Union
+from typing import Dict, Iterable, Iterator, List, Mapping, Tuple, Union
+import argparse
+import fnmatch
+import functools
 import inspect
+import queue
+import re
+import threading
+import time
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common.lazy import lazy_import
+
+# cadquery pulls in all of OCP, only load it once something gets built
+cq = lazy_import("cadquery")
+np = lazy_import("numpy")
+
+from cad_common import booleans
+from cad_common.brep import shape_from_brep, shape_to_brep
+from cad_common import gridfinity_base
+from cad_common.gridfinity_base import base_library
+from cad_common.catalog import (
+	CatalogError,
+	CatalogIndex,
+	expand_families,
+	parse_condition,
+	read_catalog,
+	resolve_like,
+)
+from cad_common.manifest import BuildManifest, canonical_bytes, digest, module_sources, part_digest, source_digest
+from cad_common import artifacts, tessellation, trace
 
 hole_margin_small = 0.6
 hole_margin_normal = 0.4
 
-
+# "serial" cuts one hole at a time out of the growing solid,
+# "compound" collects every hole tool and removes them with one boolean,
+# "primitive" is compound but builds the tools from cylinders/prisms/boxes
+# on a hole plane that's only looked up once
+hole_cut_modes = ("serial", "compound", "primitive")
+default_hole_cut_mode = "primitive"
+
+# how many built models may wait for the export thread before building pauses
+export_queue_depth = 2
+# new pools build_holders_parallel starts after worker crashes, before it
+# builds what is left one job at a time
+pool_restarts = 2
+export_formats = ("step", "stl", "brep")
+default_export_formats = ("step", "stl")
+stl_tolerance = 0.0001
+stl_angular_tolerance = 0.04
+
+
+@dataclass(frozen=True, slots=True, order=True)
 class SemVer:
-	def __init__(self, major: int, minor: int, patch: int):
-		self.major = major
-		self.minor = minor
-		self.patch = patch
+	major: int
+	minor: int
+	patch: int
 
 	def __repr__(self):
 		return f"{self.major}.{self.minor}.{self.patch}"
 
+	@classmethod
+	def Parse(cls, text: str) -> "SemVer":
+		""""1.0.2" -> SemVer(1, 0, 2)"""
+		parts = str(text).split(".")
+		if len(parts) != 3 or not all(part.isdigit() for part in parts):
+			raise ValueError(f"version {text!r} isn't major.minor.patch")
+		return cls(*(int(part) for part in parts))
+
 Number = Union[int, float]
 
 
@@ -71,9 +135,9 @@ doesnt_exist_script_dir = "script dir doesn't exist"
 
 
 
-import cqgridfinity as cqg  # noqa
 import math  # noqa
 from typing import Dict, Union, Callable, Any, Optional
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -94,24 +158,54 @@ def interp(a, b, t):
     return a_mix + b_mix
 
 class HoleShape:
-	# def __new__(cls, *args, **kwargs):
-	# 	# called before __init__; create instance and set per-instance empty dict
-	# 	self = super().__new__(cls)
-	# 	self.sizes: Dict[str, float] = {}  # initialized _pre-__init__
-	# 	return self
+	"""A hole outline, its type and sizes in mm.
+
+	Shapes are immutable values, equal when their class and sizes are, so
+	they can be cache keys and be shared between threads and processes.
+	Add/Subtract/Mult/Div return a new shape of the same class.
+	"""
+	__slots__ = ("type_", "sizes", "_hash")
 
 	def __init__(
 		self,
 		type_: str,
-		sizes: Optional[Dict[str, Number]] = None,
+		sizes: Optional[Mapping[str, Number]] = None,
 	):
-		self.type_ = type_
-		self.sizes = sizes
-		self.sizes: Dict[str, float] = {k: float(v) for k, v in (sizes or {}).items()}
+		object.__setattr__(self, "type_", type_)
+		object.__setattr__(self, "sizes", MappingProxyType({k: float(v) for k, v in (sizes or {}).items()}))
+		object.__setattr__(self, "_hash", None)
 
+	def __setattr__(self, name, value):
+		raise AttributeError(f"{type(self).__name__} is immutable, make a new one or use Add/Subtract/Mult/Div")
 
-	def SetSize(self, *args, **kwargs) -> None:
-		raise NotImplementedError
+	def __delattr__(self, name):
+		raise AttributeError(f"{type(self).__name__} is immutable")
+
+	def __reduce__(self):
+		# the sizes mapping proxy can't be pickled itself
+		return (_hole_shape_from_sizes, (type(self), self.type_, dict(self.sizes)))
+
+	def __eq__(self, other):
+		if not isinstance(other, HoleShape):
+			return NotImplemented
+		return type(self) is type(other) and self.type_ == other.type_ and self.sizes == other.sizes
+
+	def __hash__(self):
+		if self._hash is None:
+			object.__setattr__(self, "_hash", hash((type(self), self.type_, frozenset(self.sizes.items()))))
+		return self._hash
+
+	def __repr__(self):
+		return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.sizes.items())})"
+
+	def CanonicalBytes(self) -> bytes:
+		return canonical_bytes(self)
+
+	def Digest(self) -> str:
+		return digest(self)
+
+	def _WithSizes(self, sizes: Mapping[str, float]) -> "HoleShape":
+		return _hole_shape_from_sizes(type(self), self.type_, sizes)
 
 	def GetSize(self):
 		raise NotImplementedError
@@ -119,17 +213,148 @@ class HoleShape:
 	def GetXY(self):
 		raise NotImplementedError
 
+	def MakeTool(
+		self,
+		workplane,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	):
+		"""Return the hole as un-combined solid(s) on the workplane stack."""
+		raise NotImplementedError
+
 	def MakeCut(
 		self,
 		workplane,
-		holder: Holder,
+		holder: "Holder",
 		hole_depth: float,
 		i_x: int,
 		i_y: int,
 		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
 	):
+		tool = self.MakeTool(
+			workplane=workplane,
+			holder=holder,
+			hole_depth=hole_depth,
+			i_x=i_x,
+			i_y=i_y,
+			total_loops=total_loops,
+			sizes=sizes,
+		)
+		return workplane.cut(tool)
+
+	def MakeLocalTool(
+		self,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		"""Return the hole built from primitives, top centred on the origin going down -Z."""
+		raise NotImplementedError
+
+	def MakeToolSolids(
+		self,
+		plane,
+		x: float,
+		y: float,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		"""Same hole as MakeTool, without going through a Workplane per hole."""
+		location = _hole_location(plane, x, y)
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		solids = hole_tool_cache.GetTool(
+			self,
+			sizes,
+			hole_depth,
+			lambda: self.MakeLocalTool(
+				holder=holder,
+				hole_depth=hole_depth,
+				i_x=i_x,
+				i_y=i_y,
+				total_loops=total_loops,
+				sizes=sizes,
+			),
+		)
+		return [solid.moved(location) for solid in solids]
+
+	def MakeLocalChamferTool(
+		self,
+		chamfer_size: float,
+		sizes: Dict[str, float],
+	) -> "List[cq.Solid]":
+		"""Return what a 45 degree rim chamfer of chamfer_size removes.
+
+		Frustum(s) from the hole outline grown by chamfer_size at the origin
+		down to the plain outline at -chamfer_size, cutting these is the same
+		as chamfering the hole's rim edges.
+		"""
 		raise NotImplementedError
 
+	def MakeChamferToolSolids(
+		self,
+		plane,
+		x: float,
+		y: float,
+		holder: "Holder",
+		chamfer_size: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		"""MakeLocalChamferTool placed on the hole like MakeToolSolids."""
+		location = _hole_location(plane, x, y)
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		solids = hole_tool_cache.GetTool(
+			self,
+			sizes,
+			chamfer_size,
+			lambda: self.MakeLocalChamferTool(chamfer_size, sizes),
+			kind="chamfer",
+		)
+		return [solid.moved(location) for solid in solids]
+
+	def GetCutSizes(self) -> Dict[str, float]:
+		"""The sizes handed to holder.size_func, in the order the cut uses them."""
+		raise NotImplementedError
+
+	def SizeCell(
+		self,
+		holder: "Holder",
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+	) -> Dict[str, float]:
+		"""Run holder.size_func over GetCutSizes for a single hole."""
+		return {
+			k: _call_variable_func(holder.size_func, v, holder, i_x, i_y, total_loops)
+			for k, v in self.GetCutSizes().items()
+		}
+
+	def _CellSizes(
+		self,
+		sizes: Optional[Dict[str, float]],
+		holder: "Holder",
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+	) -> Dict[str, float]:
+		if sizes is not None:
+			return sizes
+		return self.SizeCell(holder, i_x, i_y, total_loops)
+
 
 	# helper to merge keys and produce new sizes dict
 	def _apply_op(
@@ -159,8 +384,8 @@ class HoleShape:
 
 		# other is a dict path
 		other_dict = {k: float(v) for k, v in other.items()}
-		# union of keys
-		all_keys = set(self.sizes.keys()) | set(other_dict.keys())
+		# union of keys, ours first then new ones from other, in a fixed order
+		all_keys = list(self.sizes) + [k for k in other_dict if k not in self.sizes]
 		result: Dict[str, float] = {}
 
 		for k in all_keys:
@@ -188,61 +413,46 @@ class HoleShape:
 
 		return result
 
-	# public arithmetic methods
+	# arithmetic, each returns a new shape
 	def Add(
 		self,
 		other: Union[Dict[str, Number], Number],
-		in_place: bool = True,
 	) -> "HoleShape":
-		new_sizes = self._apply_op(other, "add")
-		if in_place:
-			self.sizes = new_sizes
-			return self
-		return HoleShape(self.type, new_sizes)
+		return self._WithSizes(self._apply_op(other, "add"))
 
 	def Subtract(
 		self,
 		other: Union[Dict[str, Number], Number],
-		in_place: bool = True,
 	) -> "HoleShape":
-		new_sizes = self._apply_op(other, "sub")
-		if in_place:
-			self.sizes = new_sizes
-			return self
-		return HoleShape(self.type, new_sizes)
+		return self._WithSizes(self._apply_op(other, "sub"))
 
 	def Mult(
 		self,
 		other: Union[Dict[str, Number], Number],
-		in_place: bool = True,
 	) -> "HoleShape":
-		new_sizes = self._apply_op(other, "mul")
-		if in_place:
-			self.sizes = new_sizes
-			return self
-		return HoleShape(self.type, new_sizes)
+		return self._WithSizes(self._apply_op(other, "mul"))
 
 	def Div(
 		self,
 		other: Union[Dict[str, Number], Number],
-		in_place: bool = True,
 	) -> "HoleShape":
-		new_sizes = self._apply_op(other, "div")
-		if in_place:
-			self.sizes = new_sizes
-			return self
-		return HoleShape(self.type, new_sizes)
+		return self._WithSizes(self._apply_op(other, "div"))
+
+
+def _hole_shape_from_sizes(cls, type_: str, sizes: Mapping[str, Number]) -> HoleShape:
+	shape = object.__new__(cls)
+	HoleShape.__init__(shape, type_, sizes)
+	return shape
+
 
 class Hexagon(HoleShape):
+	__slots__ = ()
+
 	def __init__(
 		self,
 		flat_side_size: float,
 	):
-		super().__init__(type_="hexagon")
-		self.SetSize(flat_side_size)
-
-	def SetSize(self, flat_side_size: float):
-		self.sizes["flat_side_size"] = flat_side_size
+		super().__init__(type_="hexagon", sizes={"flat_side_size": flat_side_size})
 
 	def GetSize(self) -> (float, float):
 		flat_side_size = self.sizes["flat_side_size"]
@@ -251,6 +461,10 @@ class Hexagon(HoleShape):
 		pointy_side_size = flat_side_size * hex_short_to_long
 		return flat_side_size, pointy_side_size
 
+	def GetCutSizes(self) -> Dict[str, float]:
+		hole_size_flat, hole_size_pointy = self.GetSize()
+		return {"pointy_side_size": hole_size_pointy}
+
 	def GetXY(self, direction: str):
 		hole_size = 0
 		hole_size_flat, hole_size_pointy = self.GetSize()
@@ -261,79 +475,149 @@ class Hexagon(HoleShape):
 			hole_size = hole_size_flat
 		return hole_size
 
-	def MakeCut(
+	def MakeTool(
 		self,
 		workplane,
-		holder: Holder,
+		holder: "Holder",
 		hole_depth: float,
 		i_x: int,
 		i_y: int,
 		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
 	):
-		hole_size_flat, hole_size_pointy = self.GetSize()
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
 		result = workplane.polygon(
 			6,
-			_call_variable_func(holder.size_func, hole_size_pointy, holder, i_x, i_y, total_loops),
-		).cutBlind(
-			-(hole_depth)
+			sizes["pointy_side_size"],
+		).extrude(
+			-(hole_depth),
+			combine=False,
 		)
 		return result
 
+	def MakeLocalTool(
+		self,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		radius = sizes["pointy_side_size"] / 2
+
+		# same points as Workplane.polygon(6, diameter)
+		points = [
+			cq.Vector(radius * math.cos(math.tau * i / 6), radius * math.sin(math.tau * i / 6), 0)
+			for i in range(7)
+		]
+		face = cq.Face.makeFromWires(cq.Wire.makePolygon(points))
+		return [cq.Solid.extrudeLinear(face, cq.Vector(0, 0, -(hole_depth)))]
+
+	def MakeLocalChamferTool(
+		self,
+		chamfer_size: float,
+		sizes: Dict[str, float],
+	) -> "List[cq.Solid]":
+		radius = sizes["pointy_side_size"] / 2
+		# every side moves out by chamfer_size, the corners by that over cos(30)
+		grown = radius + chamfer_size / math.cos(math.tau / 12)
+
+		def outline(r, z):
+			return cq.Wire.makePolygon([
+				cq.Vector(r * math.cos(math.tau * i / 6), r * math.sin(math.tau * i / 6), z)
+				for i in range(7)
+			])
+
+		return [cq.Solid.makeLoft([outline(grown, 0), outline(radius, -chamfer_size)], True)]
+
 
 class Circle(HoleShape):
+	__slots__ = ()
+
 	def __init__(
 		self,
 		diameter: float,
 	):
-		super().__init__(type_="circle")
-		self.SetSize(diameter)
-
-	def SetSize(self, diameter: float):
-		self.sizes["diameter"] = diameter
+		super().__init__(type_="circle", sizes={"diameter": diameter})
 
 	def GetSize(self) -> (float):
 		return self.sizes["diameter"]
 
+	def GetCutSizes(self) -> Dict[str, float]:
+		return {"diameter": self.GetSize()}
+
 	def GetXY(self, direction: str):
 		hole_size = 0
 		diameter = self.GetSize()
 		hole_size = diameter
 		return hole_size
 
-	def MakeCut(
+	def MakeTool(
 		self,
 		workplane,
-		holder: Holder,
+		holder: "Holder",
 		hole_depth: float,
 		i_x: int,
 		i_y: int,
 		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
 	):
-		diameter = self.GetSize()
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
 		result = workplane.circle(
-			_call_variable_func(holder.size_func, diameter, holder, i_x, i_y, total_loops) / 2,
-		).cutBlind(
-			-(hole_depth)
+			sizes["diameter"] / 2,
+		).extrude(
+			-(hole_depth),
+			combine=False,
 		)
 		return result
 
+	def MakeLocalTool(
+		self,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		radius = sizes["diameter"] / 2
+		return [cq.Solid.makeCylinder(radius, hole_depth, cq.Vector(0, 0, -(hole_depth)))]
+
+	def MakeLocalChamferTool(
+		self,
+		chamfer_size: float,
+		sizes: Dict[str, float],
+	) -> "List[cq.Solid]":
+		radius = sizes["diameter"] / 2
+		return [cq.Solid.makeCone(
+			radius + chamfer_size,
+			radius,
+			chamfer_size,
+			cq.Vector(0, 0, 0),
+			cq.Vector(0, 0, -1),
+		)]
+
 
 class Rect(HoleShape):
+	__slots__ = ()
+
 	def __init__(
 		self,
 		x: float,
 		y: float,
 	):
-		super().__init__(type_="rect")
-		self.SetSize(x, y)
-
-	def SetSize(self, x: float, y: float):
-		self.sizes["x"] = x
-		self.sizes["y"] = y
+		super().__init__(type_="rect", sizes={"x": x, "y": y})
 
 	def GetSize(self) -> (float, float):
 		return self.sizes["x"], self.sizes["y"]
 
+	def GetCutSizes(self) -> Dict[str, float]:
+		x, y = self.GetSize()
+		return {"x": x, "y": y}
+
 	def GetXY(self, direction: str):
 		hole_size = 0
 
@@ -347,25 +631,48 @@ class Rect(HoleShape):
 
 		return hole_size
 
-	def MakeCut(
+	def MakeTool(
 		self,
 		workplane,
-		holder: Holder,
+		holder: "Holder",
 		hole_depth: float,
 		i_x: int,
 		i_y: int,
 		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
 	):
-		x, y = self.GetSize()
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
 		result = workplane.rect(
-			_call_variable_func(holder.size_func, x, holder, i_x, i_y, total_loops),
-			_call_variable_func(holder.size_func, y, holder, i_x, i_y, total_loops),
-		).cutBlind(
-			-(hole_depth)
+			sizes["x"],
+			sizes["y"],
+		).extrude(
+			-(hole_depth),
+			combine=False,
 		)
 		return result
 
+	def MakeLocalTool(
+		self,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		return [_make_rect_prism(sizes["x"], sizes["y"], hole_depth)]
+
+	def MakeLocalChamferTool(
+		self,
+		chamfer_size: float,
+		sizes: Dict[str, float],
+	) -> "List[cq.Solid]":
+		return [_make_rect_frustum(sizes["x"], sizes["y"], chamfer_size)]
+
 class RectDouble(HoleShape):
+	__slots__ = ()
+
 	def __init__(
 		self,
 		x: float,
@@ -374,19 +681,15 @@ class RectDouble(HoleShape):
 		x2: float,
 		y2: float,
 	):
-		super().__init__(type_="rect_double")
-		self.SetSize(x, y, x2, y2)
-
-	def SetSize(self, x: float, y: float, x2: float, y2: float):
-		self.sizes["x"] = x
-		self.sizes["y"] = y
-
-		self.sizes["x2"] = x2
-		self.sizes["y2"] = y2
+		super().__init__(type_="rect_double", sizes={"x": x, "y": y, "x2": x2, "y2": y2})
 
 	def GetSize(self) -> (float, float):
 		return self.sizes["x"], self.sizes["y"], self.sizes["x2"], self.sizes["y2"]
 
+	def GetCutSizes(self) -> Dict[str, float]:
+		x, y, x2, y2 = self.GetSize()
+		return {"x": x, "y": y, "x2": x2, "y2": y2}
+
 	def GetXY(self, direction: str):
 		hole_size = 0
 
@@ -400,33 +703,292 @@ class RectDouble(HoleShape):
 
 		return hole_size
 
-	def MakeCut(
+	def MakeTool(
 		self,
 		workplane,
-		holder: Holder,
+		holder: "Holder",
 		hole_depth: float,
 		i_x: int,
 		i_y: int,
 		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
 	):
-		x, y, x2, y2 = self.GetSize()
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
 		result = workplane.rect(
-			_call_variable_func(holder.size_func, x, holder, i_x, i_y, total_loops),
-			_call_variable_func(holder.size_func, y, holder, i_x, i_y, total_loops),
-		).cutBlind(
-			-(hole_depth)
+			sizes["x"],
+			sizes["y"],
+		).extrude(
+			-(hole_depth),
+			combine=False,
 		)
 
 		result2 = workplane.rect(
-			_call_variable_func(holder.size_func, x2, holder, i_x, i_y, total_loops),
-			_call_variable_func(holder.size_func, y2, holder, i_x, i_y, total_loops),
-		).cutBlind(
-			-(hole_depth)
+			sizes["x2"],
+			sizes["y2"],
+		).extrude(
+			-(hole_depth),
+			combine=False,
 		)
 
-		result = and_models([result, result2])
+		# both rects stay on the stack, cutting them together is the same as
+		# intersecting the two single cuts
+		return result.add(result2)
+
+	def MakeLocalTool(
+		self,
+		holder: "Holder",
+		hole_depth: float,
+		i_x: int,
+		i_y: int,
+		total_loops: int,
+		sizes: Optional[Dict[str, float]] = None,
+	) -> "List[cq.Solid]":
+		sizes = self._CellSizes(sizes, holder, i_x, i_y, total_loops)
+		return [
+			_make_rect_prism(sizes["x"], sizes["y"], hole_depth),
+			_make_rect_prism(sizes["x2"], sizes["y2"], hole_depth),
+		]
+
+	def MakeLocalChamferTool(
+		self,
+		chamfer_size: float,
+		sizes: Dict[str, float],
+	) -> "List[cq.Solid]":
+		return [
+			_make_rect_frustum(sizes["x"], sizes["y"], chamfer_size),
+			_make_rect_frustum(sizes["x2"], sizes["y2"], chamfer_size),
+		]
+
+
+# numpy ufunc name and the value a missing key counts as
+_array_ops = {
+	"add": ("add", 0.0),
+	"sub": ("subtract", 0.0),
+	"mul": ("multiply", 1.0),
+	"div": ("divide", 1.0),
+}
+
+
+class HoleShapeArray:
+	"""N hole shapes of one class, as a numpy structured array.
+
+	`table` has one float64 field per size key and one row per shape.
+	Add/Subtract/Mult/Div work on every row at once with the same rules as
+	HoleShape._apply_op and return a new array: other is a scalar or a
+	length N array applied to every key, a dict whose values are either, or
+	another HoleShapeArray.
+	Indexing with an int hands out that row as a HoleShape, the same one the
+	scalar methods would have made.
+
+		sizes = HoleShapeArray.Repeat(Circle(10.35), 50)
+		sizes = sizes.Add(np.linspace(0, 0.5, 50)).Mult(1.01)
+		sizes[3]  # Circle(diameter=...)
+	"""
+	__slots__ = ("shape_class", "type_", "table")
+
+	def __init__(self, shape_class: type, type_: str, table: "np.ndarray") -> None:
+		table = np.array(table, copy=True)
+		table.flags.writeable = False
+		self.shape_class = shape_class
+		self.type_ = type_
+		self.table = table
+
+	@classmethod
+	def FromShapes(cls, shapes: Iterable[HoleShape]) -> "HoleShapeArray":
+		shapes = list(shapes)
+		if len(shapes) == 0:
+			raise ValueError("HoleShapeArray needs at least one shape")
+		first = shapes[0]
+		keys = list(first.sizes)
+		for shape in shapes[1:]:
+			if type(shape) is not type(first) or shape.type_ != first.type_ or list(shape.sizes) != keys:
+				raise ValueError(f"can't mix {shape!r} into an array of {first!r}")
+
+		table = np.empty(len(shapes), dtype=[(k, np.float64) for k in keys])
+		for k in keys:
+			table[k] = [shape.sizes[k] for shape in shapes]
+		return cls(type(first), first.type_, table)
+
+	@classmethod
+	def Repeat(cls, shape: HoleShape, n: int) -> "HoleShapeArray":
+		"""n copies of shape, to derive a family from."""
+		table = np.empty(n, dtype=[(k, np.float64) for k in shape.sizes])
+		for k, v in shape.sizes.items():
+			table[k] = v
+		return cls(type(shape), shape.type_, table)
+
+	def __len__(self) -> int:
+		return len(self.table)
+
+	def __iter__(self) -> Iterator[HoleShape]:
+		return (self[i] for i in range(len(self)))
+
+	def __getitem__(self, index):
+		if isinstance(index, (int, np.integer)):
+			row = self.table[index]
+			return _hole_shape_from_sizes(
+				self.shape_class,
+				self.type_,
+				{k: float(row[k]) for k in self.table.dtype.names},
+			)
+		return HoleShapeArray(self.shape_class, self.type_, self.table[index])
+
+	def __repr__(self) -> str:
+		return f"HoleShapeArray({self.shape_class.__name__}, {len(self)} shapes, keys={list(self.Keys())})"
+
+	def Keys(self) -> Tuple[str, ...]:
+		return self.table.dtype.names
+
+	def Column(self, key: str) -> "np.ndarray":
+		"""Read-only sizes of key across every shape."""
+		return self.table[key]
+
+	def ToShapes(self) -> List[HoleShape]:
+		return list(self)
+
+	def _apply_op(
+		self,
+		other: "Union[HoleShapeArray, Dict[str, Union[Number, np.ndarray]], Number, np.ndarray]",
+		op: str,
+	) -> "HoleShapeArray":
+		if op not in _array_ops:
+			raise ValueError(f"Unknown op {op}")
+		ufunc_name, missing = _array_ops[op]
+		ufunc = getattr(np, ufunc_name)
+		n = len(self)
+
+		if isinstance(other, (int, float, np.ndarray)):
+			# a scalar, or one per shape, goes to every key
+			if op == "div" and np.any(np.asarray(other) == 0):
+				raise ValueError("Division by zero (scalar).")
+			other = {k: other for k in self.Keys()}
+		elif isinstance(other, HoleShapeArray):
+			other = {k: other.table[k] for k in other.Keys()}
+
+		other_cols = {}
+		for k, v in other.items():
+			v = np.asarray(v, dtype=np.float64)
+			if v.ndim > 0 and v.shape != (n,):
+				raise ValueError(f"sizes for '{k}' have shape {v.shape}, expected ({n},)")
+			other_cols[k] = np.broadcast_to(v, (n,))
+
+		# ours first then new keys from other, like HoleShape._apply_op
+		keys = list(self.Keys()) + [k for k in other_cols if k not in self.Keys()]
+		table = np.empty(n, dtype=[(k, np.float64) for k in keys])
+		for k in keys:
+			a = self.table[k] if k in self.Keys() else np.zeros(n)
+			b = other_cols.get(k)
+			if b is None:
+				b = np.full(n, missing)
+			if op == "div" and np.any(b == 0):
+				raise ValueError(f"Division by zero for key '{k}'")
+			table[k] = ufunc(a, b)
+		return HoleShapeArray(self.shape_class, self.type_, table)
+
+	def Add(self, other) -> "HoleShapeArray":
+		return self._apply_op(other, "add")
+
+	def Subtract(self, other) -> "HoleShapeArray":
+		return self._apply_op(other, "sub")
+
+	def Mult(self, other) -> "HoleShapeArray":
+		return self._apply_op(other, "mul")
+
+	def Div(self, other) -> "HoleShapeArray":
+		return self._apply_op(other, "div")
+
+
+def _hole_location(plane, x: float, y: float) -> "cq.Location":
+	return cq.Location(cq.Plane(
+		origin=plane.toWorldCoords((x, y)),
+		xDir=plane.xDir,
+		normal=plane.zDir,
+	))
+
+
+def _make_rect_prism(x: float, y: float, hole_depth: float) -> "cq.Solid":
+	return cq.Solid.makeBox(x, y, hole_depth, cq.Vector(-(x / 2), -(y / 2), -(hole_depth)))
+
+
+def _make_rect_frustum(x: float, y: float, chamfer_size: float) -> "cq.Solid":
+	def outline(half_x, half_y, z):
+		return cq.Wire.makePolygon([
+			cq.Vector(-half_x, -half_y, z),
+			cq.Vector(half_x, -half_y, z),
+			cq.Vector(half_x, half_y, z),
+			cq.Vector(-half_x, half_y, z),
+		], close=True)
+
+	return cq.Solid.makeLoft([
+		outline(x / 2 + chamfer_size, y / 2 + chamfer_size, 0),
+		outline(x / 2, y / 2, -chamfer_size),
+	], True)
 
-		return result
+
+class HoleToolCache:
+	"""LRU cache of MakeLocalTool solids for the primitive hole path.
+
+	Keyed by the kind of tool (hole or chamfer), the shape type, its cut
+	sizes and the hole depth (chamfer size for chamfers), rounded to
+	`quantum` mm. Every hole with the same key gets a located copy of the
+	same solid, so they share one TShape instead of each having their own
+	geometry.
+	"""
+
+	def __init__(self, maxsize: int = 256, quantum: float = 1e-6) -> None:
+		self.maxsize = maxsize
+		self.quantum = quantum
+		self.hits = 0
+		self.misses = 0
+		self._tools: OrderedDict[tuple, List[cq.Solid]] = OrderedDict()
+
+	def Key(
+		self,
+		shape: HoleShape,
+		sizes: Dict[str, float],
+		hole_depth: float,
+		kind: str = "hole",
+	) -> tuple:
+		return (
+			kind,
+			shape.type_,
+			tuple((k, round(v / self.quantum)) for k, v in sizes.items()),
+			round(hole_depth / self.quantum),
+		)
+
+	def GetTool(
+		self,
+		shape: HoleShape,
+		sizes: Dict[str, float],
+		hole_depth: float,
+		build: "Callable[[], List[cq.Solid]]",
+		kind: str = "hole",
+	) -> "List[cq.Solid]":
+		key = self.Key(shape, sizes, hole_depth, kind)
+
+		tool = self._tools.get(key)
+		if tool is not None:
+			self.hits += 1
+			self._tools.move_to_end(key)
+			return tool
+
+		self.misses += 1
+		tool = build()
+		self._tools[key] = tool
+		if len(self._tools) > self.maxsize:
+			self._tools.popitem(last=False)
+		return tool
+
+	def Clear(self) -> None:
+		self._tools.clear()
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self) -> int:
+		return len(self._tools)
+
+
+hole_tool_cache = HoleToolCache()
 
 
 
@@ -453,112 +1015,69 @@ def size_default_increase(
 class Holder_Model:
 	def __init__(
 		self,
-		holder: Holder,
+		holder: "Holder",
 		model: Any,
+		build_seconds: Optional[float] = None,
 	) -> None:
 		self.holder = holder
 		self.model = model
+		self.build_seconds = build_seconds
 
-# @dataclass
+# the fields after size_func are keyword only
+@dataclass(frozen=True, slots=True, kw_only=True)
 class Holder:
-	def __init__(
-		self,
-		name: str = "",
-		version: Optional[SemVer] = None,
-		hole_shape: Optional[HoleShape] = None,
-		hole_shape_max: Optional[HoleShape] = None,
-		hole_shape_min: Optional[HoleShape] = None,
-		no_margin: bool = False,
-		#TODO: see if python ever supports variable sized function type hinting
-		size_func: Optional[Callable[..., float]] = None,
-
-		# size_func: Optional[Callable[[
-		# 	float,
-		# 	Any | None,
-		# 	int | None,
-		# 	int | None,
-		# 	int | None,
-		# ], float]] = None,
-		*,
-		# primitives (same defaults as your dataclass)
-		hole_size_flat: float = 0.5,
-		hole_depth: float = 15.0,
-		fill_mm: float = 18.0,
-		gridfin_height: float = 7.0,
-		hole_num_x: int = 5,
-		gridfin_x: int = 2,
-		hole_num_y: int = 4,
-		gridfin_y: int = 2,
-		hole_chamfer_size: float = 2.0,
-		hole_circle: bool = True,
-		increase_copies: int = 1,
-		increase_amount: float = 0.5,
-		hole_max_size: float = 10.0,
-		hole_min_size: float = 0.5,
-		increase_loop_after: int = 20,
-		edge_padding: float = 0.0,
-		x_padding: float = 6.0,
-		y_padding: float = 6.0,
-		y_uppies: float = 12.0,
-		no_lip: bool = True,
-		no_lip_upper_size: float = 2.0,
-		no_lip_fillet_size: float = 0.3,
-	) -> None:
-		# simple fields
-		self.name = name
-		self.version = version if version is not None else SemVer(1, 0, 0)
-
-		# Hole shapes: ensure valid instances
-		self.hole_shape = hole_shape if hole_shape is not None else Rect(1, 1)
-		self.hole_shape_max = (
-			hole_shape_max if hole_shape_max is not None else Rect(1, 1)
-		)
-
-		self.hole_shape_min = (
-			hole_shape_min if hole_shape_min is not None else Rect(1, 1)
-		)
-
-		# size function
-		self.size_func = size_func if size_func is not None else size_default_increase
-
-		# primitive defaults
-		self.hole_size_flat = float(hole_size_flat)
-		self.hole_depth = float(hole_depth)
-		self.fill_mm = float(fill_mm)
-		self.gridfin_height = float(gridfin_height)
-		self.hole_num_x = int(hole_num_x)
-		self.gridfin_x = int(gridfin_x)
-		self.hole_num_y = int(hole_num_y)
-		self.gridfin_y = int(gridfin_y)
-		self.hole_chamfer_size = float(hole_chamfer_size)
-		self.hole_circle = bool(hole_circle)
-		self.increase_copies = int(increase_copies)
-		self.increase_amount = float(increase_amount)
-		self.hole_max_size = float(hole_max_size)
-		self.hole_min_size = float(hole_min_size)
-		self.increase_loop_after = int(increase_loop_after)
-		self.edge_padding = float(edge_padding)
-		self.x_padding = float(x_padding)
-		self.y_padding = float(y_padding)
-		self.y_uppies = float(y_uppies)
-		self.no_lip = bool(no_lip)
-		self.no_lip_upper_size = float(no_lip_upper_size)
-		self.no_lip_fillet_size = float(no_lip_fillet_size)
+	"""Everything that decides what one holder looks like.
+
+	Holders are frozen, equal when all their parameters are and hashable, so
+	they can key caches and go to worker processes as they are. Make
+	variants with dataclasses.replace().
+	"""
+	name: str = field(default="", kw_only=False)
+	version: Optional[SemVer] = field(default=SemVer(1, 0, 0), kw_only=False)
+	hole_shape: Optional[HoleShape] = field(default=Rect(1, 1), kw_only=False)
+	hole_shape_max: Optional[HoleShape] = field(default=Rect(1, 1), kw_only=False)
+	hole_shape_min: Optional[HoleShape] = field(default=Rect(1, 1), kw_only=False)
+	no_margin: bool = field(default=False, kw_only=False)
+	#TODO: see if python ever supports variable sized function type hinting
+	size_func: Optional[Callable[..., float]] = field(default=size_default_increase, kw_only=False)
+	hole_size_flat: float = 0.5
+	hole_depth: float = 15.0
+	fill_mm: float = 18.0
+	gridfin_height: float = 7.0
+	hole_num_x: int = 5
+	gridfin_x: int = 2
+	hole_num_y: int = 4
+	gridfin_y: int = 2
+	hole_chamfer_size: float = 2.0
+	hole_circle: bool = True
+	increase_copies: int = 1
+	increase_amount: float = 0.5
+	hole_max_size: float = 10.0
+	hole_min_size: float = 0.5
+	increase_loop_after: int = 20
+	edge_padding: float = 0.0
+	x_padding: float = 6.0
+	y_padding: float = 6.0
+	y_uppies: float = 12.0
+	no_lip: bool = True
+	no_lip_upper_size: float = 2.0
+	no_lip_fillet_size: float = 0.3
+	# Digest() once worked out, not a parameter
+	_digest: Optional[str] = field(default=None, init=False, repr=False, compare=False)
 
 	def __post_init__(self) -> None:
-		# Ensure version is always a SemVer instance
+		# None means the default, like it did before Holder was a dataclass
 		if self.version is None:
-			self.version = SemVer(1, 0, 0)
-
-		# Ensure hole_shape and hole_shape_limit are always HoleShape instances
-		if self.hole_shape is None:
-			self.hole_shape = Rect(1, 1)
-		if self.hole_shape_limit is None:
-			self.hole_shape_limit = Rect(1, 1)
-
-		# Ensure size_func is a callable
+			object.__setattr__(self, "version", SemVer(1, 0, 0))
+		for name in ("hole_shape", "hole_shape_max", "hole_shape_min"):
+			if getattr(self, name) is None:
+				object.__setattr__(self, name, Rect(1, 1))
 		if self.size_func is None:
-			self.size_func = size_default_increase
+			object.__setattr__(self, "size_func", size_default_increase)
+
+		# so 2 and 2.0 make the same holder
+		for name, convert in _holder_conversions:
+			object.__setattr__(self, name, convert(getattr(self, name)))
 
 	def __repr__(self) -> str:
 		return (
@@ -566,6 +1085,22 @@ class Holder:
 			f"hole_shape={self.hole_shape!r}, hole_size_flat={self.hole_size_flat})"
 		)
 
+	def CanonicalBytes(self) -> bytes:
+		"""The holder's parameters as bytes that are the same every run, see cad_common.manifest."""
+		return canonical_bytes(self)
+
+	def Digest(self) -> str:
+		if self._digest is None:
+			object.__setattr__(self, "_digest", digest(self))
+		return self._digest
+
+
+_holder_conversions = [
+	(f.name, {"float": float, "int": int, "bool": bool}[f.type])
+	for f in fields(Holder)
+	if f.type in ("float", "int", "bool")
+]
+
 
 
 def size_increase_drill(
@@ -582,8 +1117,6 @@ def size_increase_drill(
 	max_diameter = holder.hole_shape_max.GetSize()
 	min_diameter = holder.hole_shape_min.GetSize()
 
-	print("xy", i_x, i_y)
-
 	for loop_index in range(total_loops):
 		if loop_index % holder.increase_loop_after == 0:
 			hole_size_cir_base = size
@@ -605,10 +1138,105 @@ def size_increase_drill(
 		if loop_index % holder.increase_copies == 0:
 			hole_size_cir_base += holder.increase_amount
 
-	print("loop", total_loops, "radius", hole_size_cir)
 	return hole_size_cir
 
 
+def _size_increase_margin_np(size: "np.ndarray") -> "np.ndarray":
+	smallness = np.clip((size - 2.25) / (1.6 - 2.25), 0, 1)
+	margin = (hole_margin_normal * (1 - smallness)) + (hole_margin_small * smallness)
+	return size + margin
+
+
+def _size_increase_drill_np(
+	size: "np.ndarray",
+	holder: Holder,
+	i_x: "np.ndarray",
+	i_y: "np.ndarray",
+	total_loops: "np.ndarray",
+) -> "np.ndarray":
+	"""Closed form of size_increase_drill for every hole at once.
+
+	The loop in size_increase_drill only returns what it computed on its
+	last pass, which uses the base size after it was reset on the last
+	multiple of increase_loop_after and then grown once for every multiple
+	of increase_copies since.
+	"""
+	reset_at = total_loops - (total_loops % holder.increase_loop_after)
+	increases = (
+		((total_loops - 1) // holder.increase_copies)
+		- ((reset_at - 1) // holder.increase_copies)
+	)
+	hole_size_cir_base = size + (increases * holder.increase_amount)
+
+	hole_size_cir = np.where(
+		hole_size_cir_base > holder.hole_max_size,
+		holder.hole_max_size,
+		np.where(
+			hole_size_cir_base < holder.hole_min_size,
+			holder.hole_min_size,
+			hole_size_cir_base,
+		),
+	)
+
+	hole_size_cir = np.maximum(hole_size_cir, holder.hole_shape_min.GetSize())
+	hole_size_cir = np.minimum(hole_size_cir, holder.hole_shape_max.GetSize())
+
+	return _size_increase_margin_np(hole_size_cir)
+
+
+# numpy versions of the size funcs, same arguments as the scalar ones but
+# with i_x, i_y and total_loops as arrays over every hole
+_vector_size_funcs: "Dict[Callable[..., float], Callable[..., np.ndarray]]" = {
+	size_indentity: lambda size: size,
+	size_increase_margin: _size_increase_margin_np,
+	size_default_increase: _size_increase_margin_np,
+	size_increase_drill: _size_increase_drill_np,
+}
+
+
+class HoleSizePlan:
+	"""Final cut sizes of every hole in a holder, worked out up front.
+
+	`table` is a numpy structured array indexed [i_y, i_x] with one field
+	per key of holder.hole_shape.GetCutSizes(), already run through
+	holder.size_func. Size funcs in _vector_size_funcs run once over the
+	whole grid, anything else is called per hole with its arity looked up
+	once.
+	"""
+
+	def __init__(self, holder: Holder) -> None:
+		self.holder = holder
+
+		cut_sizes = holder.hole_shape.GetCutSizes()
+		self.table = np.zeros(
+			(holder.hole_num_y, holder.hole_num_x),
+			dtype=[(k, np.float64) for k in cut_sizes],
+		)
+
+		i_y, i_x = np.indices((holder.hole_num_y, holder.hole_num_x))
+		total_loops = (i_y * holder.hole_num_x) + i_x
+
+		vector_func = _vector_size_funcs.get(holder.size_func)
+		if vector_func is not None:
+			args = (holder, i_x, i_y, total_loops)
+			n = _func_arity(holder.size_func)
+			for k, v in cut_sizes.items():
+				size = np.full(total_loops.shape, v, dtype=np.float64)
+				self.table[k] = vector_func(size, *args[:n - 1])
+			return
+
+		func = holder.size_func
+		n = _func_arity(func)
+		for (cell_y, cell_x), loops in np.ndenumerate(total_loops):
+			args = (holder, cell_x, cell_y, int(loops))[:n - 1]
+			for k, v in cut_sizes.items():
+				self.table[k][cell_y, cell_x] = func(v, *args)
+
+	def GetSizes(self, i_x: int, i_y: int) -> Dict[str, float]:
+		cell = self.table[i_y, i_x]
+		return {k: float(cell[k]) for k in self.table.dtype.names}
+
+
 
 def get_start(
 	shape: HoleShape,
@@ -709,6 +1337,7 @@ def make_hole(
 	move_y: float,
 	z_face_flat,
 	total_loops: int,
+	sizes: Optional[Dict[str, float]] = None,
 ):
 
 
@@ -725,7 +1354,8 @@ def make_hole(
 		hole_depth=holder.hole_depth,
 		i_x=i,
 		i_y=i2,
-		total_loops=total_loops
+		total_loops=total_loops,
+		sizes=sizes,
 	)
 
 	# show_object(wp)
@@ -743,7 +1373,219 @@ def make_hole(
 	return result
 
 
-def make_holder(holder):
+def make_holes_compound(
+	holder: Holder,
+	result,
+	start_hor,
+	start_virt,
+	move_x: float,
+	move_y: float,
+	z_face_flat,
+	primitive: bool = False,
+	size_plan: Optional[HoleSizePlan] = None,
+):
+	"""Cut every hole of the holder with a single multi tool boolean."""
+	if size_plan is None:
+		size_plan = HoleSizePlan(holder)
+
+	hole_faces = result.faces(f">Z[{z_face_flat}]")
+	hole_plane = hole_faces.workplane()
+
+	tools = []
+	total_loops = 0
+	for i2 in range(holder.hole_num_y):
+		for i in range(holder.hole_num_x):
+			x = start_hor+(i*move_x)
+			y = start_virt+(i2*move_y)
+			sizes = size_plan.GetSizes(i, i2)
+
+			if primitive:
+				tools.extend(holder.hole_shape.MakeToolSolids(
+					plane=hole_plane.plane,
+					x=x,
+					y=y,
+					holder=holder,
+					hole_depth=holder.hole_depth,
+					i_x=i,
+					i_y=i2,
+					total_loops=total_loops,
+					sizes=sizes,
+				))
+			else:
+				tool = holder.hole_shape.MakeTool(
+					workplane=hole_plane.moveTo(x, y),
+					holder=holder,
+					hole_depth=holder.hole_depth,
+					i_x=i,
+					i_y=i2,
+					total_loops=total_loops,
+					sizes=sizes,
+				)
+				tools.extend(tool.vals())
+			total_loops += 1
+
+	if len(tools) == 0:
+		return result, []
+
+	cut, hole_edges = _cut_tracking_hole_edges(
+		result.findSolid(),
+		tools,
+		hole_faces.vals(),
+	)
+	return result.newObject([cut]), hole_edges
+
+
+def _cut_tracking_hole_edges(solid, tools, hole_faces):
+	"""Cut tools out of solid and return (cleaned result, new rim edges on hole_faces).
+
+	The rim edges come from the boolean's history: they're the edges that
+	the modified hole faces share with the modified tool faces (plus any
+	section edges the kernel reports as generated from the hole faces),
+	followed through the clean. This never looks at the rest of the solid.
+	An empty list means there was no usable history.
+	"""
+	from OCP.ShapeUpgrade import ShapeUpgrade_UnifySameDomain
+	from OCP.TopoDS import TopoDS_Shape  # noqa
+
+	op = booleans.boolean_op("cut", [solid], tools)
+
+	def images(shape) -> List[TopoDS_Shape]:
+		if op.IsDeleted(shape):
+			return []
+		modified = list(op.Modified(shape))
+		return modified if modified else [shape]
+
+	hole_face_edges: Dict[cq.Shape, None] = {}
+	for face in hole_faces:
+		for image in images(face.wrapped):
+			for edge in cq.Shape.cast(image).Edges():
+				hole_face_edges[edge] = None
+		if op.HasGenerated():
+			for generated in op.Generated(face.wrapped):
+				hole_face_edges[cq.Shape.cast(generated)] = None
+
+	tool_face_edges = set()
+	for tool in tools:
+		for face in tool.Faces():
+			for image in images(face.wrapped):
+				tool_face_edges.update(cq.Shape.cast(image).Edges())
+
+	rim_edges = [edge for edge in hole_face_edges if edge in tool_face_edges]
+
+	# same as Shape.clean, but keeping the history to follow the rim edges
+	upgrader = ShapeUpgrade_UnifySameDomain(op.Shape(), True, True, True)
+	upgrader.AllowInternalEdges(False)
+	upgrader.Build()
+	history = upgrader.History()
+
+	cleaned = cq.Shape.cast(upgrader.Shape())
+	hole_edges: Dict[cq.Shape, None] = {}
+	for edge in rim_edges:
+		if history.IsRemoved(edge.wrapped):
+			continue
+		modified = list(history.Modified(edge.wrapped))
+		for image in modified if modified else [edge.wrapped]:
+			hole_edges[cq.Shape.cast(image)] = None
+
+	return cleaned, list(hole_edges)
+
+
+# gridfinity sizes in mm
+gf_hi_size = 7
+gf_wid_size = 42
+gf_padding = 2.95
+gf_lip_size = 3.8  # this is exactly correct
+
+
+def holder_solid_ratio(holder) -> float:
+	"""fill_mm as the solid_ratio cqgridfinity wants."""
+	return holder.fill_mm / (gf_hi_size * holder.gridfin_height)
+	# return ((n / ((gf_hi_size-(0.9623333333+1.2)) * height)) * -1) + 1
+	# return ((n / ((gf_hi_size) * height)) * -1) + 1
+	# return ((n / (gf_size_t_bot * height)) * -1) + 1
+
+
+def make_holder_base(holder):
+	"""The solid Gridfinity box the holder's holes are cut from."""
+	sr = holder_solid_ratio(holder)
+	return base_library.GetBase(
+		holder.gridfin_x,
+		holder.gridfin_y,
+		holder.gridfin_height,
+		no_lip=holder.no_lip,
+		solid_ratio=sr
+	)
+
+
+def hole_grid(holder) -> Tuple[float, float, float, float]:
+	"""(start_hor, start_virt, move_x, move_y) of the holes on the hole face."""
+	size_wid = gf_wid_size * holder.gridfin_x
+	size_dep = gf_wid_size * holder.gridfin_y
+
+	x_full_padding = gf_padding+holder.x_padding
+	y_full_padding = gf_padding+holder.y_padding
+
+	start_hor = get_start(
+		holder.hole_shape,
+		"x",
+		size_wid,
+		x_full_padding,
+		holder.hole_num_x,
+	)
+
+	start_virt = get_start(
+		holder.hole_shape,
+		"y",
+		size_dep,
+		y_full_padding,
+		holder.hole_num_y,
+		holder.y_uppies,
+	)
+
+	move_x = get_move_xy(
+		holder.hole_shape,
+		"x",
+		size_wid,
+		x_full_padding,
+		holder.hole_num_x
+	)
+	move_y = get_move_xy(
+		holder.hole_shape,
+		"y",
+		size_dep,
+		y_full_padding,
+		holder.hole_num_y,
+		holder.y_uppies
+	)
+	return start_hor, start_virt, move_x, move_y
+
+
+def cut_holder_lip(holder, result, bh):
+	"""Cut the walls down to no_lip_upper_size over the hole face and round them."""
+	size_wid = gf_wid_size * holder.gridfin_x
+	size_dep = gf_wid_size * holder.gridfin_y
+
+	with trace.span("lip cutBlind", holder=holder.name):
+		result = (
+			result
+			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			.workplane(offset=holder.no_lip_upper_size)
+			.rect(size_wid*2, size_dep*2)  # Create a rectangle of width and depth
+
+			.cutBlind((bh.height))
+		)
+
+	with trace.span("lip fillet %LINE", holder=holder.name):
+		result = (
+			result
+			.faces(">Z")  # Select the bottom face of the hexagonal holes
+			.edges("%LINE")   # Select all straight edges
+			.fillet(holder.no_lip_fillet_size)
+		)
+	return result
+
+
+def make_holder(holder, hole_cut_mode: Optional[str] = None):
 	hole_size_flat = holder.hole_size_flat
 	hole_depth = holder.hole_depth
 	fill_mm = holder.fill_mm
@@ -767,49 +1609,12 @@ def make_holder(holder):
 	no_lip_upper_size = holder.no_lip_upper_size
 	no_lip_fillet_size = holder.no_lip_fillet_size
 
+	if hole_cut_mode is None:
+		hole_cut_mode = default_hole_cut_mode
 
 
-
-	gf_hi_size = 7
-	gf_wid_size = 42
-	gf_padding = 2.95
-	gf_lip_size = 3.8  # this is exactly correct
-	hex_short_to_long = 1.1547
-
-	hole_size_pointy = hole_size_flat * hex_short_to_long
-	if hole_circle:
-		hole_size_pointy = hole_size_flat
-
-
-	def to_sr(n):
-		return n / (gf_hi_size * gridfin_height)
-		# return ((n / ((gf_hi_size-(0.9623333333+1.2)) * height)) * -1) + 1
-		# return ((n / ((gf_hi_size) * height)) * -1) + 1
-		# return ((n / (gf_size_t_bot * height)) * -1) + 1
-
-
-	# gf_size_t_bot = gf_lip_size + top_to_fill
-	sr = to_sr(fill_mm)
-	# if sr < 0:
-	#     top_to_fill = (gf_hi_size * (height))
-
-
-	# gf_size_t_bot = gf_lip_size + top_to_fill
-	print(sr)
-	# no_lip = True
-	bh = cqg.GridfinityBox(
-		gridfin_x,
-		gridfin_y,
-		gridfin_height,
-		length_div=0,
-		width_div=0,
-		holes=False,
-		no_lip=no_lip,
-		scoops=False,
-		labels=False,
-		solid=True,
-		solid_ratio=sr
-	)
+	with trace.span("gridfinity base", holder=holder.name):
+		bh = make_holder_base(holder)
 
 	# bh = cqg.
 	# make the base
@@ -819,32 +1624,10 @@ def make_holder(holder):
 		# .workplane()
 	)
 
-	size_wid = gf_wid_size * gridfin_x
-	size_dep = gf_wid_size * gridfin_y
-
 	# move_x = (((size_wid)) / (hole_num_x+1))
 	z_face_flat = "-2"
 
-	x_full_padding = gf_padding+x_padding
-	y_full_padding = gf_padding+y_padding
-
-
-	start_hor = get_start(
-		holder.hole_shape,
-		"x",
-		size_wid,
-		x_full_padding,
-		holder.hole_num_x,
-	)
-
-	start_virt = get_start(
-		holder.hole_shape,
-		"y",
-		size_dep,
-		y_full_padding,
-		holder.hole_num_y,
-		y_uppies,
-	)
+	start_hor, start_virt, move_x, move_y = hole_grid(holder)
 
 
 	result_pre_hold_edges = (
@@ -856,58 +1639,68 @@ def make_holder(holder):
 
 
 
-	move_x = get_move_xy(
-		holder.hole_shape,
-		"x",
-		size_wid,
-		x_full_padding,
-		hole_num_x
-	)
-	move_y = get_move_xy(
-		holder.hole_shape,
-		"y",
-		size_dep,
-		y_full_padding,
-		hole_num_y,
-		y_uppies
-	)
-
-
 	# hole_size_cir = hole_size_flat
 
-	total_loops = 0
-	for i2 in range(hole_num_y):
-		for i in range(hole_num_x):
-			result = make_hole(
+	size_plan = HoleSizePlan(holder)
+
+	with trace.span("holes", holder=holder.name, mode=hole_cut_mode, holes=hole_num_x * hole_num_y):
+		hole_edges = []
+		if hole_cut_mode in ("compound", "primitive"):
+			result, hole_edges = make_holes_compound(
 				holder=holder,
 				result=result,
-				i=i,
-				i2=i2,
 				start_hor=start_hor,
 				start_virt=start_virt,
 				move_x=move_x,
 				move_y=move_y,
 				z_face_flat=z_face_flat,
-				total_loops=total_loops,
+				primitive=hole_cut_mode == "primitive",
+				size_plan=size_plan,
+			)
+		elif hole_cut_mode == "serial":
+			total_loops = 0
+			for i2 in range(hole_num_y):
+				for i in range(hole_num_x):
+					result = make_hole(
+						holder=holder,
+						result=result,
+						i=i,
+						i2=i2,
+						start_hor=start_hor,
+						start_virt=start_virt,
+						move_x=move_x,
+						move_y=move_y,
+						z_face_flat=z_face_flat,
+						total_loops=total_loops,
+						sizes=size_plan.GetSizes(i, i2),
+					)
+					total_loops += 1
+		else:
+			raise ValueError(f"unknown hole_cut_mode {hole_cut_mode!r}, use one of {hole_cut_modes}")
+
+
+	if hole_chamfer_size > 0 and len(hole_edges) > 0:
+		# rim edges straight from the hole cut's history
+		with trace.span("chamfer", holder=holder.name, from_history=True):
+			result = result.newObject(hole_edges).chamfer(hole_chamfer_size)
+
+	elif hole_chamfer_size > 0:
+		with trace.span("chamfer", holder=holder.name, from_history=False):
+			pre_hole_edges = set(result_pre_hold_edges.vals())
+
+			result = (
+				result
+				.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+				# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
+				.edges()
+				.filter(lambda edge: edge not in pre_hole_edges)  # Exclude specific edges
+				# # ignore 4 longest edges, should always be the edge of the box
+				# .sort(lambda edge: edge.Length())[::-1][4:]
+				#
+				# .edges("not(<<X[0] or >>X[0] or <<Y[0] or >>Y[0])")   # Select all straight edges
+				# # .filter(lambda edge: edge.isCircle())
+				.chamfer(hole_chamfer_size)
 			)
-			total_loops += 1
-
-
-	if hole_chamfer_size > 0:
-
-		result = (
-			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
-			# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
-			.edges()
-			.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
-			# # ignore 4 longest edges, should always be the edge of the box
-			# .sort(lambda edge: edge.Length())[::-1][4:]
-			#
-			# .edges("not(<<X[0] or >>X[0] or <<Y[0] or >>Y[0])")   # Select all straight edges
-			# # .filter(lambda edge: edge.isCircle())
-			.chamfer(hole_chamfer_size)
-		)
 
 		# if not hole_circle:
 		#     result = (
@@ -943,22 +1736,7 @@ def make_holder(holder):
 
 
 	if no_lip:
-		cut_size = no_lip_upper_size
-		result = (
-			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
-			.workplane(offset=no_lip_upper_size)
-			.rect(size_wid*2, size_dep*2)  # Create a rectangle of width and depth
-
-			.cutBlind((bh.height))
-		)
-
-		result = (
-			result
-			.faces(">Z")  # Select the bottom face of the hexagonal holes
-			.edges("%LINE")   # Select all straight edges
-			.fillet(no_lip_fillet_size)
-		)
+		result = cut_holder_lip(holder, result, bh)
 
 	# Render the solid
 	return result, holder
@@ -970,477 +1748,766 @@ def make_holder(holder):
 
 
 def and_models(models):
-	main_result = None
+	return booleans.common_models(models)
+
+def holder_base_key(holder) -> tuple:
+	"""Holders with equal keys are cut from the same base with the same lip."""
+	key = base_library.Key(
+		holder.gridfin_x,
+		holder.gridfin_y,
+		holder.gridfin_height,
+		holder.no_lip,
+		holder_solid_ratio(holder),
+	)
+	if holder.no_lip:
+		key += (
+			float(holder.no_lip_upper_size).hex(),
+			float(holder.no_lip_fillet_size).hex(),
+		)
+	return key
 
-	for model in models:
-		if main_result is None:
-			main_result = model
-		else:
-			main_result = main_result.intersect(model)
 
-	return main_result
+def make_hole_tool_solids(holder, plane, chamfers: bool = False) -> "List[cq.Solid]":
+	"""Every hole tool of the holder on plane, plus its chamfer frustums."""
+	start_hor, start_virt, move_x, move_y = hole_grid(holder)
+	size_plan = HoleSizePlan(holder)
 
-def and_holders(holders):
-	main_result = None
-	main_holder = None
+	tools = []
+	total_loops = 0
+	for i2 in range(holder.hole_num_y):
+		for i in range(holder.hole_num_x):
+			x = start_hor+(i*move_x)
+			y = start_virt+(i2*move_y)
+			sizes = size_plan.GetSizes(i, i2)
+
+			tools.extend(holder.hole_shape.MakeToolSolids(
+				plane=plane,
+				x=x,
+				y=y,
+				holder=holder,
+				hole_depth=holder.hole_depth,
+				i_x=i,
+				i_y=i2,
+				total_loops=total_loops,
+				sizes=sizes,
+			))
+			if chamfers and holder.hole_chamfer_size > 0:
+				tools.extend(holder.hole_shape.MakeChamferToolSolids(
+					plane=plane,
+					x=x,
+					y=y,
+					holder=holder,
+					chamfer_size=holder.hole_chamfer_size,
+					i_x=i,
+					i_y=i2,
+					total_loops=total_loops,
+					sizes=sizes,
+				))
+			total_loops += 1
+	return tools
 
-	for holder in holders:
-		result, _ = make_holder(holder=holder)
-		if main_result is None:
-			main_result = result
-			main_holder = holder
-		else:
-			main_result = main_result.intersect(result)
 
-	return Holder_Model(main_holder, main_result)
+def make_holders_combined(holders):
+	"""and_holders for holders that share a base, with one base and one cut.
 
+	The intersection of finished holders on the same base is that base minus
+	every holder's holes and chamfers. The chamfers are cut as frustums
+	rather than by chamfering rim edges, since the rims of different holders
+	can run into each other.
+	"""
+	main_holder = holders[0]
+	with trace.span("gridfinity base", holder=main_holder.name):
+		bh = make_holder_base(main_holder)
+	result = bh.cq_obj
 
-def loop_output(out_dir, holders, models, do_stl, filter = ""):
+	hole_faces = result.faces(">Z[-2]")
+	plane = hole_faces.workplane().plane
 
+	tools = []
 	for holder in holders:
-		if not (filter == holder.name or filter == ""):
-			continue
+		tools.extend(make_hole_tool_solids(holder, plane, chamfers=True))
 
-		result, holder = make_holder(holder=holder)
-		models.append(Holder_Model(holder, result))
+	if len(tools) > 0:
+		with trace.span("holes", holder=main_holder.name, holders=len(holders), tools=len(tools)):
+			cut, _ = _cut_tracking_hole_edges(result.findSolid(), tools, hole_faces.vals())
+		result = result.newObject([cut])
 
-	for model in models:
-		if not (filter == model.holder.name or filter == ""):
-			continue
+	if main_holder.no_lip:
+		result = cut_holder_lip(main_holder, result, bh)
 
-		show_object(
-			model.model,
-			name=f"{model.holder.name} v{str(model.holder.version)}"
+	return result
+
+
+def and_holders(holders):
+	"""Keep only what every holder keeps, as one part named after the first."""
+	if len({holder_base_key(holder) for holder in holders}) == 1:
+		return Holder_Model(holders[0], make_holders_combined(holders))
+
+	# different bases, intersect the finished holders
+	results = [make_holder(holder=holder)[0] for holder in holders]
+	return Holder_Model(holders[0], and_models(results))
+
+
+def holder_family(base: Holder, names: List[str], **varying) -> List[Holder]:
+	"""Variants of base, one per name, for holders wanted in several sizes.
+
+	Every other keyword is a Holder field. A list, tuple, numpy array or
+	HoleShapeArray gives one value per variant, anything else is used for
+	all of them:
+
+		holder_family(
+			chapstick,
+			names=[f"chapstick holder {d}" for d in (15.4, 15.6, 15.8)],
+			hole_shape=[Circle(15.4), Circle(15.6), Circle(15.8)],
 		)
 
-		if not (__name__ == "__main__" and (out_dir != doesnt_exist_script_dir)):
-			continue
+	Variants keep base's version unless given one. Built together (loop_output
+	does this for any holders that share a base), they share one lipped base
+	per worker, see make_family_member.
+	"""
+	for field_name, values in varying.items():
+		if isinstance(values, (list, tuple, np.ndarray, HoleShapeArray)) and len(values) != len(names):
+			raise ValueError(f"{field_name} has {len(values)} values for {len(names)} names")
+
+	def value(values, i):
+		if isinstance(values, (list, tuple, HoleShapeArray)):
+			return values[i]
+		if isinstance(values, np.ndarray):
+			return values[i].item()
+		return values
+
+	return [
+		replace(base, name=name, **{k: value(v, i) for k, v in varying.items()})
+		for i, name in enumerate(names)
+	]
+
+
+@dataclass
+class FamilyBase:
+	"""A holder base with its lip already cut, shared by every holder on it."""
+	model: Any
+	plane: Any
+	hole_faces: List[Any]
+
+
+# per process, workers keep theirs for every job they get
+_family_bases: Dict[tuple, FamilyBase] = {}
+
+
+def make_family_base(holder) -> FamilyBase:
+	"""The base of holder with the lip cut, built once per holder_base_key.
+
+	The lip only takes material above the hole face and the holes only go
+	down from it, so cutting the lip first gives the same part as
+	make_holder, which cuts it last.
+	"""
+	key = holder_base_key(holder)
+	family_base = _family_bases.get(key)
+	if family_base is not None:
+		return family_base
+
+	with trace.span("gridfinity base", holder=holder.name):
+		bh = make_holder_base(holder)
+	plane = bh.cq_obj.faces(">Z[-2]").workplane().plane
+	model = bh.cq_obj
+	if holder.no_lip:
+		model = cut_holder_lip(holder, model, bh)
+
+	# after the lip fillets ">Z[-2]" is no longer the hole face, find it by plane
+	hole_faces = [
+		face for face in model.val().Faces()
+		if face.geomType() == "PLANE"
+		and abs(face.Center().z - plane.origin.z) < 1e-6
+		and face.normalAt().z > 0.99
+	]
+	family_base = FamilyBase(model, plane, hole_faces)
+	_family_bases[key] = family_base
+	return family_base
+
+
+def make_family_member(holder):
+	"""Same part as make_holder, cut from the shared make_family_base."""
+	family_base = make_family_base(holder)
+	tools = make_hole_tool_solids(holder, family_base.plane)
+	result = family_base.model
+	if len(tools) == 0:
+		return result.newObject(result.vals())
+
+	with trace.span("holes", holder=holder.name, tools=len(tools)):
+		cut, hole_edges = _cut_tracking_hole_edges(result.val(), tools, family_base.hole_faces)
+	result = result.newObject([cut])
+	if holder.hole_chamfer_size > 0:
+		if len(hole_edges) == 0:
+			# no usable history, fall back to the whole pipeline
+			return make_holder(holder)[0]
+		with trace.span("chamfer", holder=holder.name, from_history=True):
+			result = result.newObject(hole_edges).chamfer(holder.hole_chamfer_size)
+	return result
+
+
+def shared_base_keys(build_jobs: List[List[Holder]]) -> set:
+	"""Base keys of single holder jobs that share their base with another one."""
+	counts = Counter(
+		holder_base_key(build_job[0]) for build_job in build_jobs if len(build_job) == 1
+	)
+	return {key for key, count in counts.items() if count > 1}
 
-		name = f"{model.holder.name} v{str(model.holder.version)}"
 
-		exporters.export(
-			model.model,
-			str(out_dir.joinpath(name + ".step")),
+def build_job_model(build_job: List[Holder], shared_base: bool = False):
+	"""The finished part of one job, shared_base builds it as a family member."""
+	with trace.span(
+		"build",
+		holder=build_job[0].name,
+		holders=[holder.name for holder in build_job],
+		shared_base=shared_base,
+		params=build_job[0],
+	):
+		if len(build_job) > 1:
+			return and_holders(build_job).model
+		if shared_base:
+			return make_family_member(build_job[0])
+		return make_holder(holder=build_job[0])[0]
+
+
+def _build_job(holders: List[Holder], shared_base: bool = False) -> tuple:
+	"""Worker side of build_holders_parallel, returns (BREP bytes, seconds)."""
+	start = time.perf_counter()
+	result = build_job_model(holders, shared_base)
+	return shape_to_brep(result.val()), time.perf_counter() - start
+
+
+def build_holders_parallel(
+	build_jobs: List[List[Holder]],
+	jobs: int,
+) -> Iterator[Optional[Holder_Model]]:
+	"""Build every job in a process pool, yielding models in the order given.
+
+	A job is a list of holders, one holder is built with make_holder and
+	more are combined with and_holders. Single holders that share a base
+	with another job are built with make_family_member, each worker lips a
+	base once for all the jobs it gets. Finished solids come back as BREP
+	bytes. A job that raises or takes its worker down only loses its own
+	model (None is yielded for it), the other jobs still finish.
+
+	A crashed worker breaks the whole pool. The jobs that weren't done go
+	to a new pool, up to pool_restarts times, after that every job left
+	runs in a pool of its own so only the one that crashes is lost.
+	"""
+
+	def load(index, future) -> Optional[Holder_Model]:
+		try:
+			brep, seconds = future.result()
+		except BrokenProcessPool:
+			raise
+		except Exception as e:
+			print(f"failed to build \"{build_jobs[index][0].name}\": {e!r}")
+			return None
+
+		shape = shape_from_brep(brep)
+		print(f"built \"{build_jobs[index][0].name}\" in {seconds:.2f}s")
+		return Holder_Model(
+			build_jobs[index][0],
+			cq.Workplane("XY").newObject([shape]),
+			seconds,
 		)
 
-		if not do_stl:
-			continue
+	shared = shared_base_keys(build_jobs)
 
-		exporters.export(
-			w=model.model,
-			fname = str(out_dir.joinpath(name + ".stl")),
-			tolerance = 0.0001,
-			angularTolerance = 0.04,
+	def submit(pool, build_job):
+		shared_base = len(build_job) == 1 and holder_base_key(build_job[0]) in shared
+		return pool.submit(_build_job, build_job, shared_base)
+
+	def unfinished(future) -> bool:
+		# futures that finished before the crash keep their results
+		return (
+			not future.done()
+			or future.cancelled()
+			or isinstance(future.exception(), BrokenProcessPool)
 		)
 
-def _call_variable_func(func, *args):
-	"""Call size_func with only the args it declared."""
-	n = len(inspect.signature(func).parameters)
-	return func(*args[:n])
+	def load_alone(index) -> Optional[Holder_Model]:
+		# retry the job alone to find out if it is the one that actually crashes
+		with ProcessPoolExecutor(max_workers=1) as retry_pool:
+			try:
+				return load(index, submit(retry_pool, build_jobs[index]))
+			except BrokenProcessPool:
+				print(f"failed to build \"{build_jobs[index][0].name}\": worker crashed")
+				return None
+
+	pool = ProcessPoolExecutor(max_workers=jobs)
+	restarts = 0
+	try:
+		futures = [submit(pool, build_job) for build_job in build_jobs]
+		for index in range(len(build_jobs)):
+			while True:
+				try:
+					model = load(index, futures[index])
+				except BrokenProcessPool:
+					if restarts == pool_restarts:
+						model = load_alone(index)
+						break
+					restarts += 1
+					lost = [i for i in range(index, len(futures)) if unfinished(futures[i])]
+					print(f"a worker crashed, building the {len(lost)} unfinished holders in a new pool")
+					pool.shutdown()
+					pool = ProcessPoolExecutor(max_workers=jobs)
+					for i in lost:
+						futures[i] = submit(pool, build_jobs[i])
+					continue
+				break
+			futures[index] = None
+			yield model
+	finally:
+		pool.shutdown()
+
+
+def build_holders_serial(build_jobs: List[List[Holder]]) -> Iterator[Holder_Model]:
+	"""Build every job in this process, yielding each model as it is done."""
+	shared = shared_base_keys(build_jobs)
+	for build_job in build_jobs:
+		start = time.perf_counter()
+		shared_base = len(build_job) == 1 and holder_base_key(build_job[0]) in shared
+		result = build_job_model(build_job, shared_base)
+		yield Holder_Model(build_job[0], result, time.perf_counter() - start)
+
+
+def _timed_export(model, path: Path, store: Optional[artifacts.ArtifactStore] = None, **kwargs) -> float:
+	start = time.perf_counter()
+	with trace.span("export", cat="export", file=Path(path).name):
+		artifacts.export(model, path, store=store, **kwargs)
+	return time.perf_counter() - start
+
+
+def _timed_write_stl(shape, path: Path, store: Optional[artifacts.ArtifactStore] = None) -> float:
+	start = time.perf_counter()
+	with trace.span("export", cat="export", file=path.name):
+		with artifacts.writing(path, store) as stl_path:
+			tessellation.write_stl(shape, stl_path)
+	return time.perf_counter() - start
+
+
+def output_name(holder) -> str:
+	"""File name of a holder's exports, without the extension."""
+	return f"{holder.name} v{str(holder.version)}"
+
+
+def export_model(
+	out_dir,
+	model: Holder_Model,
+	formats,
+	pool: ThreadPoolExecutor,
+	mesh_policy: Optional[tessellation.MeshPolicy] = None,
+	store: Optional[artifacts.ArtifactStore] = None,
+) -> Dict[Path, float]:
+	"""Write every requested format of one model at the same time.
+
+	STLs use stl_tolerance and stl_angular_tolerance, or with mesh_policy
+	tolerances picked for this part (see cad_common.tessellation). With
+	store the files are written into it and out_dir gets the pointers.
+	Returns the seconds each file took to write.
+	"""
+	name = output_name(model.holder)
+
+	# mesh up front so the STL write only reads the shape while the
+	# other writers are working on it too
+	with trace.span("tessellate", cat="export", holder=model.holder.name, adaptive=mesh_policy is not None):
+		if "stl" in formats and mesh_policy is not None:
+			report = tessellation.mesh_adaptive(model.model, mesh_policy)
+			print(f"meshed \"{model.holder.name}\": {report.Summary()}")
+		elif "stl" in formats:
+			model.model.val().mesh(stl_tolerance, stl_angular_tolerance)
+
+	writes = {}
+	for export_format in formats:
+		path = out_dir.joinpath(f"{name}.{export_format}")
+		if export_format == "stl" and mesh_policy is not None:
+			writes[path] = pool.submit(_timed_write_stl, model.model, path, store)
+		elif export_format == "stl":
+			writes[path] = pool.submit(
+				_timed_export,
+				model.model,
+				path,
+				store,
+				tolerance = stl_tolerance,
+				angularTolerance = stl_angular_tolerance,
+			)
+		else:
+			writes[path] = pool.submit(_timed_export, model.model, path, store)
 
+	return {path: write.result() for path, write in writes.items()}
 
-def main():
-	holders = []
-
-
-	holders.append(Holder(
-		name="ltt screwdriver bit holder",
-		version=SemVer(1, 0, 0),
-		hole_shape=Hexagon(6.35),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=6.75,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=6,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=2,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=3.5,
-		y_padding=3.7,
-		y_uppies=4.5,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
 
+def export_models(
+	out_dir,
+	model_queue: queue.Queue,
+	formats,
+	manifest: BuildManifest,
+	errors: list,
+	mesh_policy: Optional[tessellation.MeshPolicy] = None,
+	store: Optional[artifacts.ArtifactStore] = None,
+):
+	"""Export thread, takes (model, digest) off the queue until it gets None."""
+	with ThreadPoolExecutor(max_workers=len(export_formats)) as pool:
+		while (item := model_queue.get()) is not None:
+			model, digest = item
+			try:
+				with trace.span("export model", cat="export", holder=model.holder.name):
+					files = export_model(out_dir, model, formats, pool, mesh_policy, store)
+				manifest.Record(output_name(model.holder), digest, files, model.build_seconds)
+			except Exception as e:
+				errors.append(e)
+				print(f"failed to export \"{model.holder.name}\": {e!r}")
+			# drop the solid now that its files are written
+			del model, item
+
+
+def build_job_digest(
+	build_job: List[Holder],
+	formats,
+	mesh_policy: Optional[tessellation.MeshPolicy] = None,
+) -> str:
+	"""Manifest digest of one build job, see cad_common.manifest."""
+	return part_digest(
+		[holder.Digest() for holder in build_job],
+		build_job[0].version,
+		[
+			source_digest(Path(__file__), skip=("main", "holder_catalog")),
+			*module_sources(Path(__file__)),
+		],
+		extra={
+			"cqgridfinity": gridfinity_base.cqgridfinity_version(),
+			"formats": sorted(formats),
+			"stl": (
+				None if "stl" not in formats
+				else mesh_policy if mesh_policy is not None
+				else [stl_tolerance, stl_angular_tolerance]
+			),
+		},
+	)
 
-	holders.append(Holder(
-		name="drill bit holder",
-		version=SemVer(1, 0, 0),
-		hole_shape=Circle(0.5),
-		hole_shape_max=Circle(10.0),
-		hole_shape_min=Circle(0.01),
-		size_func=size_increase_drill,
-
-		hole_depth=15.0,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=5,
-		gridfin_x=2,
-		hole_num_y=4,
-		gridfin_y=2,
-		hole_chamfer_size=2.0,
-		increase_copies=1,
-		increase_amount=0.5,
-		hole_max_size=10.0,
-		hole_min_size=0.5,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=6.0,
-		y_padding=6.0,
-		y_uppies=12.0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
 
-	holders.append(Holder(
-		name="aa battery holder",
-		version=SemVer(1, 0, 2),
-		hole_shape=Circle(14.4),
-		hole_shape_max=Circle(99999999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_size_flat=14.4,
-		hole_depth=15.0,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=4,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=2.225,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.0,
-		y_padding=1,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+def parse_formats(text: str) -> Tuple[str, ...]:
+	""""step,stl" -> ("step", "stl"), for --format."""
+	formats = tuple(dict.fromkeys(f.strip().lower() for f in text.split(",") if f.strip()))
+	unknown = [f for f in formats if f not in export_formats]
+	if unknown or not formats:
+		raise argparse.ArgumentTypeError(
+			f"unknown format {', '.join(unknown) or text!r}, use some of {', '.join(export_formats)}"
+		)
+	return formats
+
+
+def select_holders(
+	holders: List[Holder],
+	and_groups: List[List[Holder]],
+	patterns: List[str],
+	regex: bool = False,
+) -> Tuple[List[Holder], List[List[Holder]]]:
+	"""Keep the holders and and_groups whose name matches any of patterns.
+
+	Patterns are case insensitive globs on the whole name, or with regex
+	regular expressions searched anywhere in it. An and group goes by the
+	name of its first holder, which is the name it's exported under. No
+	patterns keeps everything.
+	"""
+	if len(patterns) == 0:
+		return list(holders), list(and_groups)
+
+	if regex:
+		compiled = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+		def matches(name):
+			return any(c.search(name) for c in compiled)
+	else:
+		def matches(name):
+			return any(fnmatch.fnmatchcase(name.lower(), pattern.lower()) for pattern in patterns)
 
-	holders.append(Holder(
-		name="8 aaa battery holder",
-		version=SemVer(1, 0, 1),
-		hole_shape=Circle(10.35),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=15.0,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=4,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=4,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=3.5,
-		y_padding=3,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+	return (
+		[holder for holder in holders if matches(holder.name)],
+		[group for group in and_groups if matches(group[0].name)],
+	)
 
-	holders.append(Holder(
-		name="10 aaa battery holder",
-		version=SemVer(1, 0, 1),
-		hole_shape=Circle(10.35),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=15.0,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=5,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=2.5,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.2,
-		y_padding=3.1,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
 
-	holders.append(Holder(
-		name="chapstick holder",
-		version=SemVer(1, 0, 1),
-		hole_shape=Circle(15.60),
-		hole_shape_max=Circle(99999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_size_flat=15.60,
-		hole_depth=15.0,
-		fill_mm=18.0,
-		gridfin_height=7.0,
-		hole_num_x=4,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=1.5,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=1,
-		edge_padding=0.0,
-		x_padding=0.5,
-		y_padding=0.3,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+def list_holders(holders: List[Holder], and_groups: List[List[Holder]]) -> None:
+	for group in and_groups:
+		print(f"{output_name(group[0])}  ({' and '.join(holder.name for holder in group)})")
+	for holder in holders:
+		print(output_name(holder))
+
+
+def loop_output(
+	out_dir,
+	holders,
+	models,
+	formats=default_export_formats,
+	and_groups=(),
+	jobs: int = 1,
+	force: bool = False,
+	dry_run: bool = False,
+	mesh_policy: Optional[tessellation.MeshPolicy] = None,
+	store: Optional[artifacts.ArtifactStore] = None,
+):
+	"""Build the holders and and_groups and export each one in formats.
+
+	Building and exporting run as a pipeline, a model is handed to the
+	export thread as soon as it is built and let go once its files are
+	written, so at most export_queue_depth models wait in memory. models
+	only keeps what was built when not exporting (cq-editor).
+
+	When exporting, parts whose build manifest entry is still current are
+	skipped unless force is set. dry_run only prints what would be built.
+	mesh_policy picks the STL tolerances per part instead of the fixed ones,
+	with store the files end up in the artifact store behind pointers.
+	"""
+
+	build_jobs = [list(group) for group in and_groups]
+	build_jobs += [[holder] for holder in holders]
+
+	do_export = __name__ == "__main__" and (out_dir != doesnt_exist_script_dir)
+
+	digests = [None] * len(build_jobs)
+	if do_export:
+		manifest = BuildManifest(out_dir, force=force)
+		digests = [build_job_digest(build_job, formats, mesh_policy) for build_job in build_jobs]
+		current = [
+			manifest.IsCurrent(output_name(build_job[0]), digest)
+			for build_job, digest in zip(build_jobs, digests)
+		]
+		for build_job, is_current in zip(build_jobs, current):
+			if is_current:
+				print(f"\"{build_job[0].name}\" is up to date")
+		build_jobs = [b for b, is_current in zip(build_jobs, current) if not is_current]
+		digests = [d for d, is_current in zip(digests, current) if not is_current]
+
+	if dry_run:
+		for build_job in build_jobs:
+			print(f"would build \"{build_job[0].name}\" as {', '.join(formats)}")
+		return
+
+	if jobs > 1:
+		built = build_holders_parallel(build_jobs, jobs)
+	else:
+		built = build_holders_serial(build_jobs)
+
+	if do_export:
+		model_queue = queue.Queue(maxsize=export_queue_depth)
+		errors = []
+		exporter = threading.Thread(
+			target=export_models,
+			args=(out_dir, model_queue, formats, manifest, errors, mesh_policy, store),
+			name="holder export",
+		)
+		exporter.start()
 
+	try:
+		with trace.span("loop_output", jobs=jobs, parts=len(build_jobs), formats=",".join(formats)):
+			for model, digest in zip(built, digests):
+				if model is None:
+					continue
+
+				show_object(model.model, name=output_name(model.holder))
+
+				if do_export:
+					model_queue.put((model, digest))
+				else:
+					models.append(model)
+				del model
+	finally:
+		if do_export:
+			model_queue.put(None)
+			exporter.join()
+
+	if do_export and errors:
+		raise errors[0]
+
+def compare_hole_cut_modes(holders):
+	"""Build each holder with every hole_cut_mode and print the timings."""
+	for holder in holders:
+		timings = {}
+		volumes = {}
+		for mode in hole_cut_modes:
+			start = time.perf_counter()
+			result, _ = make_holder(holder=holder, hole_cut_mode=mode)
+			timings[mode] = time.perf_counter() - start
+			volumes[mode] = result.val().Volume()
+
+		report = [f"serial {timings['serial']:.3f}s"]
+		for mode in hole_cut_modes[1:]:
+			same = math.isclose(volumes["serial"], volumes[mode], rel_tol=1e-9)
+			report.append(
+				f"{mode} {timings[mode]:.3f}s "
+				f"({timings['serial'] / timings[mode]:.2f}x"
+				f"{'' if same else ', volume differs!'})"
+			)
+		print(f"{holder.name}: {', '.join(report)}")
 
-	holders.append(Holder(
-		name="9v battery holder",
-		version=SemVer(1, 0, 1),
-		hole_shape=Rect(26, 17),
-		hole_shape_max=Rect(999, 999),
-		# hole_shape_min=Circle(0.01),
-		# size_func=size_increase_drill,
-
-		hole_depth=17.0,
-		fill_mm=20.0,
-		gridfin_height=7.0,
-		hole_num_x=5,
-		gridfin_x=4,
-		hole_num_y=2,
-		gridfin_y=2,
-		hole_chamfer_size=3,
-		increase_copies=1,
-		increase_amount=0.5,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=3.0,
-		y_padding=4.5,
-		y_uppies=13.0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
 
-	holders.append(Holder(
-		name="nozzle holder",
-		version=SemVer(1, 0, 0),
-		hole_shape=Circle(5.81),
-		hole_shape_max=Circle(9999.0),
-		hole_shape_min=Circle(0.01),
-
-		hole_size_flat=15.60,
-		hole_depth=3.10 + 1,
-		fill_mm=5,
-		gridfin_height=3,
-		hole_num_x=4,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=1,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=1,
-		x_padding=10,
-		y_padding=6,
-		y_uppies=9.5,
-		no_lip=False,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+@functools.lru_cache(maxsize=None)
+def _func_arity(func) -> int:
+	return len(inspect.signature(func).parameters)
 
-	holders.append(Holder(
-		name="d battery holder",
-		version=SemVer(1, 0, 0),
-		hole_shape=Circle(32.36),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=17.0,
-		fill_mm=20.0,
-		gridfin_height=7.0,
-		hole_num_x=2,
-		gridfin_x=2,
-		hole_num_y=2,
-		gridfin_y=2,
-		hole_chamfer_size=3.98,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.5,
-		y_padding=2.5,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+
+def _call_variable_func(func, *args):
+	"""Call size_func with only the args it declared."""
+	n = _func_arity(func)
+	return func(*args[:n])
 
 
-	bosch_holders = []
-	bosch_holders.append(Holder(
-		name="bosch glm165-40 with aaa battery holder",
-		version=SemVer(1, 0, 1),
-		hole_shape=Rect(41.25, 25),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=30,
-		fill_mm=35,
-		gridfin_height=7.0,
-		hole_num_x=1,
-		gridfin_x=2,
-		hole_num_y=1,
-		gridfin_y=1,
-		hole_chamfer_size=5,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.5,
-		y_padding=2.5,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+catalog_path = _repo_dir.joinpath("misc_multi_holder", "catalog.toml")
 
-	bosch_holders.append(Holder(
-		name="bosch aaa battery holder",
-		version=bosch_holders[0].version,
-		hole_shape=Circle(10.35),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=15.0,
-		fill_mm=bosch_holders[0].fill_mm,
-		gridfin_height=bosch_holders[0].gridfin_height,
-		hole_num_x=2,
-		gridfin_x=bosch_holders[0].gridfin_x,
-		hole_num_y=2,
-		gridfin_y=bosch_holders[0].gridfin_y,
-		hole_chamfer_size=2.0,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.0,
-		y_padding=3.1,
-		y_uppies=0,
-		no_lip=bosch_holders[0].no_lip,
-		no_lip_upper_size=bosch_holders[0].no_lip_upper_size,
-		no_lip_fillet_size=bosch_holders[0].no_lip_fillet_size
-	))
+# the names catalog.toml uses for hole shapes and size functions
+hole_shape_types = {
+	"hexagon": Hexagon,
+	"circle": Circle,
+	"rect": Rect,
+	"rect_double": RectDouble,
+}
+size_funcs = {
+	func.__name__: func
+	for func in (size_default_increase, size_increase_margin, size_indentity, size_increase_drill)
+}
+_holder_params = set(inspect.signature(Holder.__init__).parameters) - {"self"}
 
 
-	holders.append(Holder(
-		name="vessel tx76u",
-		version=SemVer(1, 0, 6),
-		hole_shape=RectDouble(
-			17.0 + 0.3,
-			7.5 + 0.3,
-			5.7 + 0.4,
-			7.5 + (2 * 2) + 0.4
-		),
-		size_func=size_indentity,
-
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=26.8,
-		fill_mm=30,
-		gridfin_height=7.0,
-		hole_num_x=1,
-		gridfin_x=1,
-		hole_num_y=1,
-		gridfin_y=1,
-		hole_chamfer_size=3.98,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.5,
-		y_padding=2.5,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
+def hole_shape_from_table(table: Dict[str, Any]) -> HoleShape:
+	sizes = dict(table)
+	shape_type = sizes.pop("type", None)
+	if shape_type not in hole_shape_types:
+		raise CatalogError(f"unknown hole shape type {shape_type!r}, use one of {', '.join(hole_shape_types)}")
+	try:
+		return hole_shape_types[shape_type](**sizes)
+	except TypeError as e:
+		raise CatalogError(f"bad {shape_type} sizes {sizes}: {e}") from None
+
+
+def holder_from_table(table: Dict[str, Any]) -> Holder:
+	"""One [[holder]] of catalog.toml as a Holder."""
+	kwargs = dict(table)
+	name = kwargs.get("name")
+	unknown = set(kwargs) - _holder_params
+	if unknown:
+		raise CatalogError(f"holder {name!r}: unknown keys {', '.join(sorted(unknown))}")
+
+	try:
+		if "version" in kwargs:
+			kwargs["version"] = SemVer.Parse(kwargs["version"])
+		for key in ("hole_shape", "hole_shape_max", "hole_shape_min"):
+			if key in kwargs:
+				kwargs[key] = hole_shape_from_table(kwargs[key])
+		if "size_func" in kwargs:
+			if kwargs["size_func"] not in size_funcs:
+				raise CatalogError(f"unknown size_func {kwargs['size_func']!r}, use one of {', '.join(size_funcs)}")
+			kwargs["size_func"] = size_funcs[kwargs["size_func"]]
+	except (CatalogError, ValueError) as e:
+		raise CatalogError(f"holder {name!r}: {e}") from None
+
+	return Holder(**kwargs)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_catalog(path: Path, mtime_ns: int) -> Tuple[List[Holder], List[List[Holder]]]:
+	data = read_catalog(path)
+	try:
+		tables = resolve_like(data.get("holder", []) + expand_families(data.get("family", [])))
+		all_holders = {table["name"]: holder_from_table(table) for table in tables}
+
+		and_groups = []
+		for group in data.get("and_group", []):
+			missing = [name for name in group["holders"] if name not in all_holders]
+			if missing:
+				raise CatalogError(f"and_group uses undefined holders {', '.join(map(repr, missing))}")
+			and_groups.append([all_holders[name] for name in group["holders"]])
+	except CatalogError as e:
+		raise CatalogError(f"{path}: {e}") from None
+
+	grouped = {id(holder) for group in and_groups for holder in group}
+	holders = [holder for holder in all_holders.values() if id(holder) not in grouped]
+	return holders, and_groups
+
+
+def holder_catalog(path: Path = catalog_path) -> Tuple[List[Holder], List[List[Holder]]]:
+	"""Every holder in the catalog, and the groups built with and_holders.
+
+	Reading the catalog never loads cadquery. The lists are new on every
+	call, the holders in them are shared.
+	"""
+	path = Path(path).resolve()
+	holders, and_groups = _load_catalog(path, path.stat().st_mtime_ns)
+	return list(holders), [list(group) for group in and_groups]
+
+
+def holder_index(path: Path = catalog_path) -> CatalogIndex:
+	"""Every holder in the catalog, grouped ones too, by name and attribute."""
+	holders, and_groups = holder_catalog(path)
+	return CatalogIndex([holder for group in and_groups for holder in group] + holders)
+
+
+def select_where(
+	holders: List[Holder],
+	and_groups: List[List[Holder]],
+	conditions: List[Tuple[str, Any]],
+) -> Tuple[List[Holder], List[List[Holder]]]:
+	"""Keep the holders and and_groups matching every attribute condition.
+
+	Like select_holders, an and group goes by its first holder.
+	"""
+	if len(conditions) == 0:
+		return holders, and_groups
+	index = CatalogIndex([group[0] for group in and_groups] + holders)
+	matches = {id(holder) for holder in index.where_items(conditions)}
+	return (
+		[holder for holder in holders if id(holder) in matches],
+		[group for group in and_groups if id(group[0]) in matches],
+	)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Build and export the holder catalog.")
+	parser.add_argument('names', nargs='*', metavar='NAME',
+					 help='only build holders matching these globs, like "*aaa*" (default all)')
+	parser.add_argument('-r', '--regex', action="store_true",
+					 help='NAME is a regular expression searched in the holder name')
+	parser.add_argument('-w', '--where', type=parse_condition, action="append", default=[],
+					 metavar='ATTR=VALUE',
+					 help='only build holders with this attribute value, like gridfin_x=2 (repeatable)')
+	parser.add_argument('--catalog', type=Path, default=catalog_path,
+					 help='holder catalog to read (default catalog.toml next to this script)')
+	parser.add_argument('--format', type=parse_formats, default=default_export_formats,
+					 help=f'comma separated formats to write, from {",".join(export_formats)} (default {",".join(default_export_formats)})')
+	parser.add_argument('-j', '--jobs', type=int, default=1,
+					 help='build the holders in this many worker processes')
+	parser.add_argument('--compare-hole-cuts', action="store_true",
+					 help=f'build the selected holders with each hole cut mode ({", ".join(hole_cut_modes)}), '
+					 'print the timings and exit')
+	parser.add_argument('-f', '--force', action="store_true",
+					 help='rebuild holders even if the build manifest says they are up to date')
+	parser.add_argument('-l', '--list', action="store_true",
+					 help='list the selected holders and exit')
+	parser.add_argument('-n', '--dry-run', action="store_true",
+					 help='show which holders would be built and exit')
+	artifacts.add_arguments(parser)
+	tessellation.add_arguments(parser)
+	trace.add_arguments(parser)
+	args = parser.parse_args([] if _in_cq_editor else None)
+	trace.enable_from_args(args)
+
+	holders, and_groups = select_holders(*holder_catalog(args.catalog), args.names, args.regex)
+	holders, and_groups = select_where(holders, and_groups, args.where)
+
+	if args.list:
+		list_holders(holders, and_groups)
+		return
+
+	if len(holders) == 0 and len(and_groups) == 0:
+		print(f"no holder matches {' '.join(args.names + [f'{a}={v}' for a, v in args.where])}, see --list")
+		if __name__ == "__main__":
+			exit(1)
+		return
+
+	if args.compare_hole_cuts:
+		compare_hole_cut_modes(holders + [holder for group in and_groups for holder in group])
+		return
 
-	holders.append(Holder(
-		name="tooth brush holder",
-		version=SemVer(1, 0, 0),
-		hole_shape=Circle(10.25),
-		hole_shape_max=Circle(9999999),
-		hole_shape_min=Circle(0.01),
-
-		hole_depth=35,
-		fill_mm=33.0, # hole_depth - 5 + 3
-		gridfin_height=10.0,
-		hole_num_x=2,
-		gridfin_x=1,
-		hole_num_y=2,
-		gridfin_y=1,
-		hole_chamfer_size=2.5,
-		hole_circle=True,
-		increase_copies=1,
-		increase_amount=0,
-		hole_max_size=10000,
-		hole_min_size=0,
-		increase_loop_after=20,
-		edge_padding=0.0,
-		x_padding=2.2,
-		y_padding=3.1,
-		y_uppies=0,
-		no_lip=True,
-		no_lip_upper_size=2.0,
-		no_lip_fillet_size=0.3
-	))
 
 	try:
 		script_dir = Path(__file__).resolve().parent
@@ -1456,11 +2523,23 @@ def main():
 
 
 	holder_models = []
-	holder_models.append(and_holders(bosch_holders))
 
-	loop_output(out_dir, holders, holder_models, True, "")
+	loop_output(
+		out_dir,
+		holders,
+		holder_models,
+		args.format,
+		and_groups=and_groups,
+		jobs=args.jobs,
+		force=args.force,
+		dry_run=args.dry_run,
+		mesh_policy=tessellation.policy_from_args(args),
+		store=artifacts.store_from_args(args),
+	)
 
 
 
-main()
+# worker processes import this file too, they must not build the catalog
+if __name__ == "__main__" or _in_cq_editor:
+	main()
 
@@ -5,14 +5,27 @@ Bits = 3 # number of bits you want to the spacer to cover (experimental, tested
 
 # === variables end ===
 from dataclasses import dataclass, field
-import cadquery as cq  # noqa
-import cqgridfinity as cqg  # noqa
 import math  # noqa
 from pathlib import Path # noqa
-from cadquery import exporters
 from decimal import Decimal
 import argparse
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common import artifacts, sweep, trace
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+from cad_common.manifest import BuildManifest, module_sources, part_digest, source_digest
 # pylint: skip-file
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -51,19 +64,18 @@ def make_spacer(spacer):
 
 	return washer, spacer
 
-def loop_output(out_dir_base):
+def loop_output(out_dir_base, thicknesses, force=False, store=None, jobs=1):
+	manifest = BuildManifest(out_dir_base, force=force)
+	sources = [source_digest(Path(__file__)), *module_sources(Path(__file__))]
 
 	out_dir = out_dir_base
 	out_dir.mkdir(parents=True, exist_ok=True)
 
-	step = Decimal('0.5')
-	bit_size = step
-	bit_size = Decimal(Spacer_thickness)
-
 	outer_dia = 50
 	inner_dia = 35
 
-	while bit_size <= Decimal('10.0'):
+	parts = []
+	for bit_size in thicknesses:
 		name = f"washer {bit_size}mm thick"
 
 		spacer = Spacer(
@@ -74,23 +86,26 @@ def loop_output(out_dir_base):
 			inner_dia=inner_dia,
 			bits=3
 		)
-		print(f"making \"{spacer.name}\"")
+		parts.append(sweep.SweepPart(
+			part=f"{spacer.name} {str(spacer.version)}",
+			digest=part_digest(spacer, spacer.version, sources),
+			args=(make_spacer, spacer, out_dir, store),
+		))
 
-		result, spacer = make_spacer(spacer=spacer)
-		exporters.export(
-			result,
-			str(out_dir.joinpath(
-				f"{spacer.name} {str(spacer.version)}.step"
-			))
-		)
-		bit_size += step
-		break
+	return sweep.run(parts, sweep.build_step, manifest, jobs=jobs, store=store)
 
 def main():
 	parser = argparse.ArgumentParser()
 	parser.add_argument('-l', '--loop', action="store_true",
-					 help='loop over 0.5 to 10mm spacers')
+					 help='build every washer from --min to --max thick')
+	parser.add_argument('-f', '--force', action="store_true",
+					 help='with --loop, rebuild washers even if the build manifest says they are up to date')
+	# one washer unless --max asks for more
+	sweep.add_arguments(parser, Decimal(Spacer_thickness), Decimal(Spacer_thickness), Decimal("0.5"))
+	artifacts.add_arguments(parser)
+	trace.add_arguments(parser)
 	args = parser.parse_args()
+	trace.enable_from_args(args)
 
 
 	try:
@@ -106,7 +121,13 @@ def main():
 	out_dir.mkdir(parents=True, exist_ok=True)
 
 	if args.loop:
-		loop_output(out_dir)
+		loop_output(
+			out_dir,
+			sweep.values_from_args(args, parser),
+			force=args.force,
+			store=artifacts.store_from_args(args),
+			jobs=args.jobs,
+		)
 		return
 
 	spacer = Spacer(
@@ -123,7 +144,7 @@ def main():
 	result, spacer = make_spacer(spacer=spacer)
 	show_object(result, name=spacer.name+" v"+str(spacer.version))
 	if __name__ == "__main__":
-		exporters.export(
+		cq.exporters.export(
 			result,
 			str(out_dir.joinpath(
 				f"{spacer.name} {str(spacer.version)}.step"
@@ -131,4 +152,5 @@ def main():
 		)
 
 
-main()
+if __name__ == "__main__" or _in_cq_editor:
+	main()
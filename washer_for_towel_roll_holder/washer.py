@@ -7,14 +7,27 @@ Bits = 3 # number of bits you want to the spacer to cover (experimental, tested
 
 # === variables end ===
 from dataclasses import dataclass, field
-import cadquery as cq  # noqa
-import cqgridfinity as cqg  # noqa
 import math  # noqa
 from pathlib import Path # noqa
-from cadquery import exporters
 from decimal import Decimal
 import argparse
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common import artifacts, sweep, trace
+from cad_common.lazy import lazy_import
+
+cq = lazy_import("cadquery")
+from cad_common.manifest import BuildManifest, module_sources, part_digest, source_digest
 # pylint: skip-file
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -40,12 +53,6 @@ class Spacer:
 	bits: int = Bits
 
 
-import math
-
-import cadquery as cq
-import math
-
-
 
 def _smooth01(x: float) -> float:
 	"""Cosine smoothstep: 0->1 with zero slope at both ends."""
@@ -62,7 +69,7 @@ def angled_ring_ramp(
 	wedge_height: float | None = None,
 	start_angle: float = 0.0,
 	resolution_deg: float = 2.0,
-) -> cq.Workplane:
+) -> "cq.Workplane":
 	"""
 	Build a smooth ring-following ramp with constant thickness.
 
@@ -183,35 +190,35 @@ def make_spacer(spacer):
 	washer = washer.union(washer_outer)
 
 
-	washer = (
-		washer
-		.faces(">Z")
-		.edges()
-		.fillet(0.5)
-	)
+	with trace.span("fillets", spacer=spacer.name):
+		washer = (
+			washer
+			.faces(">Z")
+			.edges()
+			.fillet(0.5)
+		)
 
-	washer = (
-		washer
-		.faces(">Z[1]")
-		.edges()[1]
-		.fillet(1)
-	)
+		washer = (
+			washer
+			.faces(">Z[1]")
+			.edges()[1]
+			.fillet(1)
+		)
 
 	return washer, spacer
 
-def loop_output(out_dir_base):
+def loop_output(out_dir_base, thicknesses, force=False, store=None, jobs=1):
+	manifest = BuildManifest(out_dir_base, force=force)
+	sources = [source_digest(Path(__file__)), *module_sources(Path(__file__))]
 
 	out_dir = out_dir_base
 	out_dir.mkdir(parents=True, exist_ok=True)
 
-	step = Decimal('0.5')
-	bit_size = step
-	bit_size = Decimal(Spacer_thickness)
-
 	outer_dia = S_outer_dia
 	inner_dia = S_outer_dia - S_size_to_inner
 
-	while bit_size <= Decimal('10.0'):
+	parts = []
+	for bit_size in thicknesses:
 		name = f"washer {bit_size}mm thick"
 
 		spacer = Spacer(
@@ -222,43 +229,63 @@ def loop_output(out_dir_base):
 			inner_dia=inner_dia,
 			bits=3
 		)
-		print(f"making \"{spacer.name}\"")
+		parts.append(sweep.SweepPart(
+			part=f"{spacer.name} {str(spacer.version)}",
+			digest=part_digest(spacer, spacer.version, sources),
+			args=(make_spacer, spacer, out_dir, store),
+		))
 
-		result, spacer = make_spacer(spacer=spacer)
-		exporters.export(
-			result,
-			str(out_dir.joinpath(
-				f"{spacer.name} {str(spacer.version)}.step"
-			))
-		)
-		bit_size += step
-		break
+	return sweep.run(parts, sweep.build_step, manifest, jobs=jobs, store=store)
 
 def main():
-	obj = angled_ring_ramp(
-		inner_radius=2,
-		outer_radius=3,
-		ang=60,
-		height=2,
-		thickness=0.5,
-		wedge_height=0.0,   # set smaller for only a partial taper-down
-		start_angle=0,
-	)
+	parser = argparse.ArgumentParser()
+	parser.add_argument('-l', '--loop', action="store_true",
+					 help='build every washer from --min to --max thick')
+	parser.add_argument('-f', '--force', action="store_true",
+					 help='with --loop, rebuild washers even if the build manifest says they are up to date')
+	# one washer unless --max asks for more
+	sweep.add_arguments(parser, Decimal(str(Spacer_thickness)), Decimal(str(Spacer_thickness)), Decimal("0.5"))
+	artifacts.add_arguments(parser)
+	trace.add_arguments(parser)
+	args = parser.parse_args()
+	trace.enable_from_args(args)
 
+	if args.loop:
+		try:
+			out_dir = Path(__file__).resolve().parent.joinpath("out")
+		except NameError:
+			print("can't get script path")
+			exit(1)
+		loop_output(
+			out_dir,
+			sweep.values_from_args(args, parser),
+			force=args.force,
+			store=artifacts.store_from_args(args),
+			jobs=args.jobs,
+		)
+		return
 
-	obj = (
-		obj
-		.edges(">Z")
-		.fillet(0.1)
-	)
+	with trace.span("angled_ring_ramp"):
+		obj = angled_ring_ramp(
+			inner_radius=2,
+			outer_radius=3,
+			ang=60,
+			height=2,
+			thickness=0.5,
+			wedge_height=0.0,   # set smaller for only a partial taper-down
+			start_angle=0,
+		)
+
+
+		obj = (
+			obj
+			.edges(">Z")
+			.fillet(0.1)
+		)
 	show_object(obj)
 	return
 
 
-	parser = argparse.ArgumentParser()
-	parser.add_argument('-l', '--loop', action="store_true",
-					 help='loop over 0.5 to 10mm spacers')
-	args = parser.parse_args()
 
 
 	try:
@@ -273,10 +300,6 @@ def main():
 	out_dir = script_dir.joinpath("out")
 	out_dir.mkdir(parents=True, exist_ok=True)
 
-	if args.loop and False:
-		loop_output(out_dir)
-		return
-
 	name = f"washer {Spacer_thickness}mm thick"
 
 	spacer = Spacer(
@@ -289,7 +312,7 @@ def main():
 	result, spacer = make_spacer(spacer=spacer)
 	show_object(result, name=spacer.name+" v"+str(spacer.version))
 	if __name__ == "__main__":
-		exporters.export(
+		cq.exporters.export(
 			result,
 			str(out_dir.joinpath(
 				f"{spacer.name} {str(spacer.version)}.step"
@@ -297,4 +320,5 @@ def main():
 		)
 
 
-main()
+if __name__ == "__main__" or _in_cq_editor:
+	main()
@@ -1,7 +1,21 @@
 from dataclasses import dataclass, field
-import cadquery as cq
-from cadquery import exporters
 from pathlib import Path # noqa
+import argparse
+import sys
+
+try:
+	_repo_dir = Path(__file__).resolve().parent.parent
+except NameError:
+	# cq-editor runs the script from its own folder without __file__
+	_repo_dir = Path.cwd().parent
+if str(_repo_dir) not in sys.path:
+	sys.path.insert(0, str(_repo_dir))
+
+from cad_common.gridfinity_base import base_library
+from cad_common.lazy import lazy_import
+from cad_common import tessellation, topology, trace
+
+cq = lazy_import("cadquery")
 
 
 class SemVer:
@@ -109,8 +123,8 @@ doesnt_exist_script_dir = "script dir doesn't exist"
 
 
 
-import cqgridfinity as cqg  # noqa
 import math  # noqa
+_in_cq_editor = 'show_object' in globals()
 if 'show_object' not in globals():
 	def show_object(*args, **kwargs):
 		pass
@@ -121,17 +135,11 @@ if 'show_object' not in globals():
 def make_basic_box(fill_mm, gridfin_x, gridfin_y, gridfin_height, gf_hi_size, no_lip):
 	sr = to_solid_ratio(fill_mm, gf_hi_size, gridfin_height)
 
-	bh = cqg.GridfinityBox(
+	bh = base_library.GetBase(
 		gridfin_x,
 		gridfin_y,
 		gridfin_height,
-		length_div=0,
-		width_div=0,
-		holes=False,
 		no_lip=no_lip,
-		scoops=False,
-		labels=False,
-		solid=True,
 		solid_ratio=sr
 	)
 	return bh
@@ -186,7 +194,8 @@ def make_holder(holder):
 
 
 
-	bh = make_basic_box(fill_mm, gridfin_x, gridfin_y, gridfin_height, gf_hi_size, no_lip)
+	with trace.span("gridfinity base", holder=holder.name):
+		bh = make_basic_box(fill_mm, gridfin_x, gridfin_y, gridfin_height, gf_hi_size, no_lip)
 
 	# bh = cqg.
 	# make the base
@@ -207,36 +216,30 @@ def make_holder(holder):
 	x_full_padding = gf_padding + x_padding
 	y_full_padding = gf_padding + y_padding
 
-	result_pre_hold_edges = (
-		result
-		.faces(">Z[-2]")
-		.edges()
-	)
+	index = topology.TopologyIndex(result)
+	result_pre_hold_edges = set(index.FaceEdges(">Z[-2]"))
 
-	result_pre_all_edges = (
-		result
-		.faces()
-		.edges()
-	)
+	result_pre_all_edges = index
 	# show_object(result_pre_hold_edges)
 
 
 
 
 
-	result = result.faces(f">Z[{z_face_flat}]").workplane(
-		).transformed(rotate=(0, 0, 0)
-		).moveTo(
-		(
-			holder.wallet_x_mov
-		), 0+(
-			0
-		)).rect(
-			holder.wallet_width,
-			holder.wallet_len,
-		).cutBlind(
-			-(holder.wallet_depth)
-	)
+	with trace.span("wallet cutBlind", holder=holder.name):
+		result = result.newObject(index.SelectFaces(f">Z[{z_face_flat}]")).workplane(
+			).transformed(rotate=(0, 0, 0)
+			).moveTo(
+			(
+				holder.wallet_x_mov
+			), 0+(
+				0
+			)).rect(
+				holder.wallet_width,
+				holder.wallet_len,
+			).cutBlind(
+				-(holder.wallet_depth)
+		)
 
 
 
@@ -248,7 +251,7 @@ def make_holder(holder):
 	# 		.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
 	# 		# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
 	# 		.edges()
-	# 		.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
+	# 		.filter(lambda edge: edge not in result_pre_hold_edges)  # Exclude specific edges
 	# 		# # ignore 4 longest edges, should always be the edge of the box
 	# 		# .sort(lambda edge: edge.Length())[::-1][4:]
 	# 		#
@@ -286,7 +289,7 @@ def make_holder(holder):
 		# 	.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
 		# 	# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
 		# 	.edges()
-		# 	.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
+		# 	.filter(lambda edge: edge not in result_pre_hold_edges)  # Exclude specific edges
 		# 	# .edges("<Y[1]")
 		# 	# # ignore 4 longest edges, should always be the edge of the box
 		# 	# .sort(lambda edge: edge.Length())[::-1][4:]
@@ -298,13 +301,12 @@ def make_holder(holder):
 
 
 
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			# the bottom face of the hexagonal holes, without the edges it had before the cuts
+			.newObject(index.Select("<Y", index.FaceEdges(">Z[-2]", exclude=result_pre_hold_edges)))
 			# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
-			.edges()
-			.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
-			.edges("<Y")
 			# # ignore 4 longest edges, should always be the edge of the box
 			# .sort(lambda edge: edge.Length())[::-1][4:]
 			#
@@ -314,13 +316,12 @@ def make_holder(holder):
 		)
 		# return result, holder
 
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			# the bottom face of the hexagonal holes, without the edges it had before the cuts
+			.newObject(index.Select(">Y", index.FaceEdges(">Z[-2]", exclude=result_pre_hold_edges)))
 			# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
-			.edges()
-			.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
-			.edges(">Y")
 			# # ignore 4 longest edges, should always be the edge of the box
 			# .sort(lambda edge: edge.Length())[::-1][4:]
 			#
@@ -330,13 +331,12 @@ def make_holder(holder):
 		)
 		# return result, holder
 
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			# the bottom face of the hexagonal holes, without the edges it had before the cuts
+			.newObject(index.Select("<X", index.FaceEdges(">Z[-2]", exclude=result_pre_hold_edges)))
 			# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
-			.edges()
-			.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
-			.edges("<X")
 			# # ignore 4 longest edges, should always be the edge of the box
 			# .sort(lambda edge: edge.Length())[::-1][4:]
 			#
@@ -345,13 +345,12 @@ def make_holder(holder):
 			.chamfer(holder.hole_chamfer_size_x, holder.hole_chamfer_size_z)
 		)
 
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			# the bottom face of the hexagonal holes, without the edges it had before the cuts
+			.newObject(index.Select(">X", index.FaceEdges(">Z[-2]", exclude=result_pre_hold_edges)))
 			# .edges("not(<<X[2] or >>X[2] or <<Y[2] or >>Y[2])")   # Select all straight edges
-			.edges()
-			.filter(lambda edge: edge not in result_pre_hold_edges.objects)  # Exclude specific edges
-			.edges(">X")
 			# # ignore 4 longest edges, should always be the edge of the box
 			# .sort(lambda edge: edge.Length())[::-1][4:]
 			#
@@ -364,63 +363,49 @@ def make_holder(holder):
 
 
 
-	edges = (
-		result
-		.faces()  # Select the bottom face of the hexagonal holes
-		.edges()
-		.filter(lambda edge: edge not in result_pre_all_edges.objects)  # Exclude specific edges
-		.edges("|Z")
-	)
-
-	edges2 = (
-		result
-		.faces()  # Select the bottom face of the hexagonal holes
-		.edges()
-		.filter(lambda edge: edge not in result_pre_all_edges.objects)  # Exclude specific edges
-		.edges("<<Y[5] or >>Y[5]")
-		.edges("<<Z[1]")
-	)
+	with trace.span("corner fillets", holder=holder.name):
+		index = topology.TopologyIndex(result)
+		new_edges = index.EdgesNotIn(result_pre_all_edges)
+		edges = index.Select("|Z", new_edges)
+		edges2 = index.Select("<<Z[1]", index.Select("<<Y[5] or >>Y[5]", new_edges))
+		fillet_edges = set(edges) | set(edges2)
 
-	result = (
-		result
-		.faces()  # Select the bottom face of the hexagonal holes
-		.edges()
-		.filter(lambda edge: edge not in result_pre_all_edges.objects)  # Exclude specific edges
-		.filter(lambda edge: (edge in edges.objects) or (edge in edges2.objects))  # Exclude specific edges
-		# .edges("|Z")
-		# .edges("<<Y[5] or >>Y[5]")
-		# .edges("<<Z[1]")
-		.fillet(7)
-	)
+		result = (
+			result
+			.newObject([edge for edge in new_edges if edge in fillet_edges])
+			# .edges("|Z")
+			# .edges("<<Y[5] or >>Y[5]")
+			# .edges("<<Z[1]")
+			.fillet(7)
+		)
 	# return result, holder
 
 
 	if no_lip:
 		cut_size = no_lip_upper_size
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z[-2]")  # Select the bottom face of the hexagonal holes
+			.newObject(index.SelectFaces(">Z[-2]"))  # Select the bottom face of the hexagonal holes
 			.workplane(offset=no_lip_upper_size)
 			.rect(size_wid * 2, size_dep * 2)  # Create a rectangle of width and depth
 
 			.cutBlind((bh.height))
 		)
 
+		index = topology.TopologyIndex(result)
 		result = (
 			result
-			.faces(">Z")  # Select the bottom face of the hexagonal holes
-			.edges("%LINE")   # Select all straight edges
+			# the straight edges of the top face
+			.newObject(index.Select("%LINE", index.FaceEdges(">Z")))
 			.fillet(no_lip_fillet_size)
 		)
 
 
-	result_pre_all_edges = (
-		result
-		.faces()
-		.edges()
-	)
+	index = topology.TopologyIndex(result)
+	result_pre_all_edges = index
 
-	result = result.faces(f">Z[{z_face_flat}]").workplane(
+	result = result.newObject(index.SelectFaces(f">Z[{z_face_flat}]")).workplane(
 		).transformed(offset=(0, 0, holder.no_lip_upper_size + 5), rotate=(0, 0, 0)
 		).moveTo(
 		(
@@ -436,21 +421,20 @@ def make_holder(holder):
 
 
 	if holder.charge_slot:
+		index = topology.TopologyIndex(result)
+		new_edges = index.EdgesNotIn(result_pre_all_edges)
 		result = (
 			result
-			.faces()  # Select the bottom face of the hexagonal holes
-			.edges()
-			.filter(lambda edge: edge not in result_pre_all_edges.objects)  # Exclude specific edges
 			# .edges("|Z")
 			# .edges("<<Y[5] or >>Y[5]")
-			.edges("(<<Z[9]) or <<Z[8] or << Z[7] or <<Z[5] or (<<Z[4] and |Y)")
+			.newObject(index.Select("(<<Z[9]) or <<Z[8] or << Z[7] or <<Z[5] or (<<Z[4] and |Y)", new_edges))
 			.fillet(0.4)
 		)
 
 	return result, holder
 
 
-def main():
+def mf100_holder():
 	mf100 = Holder(
 		name="wolfbox mf100 holder",
 		version=SemVer(1, 0, 1),
@@ -468,7 +452,18 @@ def main():
 
 	mf100.wallet_depth = 43 + mf100.hole_chamfer_size_z
 	mf100.fill_mm = mf100.wallet_depth + 5
+	return mf100
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Build and export the wolfbox mf100 holder.")
+	tessellation.add_arguments(parser)
+	trace.add_arguments(parser)
+	args = parser.parse_args([] if _in_cq_editor else None)
+	trace.enable_from_args(args)
+	mesh_policy = tessellation.policy_from_args(args)
 
+	mf100 = mf100_holder()
 
 
 	try:
@@ -484,17 +479,23 @@ def main():
 
 
 	holder_in = mf100
-	result, holder = make_holder(holder=holder_in)
+	with trace.span("make_holder", holder=holder_in.name, params=holder_in):
+		result, holder = make_holder(holder=holder_in)
 	show_object(result, name=holder.name+" v"+str(holder.version))
 
 	if __name__ == "__main__" and (out_dir != doesnt_exist_script_dir):
-		exporters.export(
-			w=result,
-			fname=str(out_dir.joinpath(
-				f"{holder.name} v{str(holder.version)}.stl"
-			)),
-			tolerance=1e-5
-		)
-
-
-main()
+		stl_path = out_dir.joinpath(f"{holder.name} v{str(holder.version)}.stl")
+		with trace.span("export", cat="export", file=stl_path.name, adaptive=mesh_policy is not None):
+			if mesh_policy is not None:
+				report = tessellation.export_stl(result, stl_path, policy=mesh_policy)
+				print(f"meshed \"{holder.name}\": {report.Summary()}")
+			else:
+				cq.exporters.export(
+					w=result,
+					fname=str(stl_path),
+					tolerance=1e-5
+				)
+
+
+if __name__ == "__main__" or _in_cq_editor:
+	main()